@@ -0,0 +1,288 @@
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+
+from client_matching.instrumentation import instrumentation
+from client_matching.models import MatchingJob
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', True)
+METRICS_DIR = getattr(settings, 'METRICS_DIR', '/tmp/between_metrics')
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+METRICS_ALLOW_PRIVATE = getattr(settings, 'METRICS_ALLOW_PRIVATE', False)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HELP = {
+    'between_http_requests_total': ('counter', 'Requests by view, method and status.'),
+    'between_http_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'between_db_queries_per_request': ('histogram', 'Database queries issued per request by view.'),
+    'between_db_query_seconds_total': ('counter', 'Time spent in database queries by view.'),
+    'between_query_budget_violations_total': ('counter', 'Requests over their query budget or repeating a query '
+                                                         'shape, by view.'),
+    'between_matching_jobs_duration_seconds': ('histogram', 'Matching job run time in the worker.'),
+    'between_matching_span_seconds_total': ('counter', 'Time spent in each instrumented matching stage.'),
+    'between_matching_span_calls_total': ('counter', 'Calls of each instrumented matching stage.'),
+    'between_matching_events_total': ('counter', 'Matching counters: cache hits and misses, texts encoded, '
+                                                 'recommendations written, jobs finished.'),
+    'between_embedding_cache_hit_ratio': ('gauge', 'Embedding cache hits over all lookups.'),
+    'between_matching_jobs': ('gauge', 'Matching jobs in the queue by status.'),
+    'between_metrics_processes': ('gauge', 'Processes whose metrics are included.'),
+}
+
+
+def _key(name: str, labels: dict) -> str:
+    return json.dumps([name, labels], sort_keys=True)
+
+
+def _process_alive(filename: str) -> bool:
+    """Whether the process that wrote a metrics file still runs; files from other hosts are assumed live."""
+    hostname, _, pid = filename[:-len('.json')].rpartition('-')
+    if hostname != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms of this process. Every process writes its values to its own file in METRICS_DIR
+    at most every METRICS_FLUSH_INTERVAL seconds, and /metrics sums the files of all gunicorn workers and the
+    matching worker, like prometheus_client's multiprocess mode.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._flushed_at = 0.0
+
+    def inc(self, name: str, labels: dict, value: float = 1.0):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: dict, value: float, buckets=LATENCY_BUCKETS):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets),
+                                                     'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def dump(self) -> dict:
+        counters = {}
+        spans = instrumentation.snapshot()
+        for span, stats in spans['spans'].items():
+            counters[_key('between_matching_span_seconds_total', {'span': span})] = stats['total_ms'] / 1000
+            counters[_key('between_matching_span_calls_total', {'span': span})] = stats['count']
+        for event, value in spans['counters'].items():
+            counters[_key('between_matching_events_total', {'event': event})] = value
+
+        with self._lock:
+            counters.update(self._counters)
+            histograms = {key: dict(value, counts=list(value['counts'])) for key, value in self._histograms.items()}
+        return {'counters': counters, 'histograms': histograms}
+
+    def _filename(self) -> str:
+        # Containers sharing the directory all number their processes from 1
+        return f'{socket.gethostname()}-{os.getpid()}.json'
+
+    def flush(self, force: bool = False):
+        if not force and time.monotonic() - self._flushed_at < METRICS_FLUSH_INTERVAL:
+            return
+        self._flushed_at = time.monotonic()
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            path = os.path.join(METRICS_DIR, self._filename())
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(self.dump(), f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics to {METRICS_DIR}: {e}")
+
+    def collect(self) -> dict:
+        """
+        Sum of every process's last flushed values, with this process's current values. Files of processes that
+        have exited on this host are removed, so their counters reset like a restarted process's would.
+        """
+        dumps = [self.dump()]
+        own_file = self._filename()
+        try:
+            filenames = [name for name in os.listdir(METRICS_DIR) if name.endswith('.json') and name != own_file]
+        except FileNotFoundError:
+            filenames = []
+        for filename in filenames:
+            if not _process_alive(filename):
+                try:
+                    os.remove(os.path.join(METRICS_DIR, filename))
+                except OSError as e:
+                    logger.warning(f"Failed to remove stale metrics file {filename}: {e}")
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, filename)) as f:
+                    dumps.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping metrics file {filename}: {e}")
+
+        counters, histograms = {}, {}
+        for dump in dumps:
+            for key, value in dump['counters'].items():
+                counters[key] = counters.get(key, 0.0) + value
+            for key, value in dump['histograms'].items():
+                merged = histograms.get(key)
+                if merged is None or merged['buckets'] != value['buckets']:
+                    histograms[key] = dict(value, counts=list(value['counts']))
+                    continue
+                merged['counts'] = [a + b for a, b in zip(merged['counts'], value['counts'])]
+                merged['sum'] += value['sum']
+                merged['count'] += value['count']
+        return {'counters': counters, 'histograms': histograms, 'processes': len(dumps)}
+
+
+registry = MetricsRegistry()
+
+
+def flush_metrics(force: bool = False):
+    if METRICS_ENABLED:
+        registry.flush(force)
+
+
+class QueryStats:
+    """connection.execute_wrapper callable counting the queries of one request and the time they took."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not METRICS_ENABLED:
+            return self.get_response(request)
+
+        query_stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_stats))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        # The URL pattern, not the path, so ids in the URL do not create a series per object
+        match = getattr(request, 'resolver_match', None)
+        view = match.route if match is not None else '<unmatched>'
+
+        registry.inc('between_http_requests_total',
+                     {'view': view, 'method': request.method, 'status': str(response.status_code)})
+        registry.observe('between_http_request_duration_seconds', {'view': view}, duration)
+        registry.observe('between_db_queries_per_request', {'view': view}, query_stats.count, QUERY_COUNT_BUCKETS)
+        registry.inc('between_db_query_seconds_total', {'view': view}, query_stats.seconds)
+        registry.flush()
+        return response
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    escaped = {name: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for name, value in labels.items()}
+    return '{' + ','.join(f'{name}="{value}"' for name, value in sorted(escaped.items())) + '}'
+
+
+def render_metrics(collected: dict, gauges: list) -> str:
+    samples = {}
+    for key, value in sorted(collected['counters'].items()):
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {value}')
+
+    for key, histogram in sorted(collected['histograms'].items()):
+        name, labels = json.loads(key)
+        lines = samples.setdefault(name, [])
+        # Bucket counts are stored cumulatively, as the exposition format expects
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            lines.append(f'{name}_bucket{_format_labels(dict(labels, le=str(bound)))} {count}')
+        lines.append(f'{name}_bucket{_format_labels(dict(labels, le="+Inf"))} {histogram["count"]}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+        lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+
+    for name, labels, value in gauges:
+        samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {value}')
+
+    output = []
+    for name in sorted(samples):
+        metric_type, help_text = HELP.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {metric_type}')
+        output.extend(samples[name])
+    return '\n'.join(output) + '\n'
+
+
+def _gauges(collected: dict) -> list:
+    gauges = [('between_metrics_processes', {}, collected['processes'])]
+
+    hits = collected['counters'].get(_key('between_matching_events_total', {'event': 'embedding_cache.hits'}), 0)
+    misses = collected['counters'].get(_key('between_matching_events_total', {'event': 'embedding_cache.misses'}), 0)
+    if hits + misses:
+        gauges.append(('between_embedding_cache_hit_ratio', {}, round(hits / (hits + misses), 4)))
+
+    try:
+        for row in MatchingJob.objects.values('status').annotate(count=Count('pk')):
+            gauges.append(('between_matching_jobs', {'status': row['status']}, row['count']))
+    except Exception as e:
+        logger.warning(f"Failed to count matching jobs: {e}")
+    return gauges
+
+
+def _scrape_allowed(request) -> bool:
+    if METRICS_TOKEN:
+        return request.headers.get('Authorization') == f'Bearer {METRICS_TOKEN}'
+    if not METRICS_ALLOW_PRIVATE:
+        return False
+    # Behind the reverse proxy every request comes from a private address, hence the explicit opt-in
+    try:
+        return ipaddress.ip_address(request.META.get('REMOTE_ADDR', '')).is_private
+    except ValueError:
+        return False
+
+
+def metrics_view(request):
+    if not _scrape_allowed(request):
+        return HttpResponseForbidden()
+    collected = registry.collect()
+    return HttpResponse(render_metrics(collected, _gauges(collected)), content_type='text/plain; version=0.0.4')
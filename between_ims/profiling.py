@@ -0,0 +1,269 @@
+import atexit
+import base64
+import json
+import logging
+import os
+import pstats
+import queue
+import random
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models.sql.compiler import SQLCompiler
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+# Builds on silk internals (DataCollector, the model factories, _should_intercept), so requirements.txt pins
+# django-silk to the version this was written against
+from silk import models as silk_models
+from silk.collector import DataCollector
+from silk.config import SilkyConfig
+from silk.middleware import SilkyMiddleware, _should_intercept
+from silk.model_factory import RequestModelFactory, ResponseModelFactory
+from silk.sql import execute_sql
+
+from between_ims.metrics import QueryStats
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests recorded in full by silk
+SILK_SAMPLE_RATE = getattr(settings, 'SILK_SAMPLE_RATE', 0.01)
+# Unsampled requests slower than this are stored as a summary and the next request to the path is sampled
+SILK_SLOW_REQUEST_MS = getattr(settings, 'SILK_SLOW_REQUEST_MS', 2000)
+SILK_WRITE_QUEUE_SIZE = getattr(settings, 'SILK_WRITE_QUEUE_SIZE', 1000)
+
+# Admins get a full recording of a single request by sending "X-Silk-Profile: 1"
+PROFILE_HEADER = 'X-Silk-Profile'
+
+
+class SilkRecord:
+    """Everything silk collected for one request, saved by the writer thread after the response is sent."""
+
+    def __init__(self, request_model, response_model, queries, profiles=None, profiler=None):
+        self.request_model = request_model
+        self.response_model = response_model
+        self.queries = queries
+        self.profiles = profiles or []
+        self.profiler = profiler
+
+    def save(self):
+        request_model = self.request_model
+        if self.profiler is not None:
+            stream = StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats()
+            # silk keeps the first 256 lines so the text fits its column
+            request_model.pyprofile = '\n'.join(stream.getvalue().split('\n')[:256])
+
+        sql_queries = []
+        for identifier, query in self.queries:
+            sql_query = silk_models.SQLQuery(identifier=identifier, **query)
+            sql_query.time_taken = (sql_query.end_time - sql_query.start_time).total_seconds() * 1000
+            sql_queries.append(sql_query)
+
+        # Counted once here; silk re-saves the request row for every query it stores
+        request_model.num_sql_queries = len(sql_queries) or request_model.num_sql_queries
+        with transaction.atomic():
+            request_model.save()
+            self.response_model.save()
+            silk_models.SQLQuery._base_manager.bulk_create(sql_queries, batch_size=500)
+            if self.profiles:
+                self._save_profiles()
+
+    def _save_profiles(self):
+        query_models = {query.identifier: query
+                        for query in silk_models.SQLQuery.objects.filter(request=self.request_model)}
+        for profile in self.profiles:
+            profile = dict(profile)
+            query_ids = profile.pop('queries', [])
+            profile_model = silk_models.Profile.objects.create(**profile)
+            profile_queries = [query_models[i] for i in query_ids if i in query_models]
+            if profile_queries:
+                profile_model.queries.set(profile_queries)
+
+
+class SilkWriter:
+    """Saves silk records from a background thread, dropping them when the queue is full."""
+
+    def __init__(self, max_size: int = SILK_WRITE_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._pid = None
+        self.dropped = 0
+
+    def _ensure_worker(self):
+        # The thread does not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='silk-writer', daemon=True).start()
+
+    def submit(self, record: SilkRecord):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"Silk write queue full, {self.dropped} record(s) dropped so far")
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                record.save()
+            except Exception as e:
+                logger.error(f"Failed to save silk record for {record.request_model.path}: {e}")
+            finally:
+                self._queue.task_done()
+                close_old_connections()
+
+    def drain(self, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+silk_writer = SilkWriter()
+atexit.register(silk_writer.drain)
+
+
+def build_request_model(request):
+    """silk's RequestModelFactory.construct_request_model without the INSERT at the start of the request."""
+    factory = RequestModelFactory(request)
+    body, raw_body = factory.body()
+    request_model = silk_models.Request(
+        path=request.path,
+        encoded_headers=factory.encoded_headers(),
+        method=request.method,
+        query_params=factory.query_params(),
+        view_name=factory.view_name(),
+        body=body,
+    )
+    try:
+        request_model.raw_body = raw_body
+    except UnicodeDecodeError:
+        pass
+    return request_model
+
+
+def build_response_model(response, request_model):
+    """silk's ResponseModelFactory.construct_response_model, left unsaved."""
+    body, content = ResponseModelFactory(response).body()
+    headers = {key: value for key, value in response.headers.items()}
+    response_model = silk_models.Response(
+        request=request_model,
+        status_code=response.status_code,
+        encoded_headers=json.dumps(headers, ensure_ascii=SilkyConfig().SILKY_JSON_ENSURE_ASCII),
+        body=body,
+    )
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    response_model.raw_body = base64.b64encode(content or b'').decode('ascii')
+    return response_model
+
+
+def is_admin_request(request) -> bool:
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        # API clients authenticate with a JWT, which DRF only checks inside the view
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return False
+        user = authenticated[0] if authenticated else None
+    return user is not None and (user.is_staff or getattr(user, 'user_role', None) == 'admin')
+
+
+class SampledSilkyMiddleware(SilkyMiddleware):
+    """
+    SilkyMiddleware for a sample of the traffic: SILK_SAMPLE_RATE of requests, admin requests sending the
+    X-Silk-Profile header, and the next request to a path after one that took over SILK_SLOW_REQUEST_MS.
+    Records are written by a background thread after the response instead of inside the request.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self._slow_paths = set()
+        self._slow_paths_lock = threading.Lock()
+
+    def _should_sample(self, request) -> bool:
+        if request.headers.get(PROFILE_HEADER) and is_admin_request(request):
+            return True
+        if self._slow_paths and request.path in self._slow_paths:
+            with self._slow_paths_lock:
+                self._slow_paths.discard(request.path)
+            return True
+        return random.random() < SILK_SAMPLE_RATE
+
+    def __call__(self, request):
+        if self._should_sample(request):
+            return super().__call__(request)
+
+        DataCollector().clear()
+        query_stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_stats))
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if duration_ms >= SILK_SLOW_REQUEST_MS and _should_intercept(request):
+            self._record_slow_request(request, response, duration_ms, query_stats.count)
+        return response
+
+    def _record_slow_request(self, request, response, duration_ms, query_count):
+        with self._slow_paths_lock:
+            self._slow_paths.add(request.path)
+
+        end_time = timezone.now()
+        request_model = silk_models.Request(
+            path=request.path,
+            method=request.method,
+            view_name=RequestModelFactory(request).view_name(),
+            start_time=end_time - timedelta(milliseconds=duration_ms),
+            end_time=end_time,
+            num_sql_queries=query_count,
+        )
+        response_model = silk_models.Response(request=request_model, status_code=response.status_code)
+        silk_writer.submit(SilkRecord(request_model, response_model, queries=[]))
+
+    def process_request(self, request):
+        DataCollector().clear()
+        if not _should_intercept(request):
+            return
+
+        request.silk_is_intercepted = True
+        self._apply_dynamic_mappings()
+        if not hasattr(SQLCompiler, '_execute_sql'):
+            SQLCompiler._execute_sql = SQLCompiler.execute_sql
+            SQLCompiler.execute_sql = execute_sql
+
+        silky_config = SilkyConfig()
+        should_profile = silky_config.SILKY_PYTHON_PROFILER
+        if silky_config.SILKY_PYTHON_PROFILER_FUNC:
+            should_profile = silky_config.SILKY_PYTHON_PROFILER_FUNC(request)
+        DataCollector().configure(build_request_model(request), should_profile=should_profile)
+
+    def _process_response(self, request, response):
+        collector = DataCollector()
+        collector.stop_python_profiler()
+        request_model = collector.request
+        if request_model is None:
+            return
+
+        request_model.end_time = timezone.now()
+        silk_writer.submit(SilkRecord(
+            request_model,
+            build_response_model(response, request_model),
+            queries=list(collector.queries.items()),
+            profiles=list(collector.profiles.values()),
+            profiler=getattr(collector.local, 'pythonprofiler', None),
+        ))
+        collector.clear()
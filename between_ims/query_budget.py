@@ -0,0 +1,124 @@
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+
+from between_ims.metrics import METRICS_ENABLED, registry
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_ENABLED = getattr(settings, 'QUERY_BUDGET_ENABLED', False)
+# A query shape run this many times in one request is reported as a likely N+1
+QUERY_BUDGET_REPEAT_THRESHOLD = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 3)
+
+# Transaction bookkeeping repeats by design and says nothing about the view
+IGNORED_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT', 'ROLLBACK')
+
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def query_shape(sql: str) -> str:
+    """The SQL with literals and IN lists of any length collapsed, so one query per row shares a shape."""
+    shape = _IN_LIST.sub('IN (...)', sql)
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryRecorder:
+    """connection.execute_wrapper callable keeping the SQL of every query run while it is installed."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(IGNORED_STATEMENTS):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold: int = QUERY_BUDGET_REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        shapes = Counter(query_shape(sql) for sql in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def get_query_budget(view) -> Optional[int]:
+    """The query_budget declared on a view class, or on the class behind an as_view() function."""
+    view_class = getattr(view, 'view_class', None) or getattr(view, 'cls', None) or view
+    return getattr(view_class, 'query_budget', None)
+
+
+def budget_violations(recorder: QueryRecorder, budget: Optional[int],
+                      threshold: int = QUERY_BUDGET_REPEAT_THRESHOLD) -> List[str]:
+    violations = []
+    if budget is not None and recorder.count > budget:
+        violations.append(f"{recorder.count} queries, budget is {budget}")
+    for shape, count in recorder.repeated_shapes(threshold):
+        violations.append(f"{count}x {shape}")
+    return violations
+
+
+class QueryBudgetMiddleware:
+    """
+    Logs requests that run more queries than their view's query_budget or repeat a query shape
+    QUERY_BUDGET_REPEAT_THRESHOLD times. Off unless QUERY_BUDGET_ENABLED, since it keeps every request's SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        with record_queries() as recorder:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+
+        violations = budget_violations(recorder, get_query_budget(match.func))
+        if violations:
+            logger.warning(f"Query budget exceeded by {request.method} {match.route}: " + '; '.join(violations))
+            if METRICS_ENABLED:
+                registry.inc('between_query_budget_violations_total', {'view': match.route})
+        return response
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin asserting a request stays within its view's query_budget and repeats no query shape."""
+
+    query_repeat_threshold = QUERY_BUDGET_REPEAT_THRESHOLD
+
+    def assertWithinQueryBudget(self, client, url, budget=None, **extra):
+        with record_queries() as recorder:
+            response = client.get(url, **extra)
+        self.assertLess(response.status_code, 400, response.content)
+
+        if budget is None:
+            budget = get_query_budget(resolve(url.split('?')[0]).func)
+        self.assertIsNotNone(budget, f"{url} declares no query_budget")
+        violations = budget_violations(recorder, budget, self.query_repeat_threshold)
+        self.assertFalse(violations, f"{url}:\n  " + '\n  '.join(violations))
+        return recorder, response
@@ -59,6 +59,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'between_ims.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -69,7 +70,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'silk.middleware.SilkyMiddleware',
+    'between_ims.profiling.SampledSilkyMiddleware',
+    'between_ims.query_budget.QueryBudgetMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -245,6 +247,59 @@ SPECTACULAR_SETTINGS = {
     # OTHER SETTINGS
 }
 
+# Matching
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE') or 64)
+# Encode requests from concurrent threads are merged for up to this many ms (0 disables the scheduler)
+EMBEDDING_SCHEDULER_MAX_LATENCY_MS = float(os.getenv('EMBEDDING_SCHEDULER_MAX_LATENCY_MS') or 2)
+EMBEDDING_SCHEDULER_MAX_BATCH = int(os.getenv('EMBEDDING_SCHEDULER_MAX_BATCH') or 256)
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME') or 'sentence-transformers/all-MiniLM-L6-v2'
+# 'torch', or 'onnx' / 'onnx-int8' after `manage.py export_embedding_model` (needs onnxruntime)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND') or 'torch'
+EMBEDDING_ONNX_DIR = os.getenv('EMBEDDING_ONNX_DIR') or '/tmp/huggingface/onnx/all-MiniLM-L6-v2'
+# When set, workers send encode requests to `manage.py run_embedding_server` on this Unix socket
+EMBEDDING_SERVER_SOCKET = os.getenv('EMBEDDING_SERVER_SOCKET', '')
+EMBEDDING_SERVER_MAX_BATCH = int(os.getenv('EMBEDDING_SERVER_MAX_BATCH') or 256)
+EMBEDDING_SERVER_MAX_WAIT_MS = float(os.getenv('EMBEDDING_SERVER_MAX_WAIT_MS') or 5)
+# Preload the model in a background thread when a web worker boots instead of on the first match
+EMBEDDING_WARMUP_ON_START = (os.getenv('EMBEDDING_WARMUP_ON_START') or 'False').lower() == 'true'
+MATCHING_TOP_K = int(os.getenv('MATCHING_TOP_K') or 500)
+# When enabled, requests only queue matching and embedding jobs and `manage.py run_matching_worker` runs them
+MATCHING_WORKER_ENABLED = (os.getenv('MATCHING_WORKER_ENABLED') or 'False').lower() == 'true'
+# 'mmap' shares one on-disk store between the workers on a host, 'redis' between hosts, 'django' is per process
+EMBEDDING_CACHE_BACKEND = os.getenv('EMBEDDING_CACHE_BACKEND') or 'mmap'
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH') or '/tmp/between_embeddings.cache'
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES') or 50000)
+EMBEDDING_CACHE_REDIS_URL = os.getenv('EMBEDDING_CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+
+# Metrics
+METRICS_ENABLED = (os.getenv('METRICS_ENABLED') or 'True').lower() == 'true'
+# Each process writes its metrics here and /metrics sums them; files of exited processes on the same host are
+# removed, empty it when the service is redeployed to other hosts
+METRICS_DIR = os.getenv('METRICS_DIR') or '/tmp/between_metrics'
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL') or 5)
+# Bearer token required by /metrics; without one the endpoint is closed unless METRICS_ALLOW_PRIVATE lets
+# private addresses scrape it (only safe when the app is not behind a reverse proxy on the private network)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOW_PRIVATE = (os.getenv('METRICS_ALLOW_PRIVATE') or 'False').lower() == 'true'
+
+# Silk profiling
+SILKY_MIDDLEWARE_CLASS = 'between_ims.profiling.SampledSilkyMiddleware'
+# Share of requests recorded in full; admins can force one with the X-Silk-Profile header
+SILK_SAMPLE_RATE = float(os.getenv('SILK_SAMPLE_RATE') or 0.01)
+# Slower requests are always stored as a summary and the next request to the same path is recorded in full
+SILK_SLOW_REQUEST_MS = float(os.getenv('SILK_SLOW_REQUEST_MS') or 2000)
+SILK_WRITE_QUEUE_SIZE = int(os.getenv('SILK_WRITE_QUEUE_SIZE') or 1000)
+
+# Query budgets: log requests over their view's query_budget or repeating a query shape (likely N+1s)
+QUERY_BUDGET_ENABLED = (os.getenv('QUERY_BUDGET_ENABLED') or 'False').lower() == 'true'
+QUERY_BUDGET_REPEAT_THRESHOLD = int(os.getenv('QUERY_BUDGET_REPEAT_THRESHOLD') or 3)
+
+# Maintenance (run_maintenance): posting expiry/reopening, the purge of soft-deleted postings and the daily
+# rollover of skipped recommendations and tap counts
+POSTING_MAINTENANCE_INTERVAL = float(os.getenv('POSTING_MAINTENANCE_INTERVAL') or 300)
+POSTING_MAINTENANCE_BATCH_SIZE = int(os.getenv('POSTING_MAINTENANCE_BATCH_SIZE') or 500)
+DELETED_POSTING_RETENTION_DAYS = int(os.getenv('DELETED_POSTING_RETENTION_DAYS') or 3)
+
 # Weasyprint url
 WEASYPRINT_SERVICE_URL = os.getenv("WEASYPRINT_SERVICE_URL")
 
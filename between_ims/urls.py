@@ -21,11 +21,13 @@ from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from between_ims.metrics import metrics_view
 from user_account.views import MyTokenObtainPairView
 
 urlpatterns = [
     path('zxnmcbzxnmbcasjkdjaksdqwuioeiowue1289738923745982374892345srdfgsdfghkljsdfg', admin.site.urls),
     path('silk/', include('silk.urls', namespace='silk')),
+    path('metrics', metrics_view),
     path('api/user_account/', include('user_account.urls')),
     path('api/client_matching/', include('client_matching.urls')),
     path('api/cea_management/', include('cea_management.urls')),
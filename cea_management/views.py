@@ -46,7 +46,7 @@ class CEAMixin:
     # get the cea instance of user & return error if not found
     def get_cea_or_403(self, user):
         try:
-            return CareerEmplacementAdmin.objects.get(user=user)
+            return CareerEmplacementAdmin.objects.select_related('school').get(user=user)
         except CareerEmplacementAdmin.DoesNotExist:
             raise PermissionDenied("User is not a Career Emplacement Admin. Access denied.")
 
@@ -58,6 +58,7 @@ class CEAMixin:
 class OJTCoordinatorListView(CEAMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsCEA]
     serializer_class = GetOJTCoordinatorSerializer
+    query_budget = 5
 
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
 
@@ -84,7 +85,8 @@ class OJTCoordinatorListView(CEAMixin, generics.ListAPIView):
     def get_queryset(self):
         cea = self.get_cea_or_403(self.request.user)
         queryset = OJTCoordinator.objects.filter(department__school=cea.school,
-                                                 user__status__in=['Active', 'Inactive', 'Suspended'])
+                                                 user__status__in=['Active', 'Inactive', 'Suspended']
+                                                 ).select_related('user', 'program', 'department')
 
         user = self.request.query_params.get('user')
         if user:
@@ -222,6 +224,7 @@ class RemoveOJTCoordinatorView(CEAMixin, generics.DestroyAPIView):
 class ApplicantListView(CEAMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsCEA]
     serializer_class = GetApplicantSerializer
+    query_budget = 13
 
     filter_backends = [filters.SearchFilter]
 
@@ -234,7 +237,8 @@ class ApplicantListView(CEAMixin, generics.ListAPIView):
 
     def get_queryset(self):
         cea = self.get_cea_or_403(self.request.user)
-        return Applicant.objects.filter(school=cea.school, user__status__in=['Active'])
+        return GetApplicantSerializer.eager_load(Applicant.objects.filter(school=cea.school,
+                                                                          user__status__in=['Active']))
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -254,6 +258,7 @@ class ApplicantListView(CEAMixin, generics.ListAPIView):
 class SchoolPartnershipListView(CEAMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsCEA]
     serializer_class = SchoolPartnershipSerializer
+    query_budget = 4
 
     filter_backends = [filters.SearchFilter]
     search_fields = ['company__company_name']
@@ -316,6 +321,7 @@ class CompanyListView(CEAMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsCEA]
 
     serializer_class = CompanyListSerializer
+    query_budget = 4
     filter_backends = [filters.SearchFilter]
     search_fields = ['company_name']
 
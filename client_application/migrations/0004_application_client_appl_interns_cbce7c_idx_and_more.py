@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_application', '0003_alter_application_applicant'),
+        ('client_matching', '0014_internshiprecommendation_feed_rank_and_more'),
+        ('user_account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['internship_posting', 'company_status'], name='client_appl_interns_cbce7c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['internship_posting', 'status'], name='client_appl_interns_5cab8d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['applicant', 'applicant_status'], name='client_appl_applica_50e775_idx'),
+        ),
+    ]
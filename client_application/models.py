@@ -31,6 +31,14 @@ class Application(models.Model):
         ('Deleted', 'Deleted'),
     ], default='Unread')
 
+    class Meta:
+        indexes = [
+            # Companies reach their applications through their postings, so the posting leads the company indexes
+            models.Index(fields=['internship_posting', 'company_status']),
+            models.Index(fields=['internship_posting', 'status']),
+            models.Index(fields=['applicant', 'applicant_status']),
+        ]
+
     def __str__(self):
         return (f'{self.application_id} - {self.internship_posting.internship_position} - {self.applicant.first_name}'
                 f' {self.applicant.last_name} - {self.status}')
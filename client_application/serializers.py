@@ -22,6 +22,10 @@ class ApplicationListSerializer(serializers.ModelSerializer):
                   'applicant_name', 'internship_position', 'applicant_address',
                   'application_id', 'status', 'application_date', 'applicant_status', 'company_status']
 
+    @classmethod
+    def eager_load(cls, queryset):
+        return queryset.select_related('internship_posting__company', 'applicant')
+
     def get_applicant_name(self, obj):
         first_name = obj.applicant.first_name or ''
         last_name = obj.applicant.last_name or ''
@@ -226,6 +230,10 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = ['notification_id', 'application', 'created_at', 'notification_text', 'notification_type',
                   'internship_position']
 
+    @classmethod
+    def eager_load(cls, queryset):
+        return queryset.select_related('application__internship_posting')
+
     def get_internship_position(self, obj):
         position = obj.application.internship_posting.internship_position
         return position
@@ -379,6 +387,15 @@ class ListApplicationSerializer(serializers.ModelSerializer):
                     'pic_landline_number'
                 ]
 
+    select_related_fields = ['internship_posting__company', 'internship_posting__person_in_charge']
+    prefetch_related_fields = ['internship_posting__required_hard_skills', 'internship_posting__required_soft_skills',
+                               'internship_posting__key_tasks', 'internship_posting__min_qualifications',
+                               'internship_posting__benefits']
+
+    @classmethod
+    def eager_load(cls, queryset):
+        return queryset.select_related(*cls.select_related_fields).prefetch_related(*cls.prefetch_related_fields)
+
     def get_required_hard_skills(self, obj):
         if obj.internship_posting:
             return [
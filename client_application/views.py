@@ -29,6 +29,7 @@ client_application_tag = extend_schema(tags=["client_application"])
 class ApplicationListView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ApplicationListSerializer
+    query_budget = 2
 
     def get_queryset(self):
         user = self.request.user
@@ -41,6 +42,9 @@ class ApplicationListView(ListAPIView):
         else:
             return Application.objects.none()
 
+        # Before any union, after which the queryset can no longer be changed
+        queryset = ApplicationListSerializer.eager_load(queryset)
+
         application_status = self.request.query_params.get('application_status')
         allowed_status = ['Onboarding', 'Pending', 'Rejected', 'Dropped', 'Accepted']
         if application_status:
@@ -95,7 +99,7 @@ class ApplicationListView(ListAPIView):
 
             if len(name_parts) > 1:
                 queryset = queryset.union(
-                    queryset.model.objects.filter(
+                    ApplicationListSerializer.eager_load(queryset.model.objects).filter(
                         Q(applicant__first_name__icontains=name_parts[0],
                           applicant__last_name__icontains=' '.join(name_parts[1:])) |
                         Q(applicant__last_name__icontains=name_parts[-1],
@@ -146,22 +150,23 @@ class ApplicationDetailView(ListAPIView):
 class NotificationView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = NotificationSerializer
+    query_budget = 2
 
     def get_queryset(self):
         user = self.request.user
         application = self.request.query_params.get('application')
 
         if user.user_role == 'applicant':
-            return Notification.objects.filter(
+            return NotificationSerializer.eager_load(Notification.objects.filter(
                 application=application,
                 notification_type='Applicant'
-            )
+            ))
 
         elif user.user_role == 'company':
-            return Notification.objects.filter(
+            return NotificationSerializer.eager_load(Notification.objects.filter(
                 application=application,
                 notification_type='Company'
-            )
+            ))
 
         else:
             return Notification.objects.none()
@@ -2,10 +2,10 @@ from django.contrib import admin
 from django.utils.safestring import mark_safe
 
 from .models import (HardSkillsTagList, SoftSkillsTagList, InternshipPosting, InternshipRecommendation,
-                     Report, MinQualification, Benefit, Advertisement, KeyTask, PersonInCharge)
+                     Report, MinQualification, Benefit, Advertisement, KeyTask, PersonInCharge, MatchingJob)
 from .utils import InternshipPostingStatusFilter
 
-model_to_register = [MinQualification, Benefit, Advertisement, KeyTask, PersonInCharge]
+model_to_register = [MinQualification, Benefit, Advertisement, KeyTask, PersonInCharge, MatchingJob]
 
 for model in model_to_register:
     admin.site.register(model)
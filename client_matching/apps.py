@@ -1,6 +1,18 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ClientMatchingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'client_matching'
+
+    def ready(self):
+        # Web workers only; the matching worker and embedding server warm up in their own commands
+        if getattr(settings, 'EMBEDDING_WARMUP_ON_START', False) and os.path.basename(sys.argv[0]) != 'manage.py':
+            from client_matching.inference import warm_up_inference_backend
+
+            threading.Thread(target=warm_up_inference_backend, name='embedding-warmup', daemon=True).start()
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from client_matching.inference import EMBEDDING_MODEL_FINGERPRINT
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process dev server, writes are only guarded by the thread lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_BACKEND = getattr(settings, 'EMBEDDING_CACHE_BACKEND', 'mmap')
+EMBEDDING_CACHE_PATH = getattr(settings, 'EMBEDDING_CACHE_PATH', '/tmp/between_embeddings.cache')
+EMBEDDING_CACHE_MAX_ENTRIES = getattr(settings, 'EMBEDDING_CACHE_MAX_ENTRIES', 50000)
+EMBEDDING_CACHE_REDIS_URL = getattr(settings, 'EMBEDDING_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+EMBEDDING_CACHE_TIMEOUT = 3600
+
+KEY_PREFIX = 'text_embedding:'
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(f'{EMBEDDING_MODEL_FINGERPRINT}\0{text}'.encode('utf-8')).digest()
+
+
+class DjangoEmbeddingCache:
+    """Per-process fallback on the default Django cache, storing raw float32 bytes."""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        keys = {KEY_PREFIX + text_digest(text).hex(): text for text in texts}
+        found = {}
+        for key, value in cache.get_many(list(keys)).items():
+            if isinstance(value, (bytes, bytearray)) and len(value) == self.dimension * 4:
+                found[keys[key]] = np.frombuffer(value, dtype=np.float32)
+        return found
+
+    def set_many(self, embeddings: Dict[str, np.ndarray]):
+        cache.set_many({
+            KEY_PREFIX + text_digest(text).hex(): np.asarray(embedding, dtype=np.float32).tobytes()
+            for text, embedding in embeddings.items()
+        }, EMBEDDING_CACHE_TIMEOUT)
+
+
+class MmapEmbeddingCache:
+    """
+    Fixed-size open-addressing table in a memory-mapped file shared by every worker on the host. Each slot
+    holds the text_digest of the text, a last-used timestamp and the float32 vector. A text can live in one of
+    PROBE_LENGTH consecutive slots; when they are all taken the least recently used one is overwritten, so
+    the file never grows past max_entries.
+
+    Reads take no lock: a writer clears the slot's digest before overwriting the vector and sets it last, and
+    readers re-check the digest after copying the vector. Writers serialise on flock.
+    """
+
+    MAGIC = b'BTWNEMB1'
+    PROBE_LENGTH = 8
+
+    def __init__(self, path: str, dimension: int, max_entries: int):
+        self.path = path
+        self.dimension = dimension
+        self.capacity = max_entries
+        self.slot_dtype = np.dtype([
+            ('digest', 'V32'),
+            ('used_at', '<u8'),
+            ('vector', '<f4', (dimension,)),
+        ])
+        self.header_dtype = np.dtype([
+            ('magic', 'S8'),
+            ('dimension', '<u4'),
+            ('capacity', '<u4'),
+        ])
+        self._thread_lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        expected_size = self.header_dtype.itemsize + self.capacity * self.slot_dtype.itemsize
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b') as f:
+            self._flock(f, exclusive=True)
+            try:
+                header = np.fromfile(self.path, dtype=self.header_dtype, count=1)
+                valid = (
+                    os.path.getsize(self.path) == expected_size and len(header) == 1
+                    and header[0]['magic'] == self.MAGIC
+                    and header[0]['dimension'] == self.dimension
+                    and header[0]['capacity'] == self.capacity
+                )
+                if not valid:
+                    logger.info(f"Creating embedding cache at {self.path} with {self.capacity} slots")
+                    # A new file swapped in, not the old one truncated: processes that still map the old one
+                    # would fault on the pages cut from under them
+                    tmp_path = f'{self.path}.{os.getpid()}.tmp'
+                    with open(tmp_path, 'wb') as tmp:
+                        tmp.write(np.array([(self.MAGIC, self.dimension, self.capacity)], dtype=self.header_dtype)
+                                  .tobytes())
+                        tmp.truncate(expected_size)
+                    os.replace(tmp_path, self.path)
+            finally:
+                self._flock(f, exclusive=False)
+
+        self._slots = np.memmap(self.path, dtype=self.slot_dtype, mode='r+',
+                                offset=self.header_dtype.itemsize, shape=(self.capacity,))
+
+    @staticmethod
+    def _flock(f, exclusive: bool):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_UN)
+
+    def _probe(self, digest: bytes) -> np.ndarray:
+        start = int.from_bytes(digest[:8], 'little') % self.capacity
+        return (start + np.arange(min(self.PROBE_LENGTH, self.capacity))) % self.capacity
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        stamp = int(time.time())
+        for text in texts:
+            digest = text_digest(text)
+            for slot in self._probe(digest):
+                record = self._slots[slot]
+                if record['digest'].tobytes() != digest:
+                    continue
+                vector = np.array(record['vector'], dtype=np.float32)
+                if self._slots[slot]['digest'].tobytes() == digest:
+                    found[text] = vector
+                    self._slots[slot]['used_at'] = stamp
+                break
+        return found
+
+    def set_many(self, embeddings: Dict[str, np.ndarray]):
+        stamp = int(time.time())
+        empty = bytes(32)
+        with self._thread_lock, open(self.path, 'rb') as lock_file:
+            self._flock(lock_file, exclusive=True)
+            try:
+                for text, embedding in embeddings.items():
+                    digest = text_digest(text)
+                    probe = self._probe(digest)
+                    digests = [self._slots[slot]['digest'].tobytes() for slot in probe]
+
+                    if digest in digests:
+                        slot = probe[digests.index(digest)]
+                    elif empty in digests:
+                        slot = probe[digests.index(empty)]
+                    else:
+                        slot = probe[int(np.argmin(self._slots['used_at'][probe]))]
+
+                    self._slots[slot]['digest'] = empty
+                    self._slots[slot]['vector'] = np.asarray(embedding, dtype=np.float32)
+                    self._slots[slot]['used_at'] = stamp
+                    self._slots[slot]['digest'] = digest
+            finally:
+                self._flock(lock_file, exclusive=False)
+
+
+class RedisEmbeddingCache:
+    """For multi-node deployments. Eviction is left to the server's maxmemory policy and the key timeout."""
+
+    def __init__(self, url: str, dimension: int):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("EMBEDDING_CACHE_BACKEND='redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.dimension = dimension
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        if not texts:
+            return {}
+        values = self.client.mget([KEY_PREFIX + text_digest(text).hex() for text in texts])
+        return {
+            text: np.frombuffer(value, dtype=np.float32)
+            for text, value in zip(texts, values)
+            if value is not None and len(value) == self.dimension * 4
+        }
+
+    def set_many(self, embeddings: Dict[str, np.ndarray]):
+        pipeline = self.client.pipeline(transaction=False)
+        for text, embedding in embeddings.items():
+            pipeline.set(KEY_PREFIX + text_digest(text).hex(), np.asarray(embedding, dtype=np.float32).tobytes(),
+                         ex=EMBEDDING_CACHE_TIMEOUT)
+        pipeline.execute()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(dimension: int):
+    if EMBEDDING_CACHE_BACKEND == 'mmap':
+        try:
+            return MmapEmbeddingCache(EMBEDDING_CACHE_PATH, dimension, EMBEDDING_CACHE_MAX_ENTRIES)
+        except OSError as e:
+            logger.warning(f"Embedding cache file unavailable, using the Django cache instead: {e}")
+    elif EMBEDDING_CACHE_BACKEND == 'redis':
+        return RedisEmbeddingCache(EMBEDDING_CACHE_REDIS_URL, dimension)
+    elif EMBEDDING_CACHE_BACKEND != 'django':
+        raise ImproperlyConfigured(f"Unknown EMBEDDING_CACHE_BACKEND '{EMBEDDING_CACHE_BACKEND}'")
+    return DjangoEmbeddingCache(dimension)
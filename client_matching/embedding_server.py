@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import List
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_SERVER_SOCKET = getattr(settings, 'EMBEDDING_SERVER_SOCKET', '')
+EMBEDDING_SERVER_MAX_BATCH = getattr(settings, 'EMBEDDING_SERVER_MAX_BATCH', 256)
+EMBEDDING_SERVER_MAX_WAIT_MS = getattr(settings, 'EMBEDDING_SERVER_MAX_WAIT_MS', 5)
+EMBEDDING_SERVER_TIMEOUT = 30
+
+# A worker that cannot reach the server encodes locally and tries the socket again after this many seconds
+EMBEDDING_SERVER_RETRY_AFTER = 30
+
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+# Request:  4-byte length + UTF-8 JSON {"texts": [...]}
+# Response: status byte, row count, dimension, then rows * dimension float32 values.
+#           On error the status is 1, the row count is the length of the UTF-8 message that follows.
+RESPONSE_HEADER = struct.Struct('>BII')
+LENGTH_PREFIX = struct.Struct('>I')
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            raise ConnectionError("Embedding server connection closed")
+        received += count
+    return bytes(buffer)
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        # Clients keep their connection open and send one request after another
+        while True:
+            try:
+                (length,) = LENGTH_PREFIX.unpack(_recv_exact(self.request, LENGTH_PREFIX.size))
+                if length > MAX_FRAME_BYTES:
+                    raise ValueError(f"Request of {length} bytes is too large")
+                texts = json.loads(_recv_exact(self.request, length).decode('utf-8'))['texts']
+            except ConnectionError:
+                return
+            except (ValueError, KeyError, TypeError) as e:
+                # The rest of the stream cannot be framed any more, so the error is sent and the connection closed
+                logger.warning(f"Rejecting malformed embedding request: {e!r}")
+                self._send_error(f"Malformed request: {e!r}")
+                return
+
+            try:
+                embeddings = self.server.scheduler.encode(texts)
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+                rows, dimension = embeddings.shape if embeddings.size else (0, 0)
+                self.request.sendall(RESPONSE_HEADER.pack(0, rows, dimension) + embeddings.tobytes())
+            except Exception as e:
+                self._send_error(str(e))
+
+    def _send_error(self, message: str):
+        message = message.encode('utf-8')
+        try:
+            self.request.sendall(RESPONSE_HEADER.pack(1, len(message), 0) + message)
+        except OSError:
+            pass
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every gunicorn thread of every worker may connect at once
+    request_queue_size = 128
+
+    def __init__(self, socket_path: str, scheduler):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+        # A utils.EncodingScheduler, which merges the requests of all connections into shared batches
+        self.scheduler = scheduler
+        super().__init__(socket_path, EmbeddingRequestHandler)
+
+
+class EmbeddingClient:
+    """Blocking client with one persistent connection per thread."""
+
+    def __init__(self, socket_path: str, timeout: float = EMBEDDING_SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        payload = json.dumps({'texts': texts}).encode('utf-8')
+        try:
+            sock = self._connection()
+            sock.sendall(LENGTH_PREFIX.pack(len(payload)) + payload)
+            status, rows, dimension = RESPONSE_HEADER.unpack(_recv_exact(sock, RESPONSE_HEADER.size))
+            if status:
+                message = _recv_exact(sock, rows).decode('utf-8')
+                # The server may have closed the connection after the error, the next request opens a new one
+                self.close()
+                raise RuntimeError(f"Embedding server error: {message}")
+            body = _recv_exact(sock, rows * dimension * 4)
+        except OSError:
+            self.close()
+            raise
+        return np.frombuffer(body, dtype=np.float32).reshape(rows, dimension)
+
+
+class EmbeddingServerBackend:
+    """Inference backend that forwards to run_embedding_server, encoding locally while it is unreachable."""
+
+    name = 'server'
+
+    def __init__(self, socket_path: str, fallback_factory):
+        self.client = EmbeddingClient(socket_path)
+        self.fallback_factory = fallback_factory
+        self._fallback = None
+        self._retry_at = 0.0
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        if time.monotonic() >= self._retry_at:
+            try:
+                return self.client.encode(texts)
+            except OSError as e:
+                logger.warning(f"Embedding server at {self.client.socket_path} unreachable, encoding locally: {e}")
+                self._retry_at = time.monotonic() + EMBEDDING_SERVER_RETRY_AFTER
+
+        if self._fallback is None:
+            self._fallback = self.fallback_factory()
+        return self._fallback.encode(texts, batch_size)
@@ -0,0 +1,120 @@
+import random
+from typing import Dict, Optional
+
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Max, Q
+
+from client_matching.models import InternshipRecommendation, RecommendationFeedEntry
+
+# Feed filter -> InternshipPosting field
+FEED_FILTER_FIELDS = {
+    'is_paid_internship': 'is_paid_internship',
+    'is_only_for_practicum': 'is_only_for_practicum',
+    'modality': 'modality',
+}
+
+
+def feed_filter_q(filter_state: Dict, prefix: str = '') -> Q:
+    condition = Q()
+    for name, field in FEED_FILTER_FIELDS.items():
+        value = filter_state.get(name)
+        if value is not None and value != '':
+            condition &= Q(**{f'{prefix}internship_posting__{field}': value})
+    return condition
+
+
+def apply_feed_filters(queryset, filter_state: Dict, prefix: str = ''):
+    return queryset.filter(feed_filter_q(filter_state, prefix))
+
+
+def eligible_recommendations(applicant_id):
+    return InternshipRecommendation.objects.filter(
+        applicant_id=applicant_id,
+        status='Pending',
+        is_current=False,
+        internship_posting__status='Open',
+    )
+
+
+@transaction.atomic
+def rebuild_recommendation_feed(applicant_id) -> int:
+    """Replace the applicant's queue with all of their pending recommendations in a fresh random order."""
+    recommendation_ids = list(eligible_recommendations(applicant_id).values_list('recommendation_id', flat=True))
+    random.shuffle(recommendation_ids)
+
+    RecommendationFeedEntry.objects.filter(applicant_id=applicant_id).delete()
+    RecommendationFeedEntry.objects.bulk_create([
+        RecommendationFeedEntry(applicant_id=applicant_id, recommendation_id=recommendation_id, position=position)
+        for position, recommendation_id in enumerate(recommendation_ids)
+    ], batch_size=500)
+    return len(recommendation_ids)
+
+
+def retire_recommendations(recommendations) -> int:
+    """Delete the unseen ones among recommendations a re-match no longer selects; their feed entries go with them."""
+    deleted, _ = recommendations.filter(status='Pending', is_current=False).delete()
+    return deleted
+
+
+def add_to_recommendation_feeds(recommendations):
+    """
+    Insert the pending recommendations that are not queued yet into their applicants' queues at random
+    positions, so a new match shows up without reshuffling the rest of the feed.
+    """
+    # Read the keys back from the database; MySQL does not return them from bulk_create
+    pairs = list(recommendations.filter(status='Pending', is_current=False, feed_entry__isnull=True)
+                 .values_list('recommendation_id', 'applicant_id'))
+    if not pairs:
+        return
+    queue_ends = dict(
+        RecommendationFeedEntry.objects.filter(applicant_id__in={applicant_id for _, applicant_id in pairs})
+        .values('applicant_id').annotate(end=Max('position')).values_list('applicant_id', 'end')
+    )
+    RecommendationFeedEntry.objects.bulk_create([
+        RecommendationFeedEntry(applicant_id=applicant_id, recommendation_id=recommendation_id,
+                                position=random.randint(0, queue_ends.get(applicant_id, 0)))
+        for recommendation_id, applicant_id in pairs
+    ], batch_size=500, ignore_conflicts=True)
+
+
+def pop_recommendation(applicant_id, filter_state: Dict) -> Optional[InternshipRecommendation]:
+    """
+    Take the first queued recommendation that is still pending, open and passes the feed filters. Dead entries
+    read on the way (answered, already shown or of a deleted posting) are deleted with it; entries of closed or
+    expired postings stay, as those can reopen.
+    """
+    dead = (~Q(recommendation__status='Pending') | Q(recommendation__is_current=True)
+            | Q(recommendation__internship_posting__status='Deleted'))
+    live = Q(recommendation__status='Pending', recommendation__internship_posting__status='Open') \
+        & feed_filter_q(filter_state, prefix='recommendation__')
+    entries = RecommendationFeedEntry.objects.filter(dead | live, applicant_id=applicant_id) \
+        .annotate(is_dead=ExpressionWrapper(dead, output_field=BooleanField())) \
+        .select_related('recommendation').order_by('position', 'feed_entry_id')
+
+    entry, dead_ids = None, []
+    for candidate in entries.iterator(chunk_size=100):
+        if not candidate.is_dead:
+            entry = candidate
+            break
+        dead_ids.append(candidate.pk)
+
+    removed_ids = dead_ids + ([entry.pk] if entry is not None else [])
+    if removed_ids:
+        RecommendationFeedEntry.objects.filter(pk__in=removed_ids).delete()
+    return entry.recommendation if entry is not None else None
+
+
+def sample_recommendation(applicant_id, filter_state: Dict) -> Optional[InternshipRecommendation]:
+    """
+    A random eligible recommendation: the first one at or after a random feed_rank, wrapping around. Both
+    lookups are index seeks, so the cost does not grow with the number of recommendations.
+    """
+    eligible = apply_feed_filters(eligible_recommendations(applicant_id), filter_state)
+    rank = random.random()
+    return (eligible.filter(feed_rank__gte=rank).order_by('feed_rank').first()
+            or eligible.filter(feed_rank__lt=rank).order_by('feed_rank').first())
+
+
+def next_recommendation(applicant_id, filter_state: Dict) -> Optional[InternshipRecommendation]:
+    # Pending recommendations that are not queued are sampled once the queue runs dry
+    return pop_recommendation(applicant_id, filter_state) or sample_recommendation(applicant_id, filter_state)
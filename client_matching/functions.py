@@ -1,62 +1,212 @@
 import logging
+from decimal import Decimal
+from typing import List, Optional
 
+import numpy as np
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Max
 
-from client_matching.models import InternshipPosting
+from client_matching.feed import add_to_recommendation_feeds, retire_recommendations
+from client_matching.instrumentation import increment
+from client_matching.jobs import MATCHING_WORKER_ENABLED, enqueue_applicant_matching
+from client_matching.models import ApplicantEmbedding, InternshipPosting, InternshipRecommendation
+from client_matching.posting_index import posting_index
 from client_matching.serializers import InternshipMatchSerializer
-import random
-from django.db.models import Max
+from client_matching.utils import (EMBEDDING_DIMENSION, SIMILARITY_THRESHOLD, coordinate_array, embedding_from_bytes,
+                                   get_applicant_embedding, refresh_posting_embedding, score_matches)
+from user_account.models import Applicant
 
 
 logger = logging.getLogger(__name__)
 
 
-def run_internship_matching(applicant):
-    try:
-        cache_key = f"matching_in_progress:{applicant.user.user_id}"
+def get_matching_mode(applicant) -> Optional[str]:
+    """
+    'full' when the applicant has never been matched or their profile changed since, 'incremental' when only
+    postings changed, None when the stored recommendations are still current.
+    """
+    last_matched = applicant.last_matched
+    if last_matched is None:
+        return 'full'
 
-        if cache.get(cache_key):
-            logger.info(f"[MATCHING SKIP] Matching already in progress for applicant {applicant.user.user_id}")
-            return
+    user_modified = getattr(applicant.user, 'date_modified', None)
+    if user_modified and user_modified > last_matched:
+        return 'full'
+
+    latest_modified = InternshipPosting.objects.exclude(status='Deleted') \
+        .aggregate(Max('date_modified'))['date_modified__max']
+    if latest_modified and latest_modified > last_matched:
+        return 'incremental'
 
-        last_matched = applicant.last_matched
-        user_modified = getattr(applicant.user, 'date_modified', None)
-        latest_modified = InternshipPosting.objects.exclude(status='Deleted') \
-            .aggregate(Max('date_modified'))['date_modified__max']
+    return None
 
-        should_run_matching = False
 
-        if latest_modified and (last_matched is None or latest_modified > last_matched):
-            should_run_matching = True
-        if user_modified and (last_matched is None or user_modified > last_matched):
-            should_run_matching = True
+def match_applicant(applicant, mode: str = 'full'):
+    cache_key = f"matching_in_progress:{applicant.user.user_id}"
 
-        if not should_run_matching:
+    if cache.get(cache_key):
+        logger.info(f"[MATCHING SKIP] Matching already in progress for applicant {applicant.user.user_id}")
+        return
+
+    logger.info(f"[MATCHING START] Running {mode} matching for applicant {applicant.user.user_id}")
+    cache.set(cache_key, True, timeout=300)
+
+    context = {'applicant': applicant}
+    if mode == 'incremental':
+        context['changed_since'] = applicant.last_matched
+
+    try:
+        serializer = InternshipMatchSerializer(context=context)
+        serializer.create(validated_data={})
+        logger.info(f"[MATCHING COMPLETE] Matching complete for applicant {applicant.user.user_id}")
+    except Exception as e:
+        logger.error(f"[MATCHING ERROR] Matching failed for applicant {applicant.user.user_id}: {e}")
+        raise
+    finally:
+        cache.delete(cache_key)
+
+
+def run_internship_matching(applicant):
+    try:
+        mode = get_matching_mode(applicant)
+        if mode is None:
             logger.info(f"[MATCHING SKIP] Applicant {applicant.user.user_id} has no significant changes.")
             return
 
-        logger.info(f"[MATCHING START] Running matching for applicant {applicant.user.user_id}")
-        cache.set(cache_key, True, timeout=300)
+        if MATCHING_WORKER_ENABLED:
+            enqueue_applicant_matching(applicant)
+            logger.info(f"[MATCHING QUEUED] Matching queued for applicant {applicant.user.user_id}")
+            return
 
-        try:
-            serializer = InternshipMatchSerializer(context={'applicant': applicant})
-            serializer.create(validated_data={})
-            logger.info(f"[MATCHING COMPLETE] Matching complete for applicant {applicant.user.user_id}")
-        except Exception as e:
-            logger.error(f"[MATCHING ERROR] Matching failed for applicant {applicant.user.user_id}: {e}")
-            raise
-        finally:
-            cache.delete(cache_key)
+        match_applicant(applicant, mode)
 
     except Exception as e:
         logger.error(f"[MATCHING SYSTEM ERROR] Failed to execute matching logic: {e}")
 
 
-def fisher_yates_shuffle(queryset):
-    items = list(queryset)
-    n = len(items)
-    for i in range(n - 1, 0, -1):
-        j = random.randint(0, i)
-        items[i], items[j] = items[j], items[i]
-    return items
+def load_applicant_matrix():
+    """Stored embeddings of all active applicants as one (N, EMBEDDING_DIMENSION) matrix plus their ids."""
+    rows = ApplicantEmbedding.objects.filter(applicant__user__status='Active').values_list(
+        'applicant_id', 'vector', 'applicant__preferred_modality', 'applicant__latitude', 'applicant__longitude'
+    )
+
+    applicant_ids, vectors, modalities, latitudes, longitudes = [], [], [], [], []
+    for applicant_id, vector, modality, latitude, longitude in rows.iterator(chunk_size=1000):
+        try:
+            vectors.append(embedding_from_bytes(vector))
+        except ValueError as e:
+            logger.warning(f"Skipping stored embedding for applicant {applicant_id}: {e}")
+            continue
+        applicant_ids.append(applicant_id)
+        modalities.append(str(modality).strip() if modality else "")
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+    return applicant_ids, matrix, modalities, latitudes, longitudes
+
+
+@transaction.atomic
+def upsert_posting_recommendations(posting, applicant_ids: List, similarity_scores: List[float]):
+    existing_recommendations = {
+        rec.applicant_id: rec
+        for rec in InternshipRecommendation.objects.filter(
+            internship_posting=posting,
+            applicant_id__in=applicant_ids
+        ).only('recommendation_id', 'applicant_id', 'similarity_score', 'status')
+    }
+
+    recs_to_create = []
+    recs_to_update = []
+
+    for applicant_id, score in zip(applicant_ids, similarity_scores):
+        similarity_score = Decimal(str(score))
+        existing = existing_recommendations.get(applicant_id)
+        if existing:
+            existing.similarity_score = similarity_score
+            existing.status = existing.status if existing.status in ['Submitted', 'Skipped'] else 'Pending'
+            recs_to_update.append(existing)
+        else:
+            recs_to_create.append(InternshipRecommendation(
+                applicant_id=applicant_id,
+                internship_posting=posting,
+                similarity_score=similarity_score,
+                status='Pending'
+            ))
+
+    if recs_to_create:
+        InternshipRecommendation.objects.bulk_create(recs_to_create, batch_size=500)
+    if recs_to_update:
+        InternshipRecommendation.objects.bulk_update(recs_to_update, ['similarity_score', 'status'], batch_size=500)
+    # Like an incremental match: new and re-pended recommendations join the feed, the rest keep their place
+    add_to_recommendation_feeds(InternshipRecommendation.objects.filter(
+        internship_posting=posting, applicant_id__in=applicant_ids))
+    increment('recommendations.created', len(recs_to_create))
+    increment('recommendations.updated', len(recs_to_update))
+    return len(recs_to_create), len(recs_to_update)
+
+
+def match_posting_applicants(posting):
+    """
+    Score one posting against every active applicant with a stored embedding in a single matrix-vector
+    product. Applicants get a recommendation when the score clears SIMILARITY_THRESHOLD and the posting ranks
+    in their top MATCHING_TOP_K, as in a full match; unseen recommendations of the others are retired.
+    """
+    posting = InternshipPosting.objects.filter(pk=posting.pk, status='Open').first()
+    if posting is None:
+        return
+
+    posting_embedding = refresh_posting_embedding(posting)
+    posting_norm = np.linalg.norm(posting_embedding)
+    if not posting_norm:
+        logger.warning(f"[FAN-OUT SKIP] Posting {posting.internship_posting_id} has no embedding")
+        return
+
+    applicant_ids, matrix, modalities, latitudes, longitudes = load_applicant_matrix()
+    if not applicant_ids:
+        return
+
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    raw_similarity = (matrix @ posting_embedding) / (norms * posting_norm)
+
+    scores = score_matches(
+        raw_similarity,
+        modalities,
+        coordinate_array(latitudes),
+        coordinate_array(longitudes),
+        posting.modality or "",
+        coordinate_array([posting.latitude])[0],
+        coordinate_array([posting.longitude])[0],
+    )
+    final_scores = np.round(scores['similarity_score'], 3)
+    in_top_k = posting_index.in_top_k(matrix, raw_similarity)
+    selected = np.flatnonzero((final_scores >= SIMILARITY_THRESHOLD) & in_top_k)
+    dropped = np.flatnonzero(~in_top_k)
+
+    created, updated = upsert_posting_recommendations(
+        posting,
+        [applicant_ids[i] for i in selected],
+        [float(final_scores[i]) for i in selected],
+    )
+    retired = retire_recommendations(InternshipRecommendation.objects.filter(
+        internship_posting=posting, applicant_id__in=[applicant_ids[i] for i in dropped]))
+    logger.info(f"[FAN-OUT COMPLETE] Posting {posting.internship_posting_id} scored against "
+                f"{len(applicant_ids)} applicants: {created} created, {updated} updated, {retired} retired")
+
+
+def process_matching_job(job):
+    if job.applicant_id:
+        applicant = Applicant.objects.select_related('user').get(pk=job.applicant_id)
+        if job.kind == 'Embed':
+            get_applicant_embedding(applicant)
+            return
+        mode = get_matching_mode(applicant)
+        if mode is not None:
+            match_applicant(applicant, mode)
+    elif job.internship_posting_id:
+        if job.kind == 'Embed':
+            refresh_posting_embedding(job.internship_posting)
+        else:
+            match_posting_applicants(job.internship_posting)
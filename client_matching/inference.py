@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import random
+import time
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from client_matching.embedding_server import EMBEDDING_SERVER_SOCKET, EmbeddingServerBackend
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = getattr(settings, 'EMBEDDING_MODEL_NAME', 'sentence-transformers/all-MiniLM-L6-v2')
+EMBEDDING_BACKEND = getattr(settings, 'EMBEDDING_BACKEND', 'torch')
+# Part of every embedding cache key and stored content hash, so vectors of another model or backend are never reused
+EMBEDDING_MODEL_FINGERPRINT = f'{EMBEDDING_MODEL_NAME}|{EMBEDDING_BACKEND}'
+EMBEDDING_ONNX_DIR = getattr(settings, 'EMBEDDING_ONNX_DIR', '/tmp/huggingface/onnx/all-MiniLM-L6-v2')
+
+ONNX_MODEL_FILES = {
+    'onnx': 'model.onnx',
+    'onnx-int8': 'model-int8.onnx',
+}
+ONNX_CONFIG_FILE = 'embedding_config.json'
+
+
+# Pytorch deterministic mode
+def _ensure_deterministic():
+    import torch
+
+    torch.manual_seed(0)
+    np.random.seed(0)
+    random.seed(0)
+    try:
+        torch.use_deterministic_algorithms(True)
+    except Exception:
+        pass
+    torch.backends.cudnn.deterministic = True
+    torch.backends.cudnn.benchmark = False
+
+
+def load_sentence_transformer(quantize: bool = True):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.environ["HF_HOME"] = "/tmp/huggingface"
+    os.makedirs(os.environ["HF_HOME"], exist_ok=True)
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+    if quantize:
+        model._first_module().auto_model = torch.quantization.quantize_dynamic(
+            model._first_module().auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    model.eval()
+    return model
+
+
+@lru_cache(maxsize=1)
+def get_sentence_model():
+    try:
+        _ensure_deterministic()
+        model = load_sentence_transformer()
+        logger.info("Sentence transformer model loaded with quantization")
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load sentence transformer model: {e}")
+        raise
+
+
+class TorchBackend:
+    """The sentence-transformers model with dynamically quantized linear layers."""
+
+    name = 'torch'
+
+    def __init__(self):
+        self.model = get_sentence_model()
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            embeddings = self.model.encode(
+                texts,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+                device="cpu",
+                batch_size=batch_size
+            )
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+
+
+class OnnxBackend:
+    """
+    The model exported by export_embedding_model, run through onnxruntime on CPU. Tokenisation, mean pooling
+    and normalisation mirror the sentence-transformers pipeline so vectors are interchangeable with TorchBackend.
+    """
+
+    def __init__(self, name: str, model_dir: str = EMBEDDING_ONNX_DIR):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImproperlyConfigured(f"EMBEDDING_BACKEND='{name}' requires the onnxruntime package")
+
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILES[name])
+        if not os.path.exists(model_path):
+            raise ImproperlyConfigured(
+                f"{model_path} not found, run `python manage.py export_embedding_model` first"
+            )
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE)) as f:
+            self.config = json.load(f)
+
+        self.name = name
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'])
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            inputs['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config['normalize']:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        # Batch texts of similar length together to keep padding down, as sentence-transformers does
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        embeddings = np.zeros((len(texts), self.config['dimension']), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            indices = order[start:start + batch_size]
+            embeddings[indices] = self._encode_batch([texts[i] for i in indices])
+        return embeddings
+
+
+def create_inference_backend(name: str):
+    if name == 'torch':
+        return TorchBackend()
+    if name in ONNX_MODEL_FILES:
+        return OnnxBackend(name)
+    raise ImproperlyConfigured(f"Unknown EMBEDDING_BACKEND '{name}'")
+
+
+@lru_cache(maxsize=1)
+def get_inference_backend():
+    if EMBEDDING_SERVER_SOCKET:
+        # The model lives in run_embedding_server; it is only loaded here if the server cannot be reached
+        backend = EmbeddingServerBackend(EMBEDDING_SERVER_SOCKET,
+                                         lambda: create_inference_backend(EMBEDDING_BACKEND))
+    else:
+        backend = create_inference_backend(EMBEDDING_BACKEND)
+    logger.info(f"Sentence embeddings served by the {backend.name} backend")
+    return backend
+
+
+WARMUP_TEXTS = [
+    'Python',
+    'Communication',
+    'Develop and maintain internal web applications using Django and React',
+    'Currently enrolled in a BS Computer Science or Information Technology program with at least 300 OJT hours',
+]
+
+
+def warm_up_inference_backend():
+    """
+    Load the model and run a few encodes of different shapes so the first real request does not pay for
+    the import, weight loading or the runtime's first-call compilation.
+    """
+    started = time.perf_counter()
+    try:
+        backend = get_inference_backend()
+        for batch_size in (1, len(WARMUP_TEXTS)):
+            backend.encode(WARMUP_TEXTS[:batch_size], batch_size)
+            backend.encode(WARMUP_TEXTS, batch_size)
+    except Exception as e:
+        logger.error(f"Embedding backend warm-up failed: {e}")
+        return
+    logger.info(f"Embedding backend warmed up in {time.perf_counter() - started:.2f}s")
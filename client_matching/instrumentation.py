@@ -0,0 +1,135 @@
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+# Durations kept per span for the percentiles; totals and counts cover every call since the last reset
+SPAN_SAMPLES = 1000
+
+
+class SpanStats:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SPAN_SAMPLES)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def snapshot(self) -> Dict:
+        samples = np.array(self.samples) * 1000 if self.samples else np.zeros(1)
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+            'p50_ms': round(float(np.percentile(samples, 50)), 3),
+            'p95_ms': round(float(np.percentile(samples, 95)), 3),
+            'p99_ms': round(float(np.percentile(samples, 99)), 3),
+        }
+
+
+class Trace:
+    """Span durations and counters of one unit of work, e.g. a single match, in the thread that runs it."""
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    def as_dict(self) -> Dict:
+        return {
+            'spans_ms': {name: round(seconds * 1000, 3) for name, seconds in self.spans.items()},
+            'counters': dict(self.counters),
+        }
+
+
+class Instrumentation:
+    """
+    Process-wide span timings and counters of the matching pipeline. Spans are measured with perf_counter;
+    a trace() block additionally collects the spans and counters of the current thread on their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._spans: Dict[str, SpanStats] = {}
+        self._counters: Dict[str, int] = {}
+        self._started = time.time()
+
+    def _trace(self) -> Optional[Trace]:
+        return getattr(self._local, 'trace', None)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._spans.setdefault(name, SpanStats()).add(seconds)
+        trace = self._trace()
+        if trace is not None:
+            trace.spans[name] = trace.spans.get(name, 0.0) + seconds
+
+    def increment(self, name: str, value: int = 1):
+        if not value:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        trace = self._trace()
+        if trace is not None:
+            trace.counters[name] = trace.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def timed(self, name: str):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def trace(self):
+        # Nested traces share the outer one, so the outermost caller sees everything
+        outer = self._trace()
+        if outer is not None:
+            yield outer
+            return
+        self._local.trace = Trace()
+        try:
+            yield self._local.trace
+        finally:
+            self._local.trace = None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'since': self._started,
+                'spans': {name: stats.snapshot() for name, stats in sorted(self._spans.items())},
+                'counters': dict(sorted(self._counters.items())),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._spans = {}
+            self._counters = {}
+            self._started = time.time()
+
+
+instrumentation = Instrumentation()
+span = instrumentation.span
+timed = instrumentation.timed
+increment = instrumentation.increment
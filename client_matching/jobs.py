@@ -0,0 +1,110 @@
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from client_matching.instrumentation import increment
+from client_matching.models import MatchingJob
+
+logger = logging.getLogger(__name__)
+
+MATCHING_WORKER_ENABLED = getattr(settings, 'MATCHING_WORKER_ENABLED', False)
+MATCHING_JOB_MAX_ATTEMPTS = 3
+
+# A job still Running after this long belongs to a worker that died and is handed out again
+MATCHING_JOB_STALE_AFTER = timedelta(minutes=10)
+
+
+def _enqueue(target, kind: str = 'Match', **lookup) -> Optional[MatchingJob]:
+    with transaction.atomic():
+        # Locking the applicant or posting row serializes concurrent enqueues, so at most one job of a kind is
+        # Pending
+        list(type(target).objects.select_for_update().filter(pk=target.pk).values_list('pk', flat=True))
+        job, created = MatchingJob.objects.get_or_create(status='Pending', kind=kind, **lookup)
+    return job if created else None
+
+
+def enqueue_applicant_matching(applicant) -> Optional[MatchingJob]:
+    return _enqueue(applicant, applicant=applicant)
+
+
+def enqueue_posting_matching(posting) -> Optional[MatchingJob]:
+    return _enqueue(posting, internship_posting=posting)
+
+
+def enqueue_applicant_embedding(applicant) -> Optional[MatchingJob]:
+    return _enqueue(applicant, kind='Embed', applicant=applicant)
+
+
+def enqueue_posting_embedding(posting) -> Optional[MatchingJob]:
+    return _enqueue(posting, kind='Embed', internship_posting=posting)
+
+
+def schedule_posting_matching(posting):
+    """
+    Queue a fan-out of the posting to every active applicant once the surrounding transaction commits. Without
+    the worker nothing is scheduled: each applicant scores the posting in their next incremental match, since it
+    was modified after they were last matched.
+    """
+    if not MATCHING_WORKER_ENABLED:
+        return
+
+    def fan_out():
+        try:
+            enqueue_posting_matching(posting)
+        except Exception as e:
+            logger.error(f"Failed to queue matching for posting {posting.internship_posting_id}: {e}")
+
+    transaction.on_commit(fan_out)
+
+
+def claim_next_job() -> Optional[MatchingJob]:
+    current_time = now()
+
+    with transaction.atomic():
+        MatchingJob.objects.filter(
+            status='Running',
+            started_at__lt=current_time - MATCHING_JOB_STALE_AFTER
+        ).update(status='Pending')
+
+        job = MatchingJob.objects.select_for_update(skip_locked=True) \
+            .filter(status='Pending').order_by('date_created').first()
+        if job is None:
+            return None
+
+        job.status = 'Running'
+        job.attempts += 1
+        job.started_at = current_time
+        job.save(update_fields=['status', 'attempts', 'started_at'])
+        return job
+
+
+def complete_job(job: MatchingJob):
+    job.status = 'Done'
+    job.error = None
+    job.finished_at = now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    increment('matching_jobs.done')
+
+
+def fail_job(job: MatchingJob, error: Exception):
+    job.status = 'Pending' if job.attempts < MATCHING_JOB_MAX_ATTEMPTS else 'Failed'
+    job.error = str(error)[:500]
+    job.finished_at = now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    increment('matching_jobs.failed' if job.status == 'Failed' else 'matching_jobs.retried')
+
+
+def purge_finished_jobs(older_than: timedelta = timedelta(days=1),
+                        failed_older_than: timedelta = timedelta(days=7)) -> int:
+    """Failed jobs are kept longer than Done ones so their errors can still be looked into."""
+    current_time = now()
+    deleted, _ = MatchingJob.objects.filter(
+        Q(status='Done', finished_at__lt=current_time - older_than) |
+        Q(status='Failed', finished_at__lt=current_time - failed_older_than)
+    ).delete()
+    return deleted
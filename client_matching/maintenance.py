@@ -0,0 +1,118 @@
+import logging
+from datetime import timedelta
+from typing import Dict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from client_matching.feed import add_to_recommendation_feeds
+from client_matching.models import InternshipPosting, InternshipRecommendation
+from user_account.models import Applicant
+
+logger = logging.getLogger(__name__)
+
+POSTING_MAINTENANCE_INTERVAL = getattr(settings, 'POSTING_MAINTENANCE_INTERVAL', 300)
+POSTING_MAINTENANCE_BATCH_SIZE = getattr(settings, 'POSTING_MAINTENANCE_BATCH_SIZE', 500)
+DELETED_POSTING_RETENTION = timedelta(days=getattr(settings, 'DELETED_POSTING_RETENTION_DAYS', 3))
+
+
+def _update_in_batches(queryset, batch_size: int, **values) -> int:
+    # Every batch is its own short statement, and the updated rows drop out of the queryset
+    updated = 0
+    while True:
+        posting_ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not posting_ids:
+            return updated
+        updated += queryset.filter(pk__in=posting_ids).update(**values)
+
+
+def expire_postings(current_time=None, batch_size: int = POSTING_MAINTENANCE_BATCH_SIZE) -> int:
+    current_time = current_time or now()
+    return _update_in_batches(
+        InternshipPosting.objects.filter(application_deadline__lt=current_time, status__in=['Open', 'Closed']),
+        batch_size, status='Expired', date_modified=current_time,
+    )
+
+
+def reopen_postings(current_time=None, batch_size: int = POSTING_MAINTENANCE_BATCH_SIZE) -> int:
+    # A posting whose deadline was moved forward after it expired
+    current_time = current_time or now()
+    return _update_in_batches(
+        InternshipPosting.objects.filter(application_deadline__gte=current_time, status='Expired'),
+        batch_size, status='Open', date_modified=current_time,
+    )
+
+
+def purge_deleted_postings(current_time=None, batch_size: int = POSTING_MAINTENANCE_BATCH_SIZE) -> int:
+    threshold = (current_time or now()) - DELETED_POSTING_RETENTION
+    queryset = InternshipPosting.objects.filter(status='Deleted', date_modified__lt=threshold)
+    purged = 0
+    while True:
+        posting_ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not posting_ids:
+            return purged
+        # Cascades to the postings' recommendations, applications and embeddings
+        _, deleted = queryset.filter(pk__in=posting_ids).delete()
+        purged += deleted.get(InternshipPosting._meta.label, 0)
+
+
+def start_of_day(current_time):
+    return current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def is_rolled_over(applicant, current_time=None) -> bool:
+    """Whether the applicant's daily limit was already reset today; answered from the loaded row."""
+    return bool(applicant.tap_count_reset) and applicant.tap_count_reset >= start_of_day(current_time or now())
+
+
+@transaction.atomic
+def roll_over_applicants(applicant_ids, current_time=None):
+    """
+    Start a new day for the given applicants: recommendations they skipped before today are pending again
+    and go back into their feeds, and their tap counts are reset.
+    """
+    current_time = current_time or now()
+    skipped_ids = list(InternshipRecommendation.objects.filter(
+        applicant_id__in=applicant_ids,
+        status='Skipped',
+        time_stamp__lt=start_of_day(current_time),
+    ).values_list('pk', flat=True))
+
+    for i in range(0, len(skipped_ids), POSTING_MAINTENANCE_BATCH_SIZE):
+        batch = skipped_ids[i:i + POSTING_MAINTENANCE_BATCH_SIZE]
+        InternshipRecommendation.objects.filter(pk__in=batch).update(status='Pending', time_stamp=current_time)
+        add_to_recommendation_feeds(InternshipRecommendation.objects.filter(pk__in=batch))
+
+    Applicant.objects.filter(pk__in=applicant_ids).update(tap_count=0, tap_count_reset=current_time)
+    return len(skipped_ids)
+
+
+def roll_over_daily_limits(current_time=None, batch_size: int = POSTING_MAINTENANCE_BATCH_SIZE) -> int:
+    # Applicants rolled over on the request path today are skipped, so later runs of the day find nothing
+    current_time = current_time or now()
+    queryset = Applicant.objects.filter(
+        Q(tap_count_reset__isnull=True) | Q(tap_count_reset__lt=start_of_day(current_time))
+    )
+    rolled_over = 0
+    while True:
+        applicant_ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not applicant_ids:
+            return rolled_over
+        roll_over_applicants(applicant_ids, current_time)
+        rolled_over += len(applicant_ids)
+
+
+def run_maintenance(batch_size: int = POSTING_MAINTENANCE_BATCH_SIZE) -> Dict[str, int]:
+    current_time = now()
+    counts = {
+        'expired': expire_postings(current_time, batch_size),
+        'reopened': reopen_postings(current_time, batch_size),
+        'purged': purge_deleted_postings(current_time, batch_size),
+        'rolled_over': roll_over_daily_limits(current_time, batch_size),
+    }
+    if any(counts.values()):
+        logger.info(f"Maintenance: {counts['expired']} postings expired, {counts['reopened']} reopened, "
+                    f"{counts['purged']} purged, {counts['rolled_over']} applicants rolled over")
+    return counts
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from client_matching.inference import ONNX_MODEL_FILES, create_inference_backend
+from client_matching.models import HardSkillsTagList, KeyTask, MinQualification, SoftSkillsTagList
+from client_matching.utils import EMBEDDING_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Compares the throughput, latency and output of the embedding backends on the stored posting texts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', default=['torch'] + list(ONNX_MODEL_FILES),
+                            help='Backends to compare; the first one is the reference for agreement.')
+        parser.add_argument('--limit', type=int, default=2000, help='Maximum number of distinct texts.')
+        parser.add_argument('--batch-size', type=int, default=EMBEDDING_BATCH_SIZE)
+        parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the texts per backend.')
+        parser.add_argument('--latency-samples', type=int, default=50, help='Single-text encodes per backend.')
+
+    def posting_texts(self, limit):
+        # The same texts encode_texts_batch sees when postings are embedded
+        sources = [
+            KeyTask.objects.values_list('key_task', flat=True),
+            MinQualification.objects.values_list('min_qualification', flat=True),
+            HardSkillsTagList.objects.filter(required_hard_skills__isnull=False).values_list('name', flat=True),
+            SoftSkillsTagList.objects.filter(required_soft_skills__isnull=False).values_list('name', flat=True),
+        ]
+        texts = dict.fromkeys(
+            text.strip() for source in sources for text in source.distinct() if text and text.strip()
+        )
+        return list(texts)[:limit]
+
+    def handle(self, *args, **options):
+        texts = self.posting_texts(options['limit'])
+        if not texts:
+            raise CommandError("No posting texts found, create or populate some postings first")
+
+        batch_size = options['batch_size']
+        samples = texts[:options['latency_samples']]
+        self.stdout.write(f"{len(texts)} texts, batch size {batch_size}, {options['repeat']} pass(es)\n")
+
+        reference = reference_name = None
+        for name in options['backends']:
+            try:
+                started = time.perf_counter()
+                backend = create_inference_backend(name)
+                backend.encode(texts[:batch_size], batch_size)
+                load_seconds = time.perf_counter() - started
+            except Exception as e:
+                self.stderr.write(f"{name}: unavailable ({e})")
+                continue
+
+            pass_seconds = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                embeddings = backend.encode(texts, batch_size)
+                pass_seconds.append(time.perf_counter() - started)
+
+            latencies = []
+            for text in samples:
+                started = time.perf_counter()
+                backend.encode([text], 1)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(self.style.SUCCESS(name))
+            self.stdout.write(f"  load + warm-up   {load_seconds:8.2f} s")
+            self.stdout.write(f"  throughput       {len(texts) / min(pass_seconds):8.1f} texts/s")
+            self.stdout.write(f"  single text p50  {np.percentile(latencies, 50):8.2f} ms")
+            self.stdout.write(f"  single text p95  {np.percentile(latencies, 95):8.2f} ms")
+
+            if reference is None:
+                reference, reference_name = embeddings, name
+                continue
+            agreement = np.sum(reference * embeddings, axis=1) / np.clip(
+                np.linalg.norm(reference, axis=1) * np.linalg.norm(embeddings, axis=1), 1e-12, None
+            )
+            self.stdout.write(f"  cosine vs {reference_name:<6} mean {agreement.mean():.4f}, "
+                              f"min {agreement.min():.4f}")
@@ -0,0 +1,270 @@
+import importlib
+import json
+import random
+import subprocess
+import time
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from client_matching.inference import EMBEDDING_BACKEND
+from client_matching.instrumentation import instrumentation
+from client_matching.models import (HardSkillsTagList, InternshipPosting, KeyTask, MinQualification,
+                                    PersonInCharge, SoftSkillsTagList)
+from client_matching.posting_index import posting_index
+from client_matching.serializers import InternshipMatchSerializer
+from user_account.management.commands.populate_applicants import ADDRESSES, IT_HARD_SKILLS, IT_SOFT_SKILLS
+from user_account.models import Applicant, Company, User
+
+# The module name has hyphens, so it cannot be imported with a plain import statement
+populate_postings = importlib.import_module(
+    'user_account.management.commands.populate_companies_pics_internship-postings'
+)
+
+# Instrumentation spans recorded by InternshipMatchSerializer.create, grouped into the reported stages
+STAGE_SPANS = {
+    'profiles': ['InternshipMatchSerializer._build_applicant_profile',
+                 'InternshipMatchSerializer._get_posting_profiles_optimized'],
+    'candidates': ['posting_index.candidates'],
+    'embedding': ['get_profile_embedding', 'get_posting_embeddings_batch'],
+    'scoring': ['cosine_compare'],
+    'upsert': ['InternshipMatchSerializer._update_applicant_and_recommendations'],
+}
+STAGES = list(STAGE_SPANS) + ['total']
+
+POSTINGS_PER_COMPANY = 50
+INTRODUCTIONS = [
+    "Aspiring web developer who enjoys building {hard} projects and working in a team.",
+    "IT student interested in {hard}, looking for an internship to grow my {soft} skills.",
+    "Computer science student with class projects in {hard} and a strong sense of {soft}.",
+]
+
+
+def percentiles(seconds):
+    values = np.array(seconds) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'mean_ms': round(float(values.mean()), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks InternshipMatchSerializer.create on synthetic postings and applicants, timing each "
+            "stage. The synthetic data is rolled back unless --keep is given.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--postings', type=int, default=500, help='Number of synthetic postings.')
+        parser.add_argument('--applicants', type=int, default=50, help='Number of synthetic applicants to match.')
+        parser.add_argument('--passes', type=int, default=2,
+                            help='Matching passes over all applicants; the first one encodes every posting.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--distinct-texts', action='store_true',
+                            help='Make every key task and qualification unique so the embedding cache cannot '
+                                 'answer them.')
+        parser.add_argument('--output', help='Write the results as JSON to this path.')
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic data instead of rolling back.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.run_id = uuid.uuid4().hex[:8]
+
+        try:
+            with transaction.atomic():
+                results = self.benchmark(options)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+        # The index holds the rolled back postings otherwise
+        posting_index.rebuild()
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def benchmark(self, options):
+        started = time.perf_counter()
+        hard_skills, soft_skills = self.create_skills()
+        self.create_postings(options['postings'], hard_skills, soft_skills, options['distinct_texts'])
+        applicants = self.create_applicants(options['applicants'], hard_skills, soft_skills)
+        setup_seconds = time.perf_counter() - started
+        self.stdout.write(f"Created {options['postings']} postings and {len(applicants)} applicants "
+                          f"in {setup_seconds:.1f}s on {connection.vendor}\n")
+
+        posting_index.rebuild()
+        passes = []
+        for pass_number in range(1, options['passes'] + 1):
+            samples = {stage: [] for stage in STAGES}
+            counters = {}
+            matches = 0
+            pass_started = time.perf_counter()
+            for applicant in applicants:
+                with instrumentation.trace() as trace:
+                    run_started = time.perf_counter()
+                    serializer = InternshipMatchSerializer(data={}, context={'applicant': applicant})
+                    serializer.is_valid(raise_exception=True)
+                    matches += len(serializer.save())
+                    samples['total'].append(time.perf_counter() - run_started)
+
+                for stage, span_names in STAGE_SPANS.items():
+                    samples[stage].append(sum(trace.spans.get(name, 0.0) for name in span_names))
+                for name, value in trace.counters.items():
+                    counters[name] = counters.get(name, 0) + value
+            pass_seconds = time.perf_counter() - pass_started
+
+            passes.append({
+                'pass': pass_number,
+                'seconds': round(pass_seconds, 3),
+                'applicants_per_second': round(len(applicants) / pass_seconds, 2),
+                'recommendations_per_second': round(matches / pass_seconds, 2),
+                'recommendations': matches,
+                'stages': {stage: percentiles(values) for stage, values in samples.items()},
+                'counters': counters,
+            })
+
+        return {
+            'commit': git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'embedding_backend': EMBEDDING_BACKEND,
+            'postings': options['postings'],
+            'applicants': len(applicants),
+            'seed': options['seed'],
+            'distinct_texts': options['distinct_texts'],
+            'setup_seconds': round(setup_seconds, 3),
+            'passes': passes,
+        }
+
+    def report(self, results):
+        for result in results['passes']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Pass {result['pass']}: {result['applicants_per_second']} applicants/s, "
+                f"{result['recommendations_per_second']} recommendations/s ({result['seconds']}s)"
+            ))
+            self.stdout.write(f"  {'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+            for stage, timings in result['stages'].items():
+                self.stdout.write(f"  {stage:<12}{timings['p50_ms']:>10.2f}{timings['p95_ms']:>10.2f}"
+                                  f"{timings['p99_ms']:>10.2f}{timings['mean_ms']:>10.2f}")
+            counters = sorted(result['counters'].items())
+            if counters:
+                self.stdout.write('  ' + ', '.join(f"{name}={value}" for name, value in counters))
+
+    def create_skills(self):
+        def get_tags(model, vocabulary):
+            tags = {}
+            for skill in vocabulary:
+                tag, _ = model.objects.get_or_create(lightcast_identifier=skill['id'], defaults={'name': skill['name']})
+                tags[tag.pk] = tag
+            return list(tags.values())
+
+        return (get_tags(HardSkillsTagList, IT_HARD_SKILLS + populate_postings.HARD_SKILLS),
+                get_tags(SoftSkillsTagList, IT_SOFT_SKILLS + populate_postings.SOFT_SKILLS))
+
+    def create_users(self, count, role, prefix):
+        users = []
+        for i in range(count):
+            user = User(email=f"bench-{self.run_id}-{prefix}{i}@example.com", user_role=role, status='Active')
+            user.set_unusable_password()
+            users.append(user)
+        return User.objects.bulk_create(users, batch_size=500)
+
+    def add_tags(self, descriptor, owners, tags, count):
+        # Fill the M2M through table directly; .set() per row would dominate the setup time
+        through, field = descriptor.through, descriptor.field
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        through.objects.bulk_create([
+            through(**{f'{source}_id': owner.pk, f'{target}_id': tag.pk})
+            for owner in owners for tag in self.random.sample(tags, min(count, len(tags)))
+        ], batch_size=1000)
+
+    def create_postings(self, count, hard_skills, soft_skills, distinct_texts):
+        users = self.create_users(-(-count // POSTINGS_PER_COMPANY), 'company', 'company')
+        Company.objects.bulk_create([
+            Company(user=user, company_name=f"Bench Company {i}", company_address=self.random.choice(
+                populate_postings.PH_ADDRESSES), company_information="Synthetic company for bench_matching.",
+                business_nature="Technology", profile_picture='bench.png', background_image='bench.png')
+            for i, user in enumerate(users)
+        ])
+        # MySQL does not return AutoField keys from bulk_create
+        companies = list(Company.objects.filter(user__in=users).order_by('company_id'))
+        pics = PersonInCharge.objects.bulk_create([
+            PersonInCharge(company=company, name=f"{company.company_name} PIC", position="HR Officer",
+                           email=f"bench-{self.run_id}-pic{i}@example.com")
+            for i, company in enumerate(companies)
+        ])
+
+        start = timezone.now() + timedelta(days=30)
+        postings = InternshipPosting.objects.bulk_create([
+            InternshipPosting(
+                company=companies[i // POSTINGS_PER_COMPANY],
+                person_in_charge=pics[i // POSTINGS_PER_COMPANY],
+                internship_position=f"Bench IT Intern {i}",
+                address=self.random.choice(populate_postings.PH_ADDRESSES),
+                latitude=14.5 + self.random.random() * 0.2,
+                longitude=120.95 + self.random.random() * 0.2,
+                modality=self.random.choice(['Onsite', 'Hybrid', 'WorkFromHome']),
+                internship_date_start=start,
+                application_deadline=start - timedelta(days=20),
+                ojt_hours=self.random.choice([240, 486]),
+                status='Open',
+            )
+            for i in range(count)
+        ], batch_size=500)
+
+        suffix = (lambda i: f" ({self.run_id} {i})") if distinct_texts else (lambda i: "")
+        KeyTask.objects.bulk_create([
+            KeyTask(internship_posting=posting, key_task=task + suffix(i))
+            for i, posting in enumerate(postings) for task in populate_postings.TASKS
+        ], batch_size=1000)
+        MinQualification.objects.bulk_create([
+            MinQualification(internship_posting=posting, min_qualification=qualification + suffix(i))
+            for i, posting in enumerate(postings) for qualification in populate_postings.QUALIFICATIONS
+        ], batch_size=1000)
+
+        self.add_tags(InternshipPosting.required_hard_skills, postings, hard_skills, 3)
+        self.add_tags(InternshipPosting.required_soft_skills, postings, soft_skills, 2)
+        return postings
+
+    def create_applicants(self, count, hard_skills, soft_skills):
+        users = self.create_users(count, 'applicant', 'applicant')
+        applicants = []
+        for i, user in enumerate(users):
+            hard, soft = self.random.choice(hard_skills), self.random.choice(soft_skills)
+            applicants.append(Applicant(
+                user=user, first_name="Bench", last_name=f"Applicant {i}",
+                address=self.random.choice(ADDRESSES),
+                latitude=14.5 + self.random.random() * 0.2,
+                longitude=120.95 + self.random.random() * 0.2,
+                preferred_modality=self.random.choice(['Onsite', 'Hybrid', 'WorkFromHome']),
+                quick_introduction=self.random.choice(INTRODUCTIONS).format(hard=hard.name, soft=soft.name),
+                mobile_number='09171234567', resume='bench.pdf',
+            ))
+        Applicant.objects.bulk_create(applicants, batch_size=500)
+        # Re-read for the keys MySQL does not return, and so each applicant carries its user like the match view's
+        applicants = list(Applicant.objects.select_related('user').filter(user__in=users).order_by('applicant_id'))
+
+        self.add_tags(Applicant.hard_skills, applicants, hard_skills, 3)
+        self.add_tags(Applicant.soft_skills, applicants, soft_skills, 2)
+        return applicants
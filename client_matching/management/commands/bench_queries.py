@@ -0,0 +1,238 @@
+import json
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from client_application.models import Application
+from client_matching.feed import eligible_recommendations, sample_recommendation
+from client_matching.management.commands.bench_matching import Rollback, git_commit, percentiles
+from client_matching.models import InternshipPosting, InternshipRecommendation, PersonInCharge
+from user_account.models import Applicant, Company, User
+
+POSTING_STATUSES = ['Open'] * 7 + ['Expired'] * 2 + ['Deleted']
+RECOMMENDATION_STATUSES = ['Pending'] * 7 + ['Skipped'] * 2 + ['Submitted']
+APPLICATION_STATUSES = ['Pending'] * 5 + ['Onboarding', 'Rejected', 'Dropped', 'Accepted']
+VIEW_STATUSES = ['Read', 'Unread', 'Unread', 'Deleted']
+
+
+class Command(BaseCommand):
+    help = ("Seeds postings, recommendations and applications and times the hot recommendation, application and "
+            "posting queries with their query plans. Run it once with the index migrations unapplied and once "
+            "with them applied, and pass the first run's --output to --compare.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=50)
+        parser.add_argument('--postings-per-company', type=int, default=40)
+        parser.add_argument('--applicants', type=int, default=2000)
+        parser.add_argument('--recommendations-per-applicant', type=int, default=100)
+        parser.add_argument('--applications-per-applicant', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=50, help='Executions of each query.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this path.')
+        parser.add_argument('--compare', help='JSON output of an earlier run to compare against.')
+        parser.add_argument('--keep', action='store_true', help='Commit the synthetic data instead of rolling back.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.run_id = uuid.uuid4().hex[:8]
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        try:
+            with transaction.atomic():
+                results = self.benchmark(options)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+        self.report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def benchmark(self, options):
+        started = time.perf_counter()
+        companies = self.create_companies(options['companies'])
+        postings = self.create_postings(companies, options['postings_per_company'])
+        applicants = self.create_applicants(options['applicants'])
+        self.create_recommendations(applicants, postings, options['recommendations_per_applicant'])
+        self.create_applications(applicants, postings, options['applications_per_applicant'])
+        setup_seconds = time.perf_counter() - started
+        self.stdout.write(f"Seeded in {setup_seconds:.1f}s on {connection.vendor}\n")
+
+        queries = {}
+        for name, (queryset, run) in self.queries(companies, applicants).items():
+            samples = []
+            for _ in range(options['repeat']):
+                query_started = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - query_started)
+            queries[name] = {'timings': percentiles(samples), 'plan': queryset.explain()}
+
+        return {
+            'commit': git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'volumes': {key: options[key] for key in ['companies', 'postings_per_company', 'applicants',
+                                                      'recommendations_per_applicant', 'applications_per_applicant']},
+            'setup_seconds': round(setup_seconds, 3),
+            'queries': queries,
+        }
+
+    def queries(self, companies, applicants):
+        """The queries of the hot endpoints as (queryset to explain, callable running it like the endpoint)."""
+        company_user = self.random.choice(companies).user
+        applicant = self.random.choice(applicants)
+        recommendation_id = (InternshipRecommendation.objects.filter(applicant=applicant, status='Pending')
+                             .values_list('pk', flat=True).first())
+        now = timezone.now()
+
+        def listed(queryset):
+            return queryset, lambda: list(queryset.all())
+
+        def counted(queryset):
+            return queryset, queryset.count
+
+        return {
+            'feed.current_card': listed(InternshipRecommendation.objects.filter(
+                applicant=applicant, status='Pending', is_current=True, internship_posting__status='Open')[:1]),
+            'feed.sample': (
+                eligible_recommendations(applicant.pk).filter(feed_rank__gte=0.5).order_by('feed_rank')[:1],
+                lambda: sample_recommendation(applicant.pk, {}),
+            ),
+            'feed.tap_lookup': listed(InternshipRecommendation.objects.filter(
+                pk=recommendation_id, applicant=applicant, status='Pending', internship_posting__status='Open')),
+            'applications.company_list': listed(Application.objects.filter(
+                internship_posting__company__user=company_user).exclude(company_status='Deleted')
+                .order_by('-application_date')[:20]),
+            'applications.company_unread_count': counted(Application.objects.filter(
+                internship_posting__company__user=company_user, company_status='Unread')),
+            'applications.company_dropped_count': counted(Application.objects.filter(
+                internship_posting__company__user=company_user, status='Dropped')),
+            'applications.applicant_list': listed(Application.objects.filter(
+                applicant__user=applicant.user).exclude(applicant_status='Deleted')),
+            'postings.company_list': listed(InternshipPosting.objects.filter(
+                company=company_user.company).exclude(status='Deleted')),
+            'postings.expire_due': listed(InternshipPosting.objects.filter(
+                company=company_user.company, application_deadline__lt=now, status='Open')),
+            'postings.modified_since': listed(InternshipPosting.objects.filter(
+                status='Open', date_modified__gt=now - timedelta(days=3))),
+            'postings.old_deleted': listed(InternshipPosting.objects.filter(
+                status='Deleted', date_modified__lt=now - timedelta(days=30))),
+        }
+
+    def report(self, results, baseline):
+        before = (baseline or {}).get('queries', {})
+        header = f"  {'query':<38}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}"
+        if before:
+            header += f"{'was p50':>10}{'speedup':>10}"
+        self.stdout.write(header)
+        for name, result in results['queries'].items():
+            timings = result['timings']
+            line = f"  {name:<38}{timings['p50_ms']:>10.3f}{timings['p95_ms']:>10.3f}{timings['mean_ms']:>10.3f}"
+            if name in before:
+                was = before[name]['timings']['p50_ms']
+                speedup = f"{was / timings['p50_ms']:.1f}x" if timings['p50_ms'] else '-'
+                line += f"{was:>10.3f}{speedup:>10}"
+            self.stdout.write(line)
+
+        for name, result in results['queries'].items():
+            self.stdout.write(f"\n{name}:")
+            if name in before and before[name]['plan'] and before[name]['plan'] != result['plan']:
+                self.stdout.write(f"  before:\n{self.indent(before[name]['plan'])}\n  after:")
+            self.stdout.write(self.indent(result['plan']))
+
+    def indent(self, plan):
+        return '\n'.join(f"    {line}" for line in plan.splitlines())
+
+    def create_users(self, count, role, prefix):
+        users = []
+        for i in range(count):
+            user = User(email=f"benchq-{self.run_id}-{prefix}{i}@example.com", user_role=role, status='Active')
+            user.set_unusable_password()
+            users.append(user)
+        return User.objects.bulk_create(users, batch_size=500)
+
+    def create_companies(self, count):
+        users = self.create_users(count, 'company', 'company')
+        Company.objects.bulk_create([
+            Company(user=user, company_name=f"Bench Company {i}", company_address="Makati City",
+                    company_information="Synthetic company for bench_queries.", business_nature="Technology",
+                    profile_picture='bench.png', background_image='bench.png')
+            for i, user in enumerate(users)
+        ])
+        # MySQL does not return AutoField keys from bulk_create
+        return list(Company.objects.select_related('user').filter(user__in=users).order_by('company_id'))
+
+    def create_postings(self, companies, per_company):
+        pics = PersonInCharge.objects.bulk_create([
+            PersonInCharge(company=company, name=f"{company.company_name} PIC", position="HR Officer",
+                           email=f"benchq-{self.run_id}-pic{i}@example.com")
+            for i, company in enumerate(companies)
+        ])
+        now = timezone.now()
+        postings = InternshipPosting.objects.bulk_create([
+            InternshipPosting(
+                company=company, person_in_charge=pic, internship_position=f"Bench IT Intern {i}",
+                modality=self.random.choice(['Onsite', 'Hybrid', 'WorkFromHome']),
+                internship_date_start=now + timedelta(days=60),
+                application_deadline=now + timedelta(days=self.random.randint(-30, 30)),
+                ojt_hours=486, status=self.random.choice(POSTING_STATUSES),
+            )
+            for company, pic in zip(companies, pics) for i in range(per_company)
+        ], batch_size=500)
+
+        # date_modified is auto_now, so spread it over the last 60 days with one update per day
+        by_day = {}
+        for posting in postings:
+            by_day.setdefault(self.random.randint(0, 59), []).append(posting.pk)
+        for day, posting_ids in by_day.items():
+            InternshipPosting.objects.filter(pk__in=posting_ids).update(date_modified=now - timedelta(days=day))
+        return postings
+
+    def create_applicants(self, count):
+        users = self.create_users(count, 'applicant', 'applicant')
+        Applicant.objects.bulk_create([
+            Applicant(user=user, first_name="Bench", last_name=f"Applicant {i}", address="Quezon City",
+                      quick_introduction="Synthetic applicant for bench_queries.", mobile_number='09171234567',
+                      resume='bench.pdf')
+            for i, user in enumerate(users)
+        ], batch_size=500)
+        return list(Applicant.objects.select_related('user').filter(user__in=users).order_by('applicant_id'))
+
+    def create_recommendations(self, applicants, postings, per_applicant):
+        recommendations = []
+        for applicant in applicants:
+            for posting in self.random.sample(postings, min(per_applicant, len(postings))):
+                recommendations.append(InternshipRecommendation(
+                    applicant=applicant, internship_posting=posting,
+                    similarity_score=round(self.random.uniform(0.3, 0.9), 4),
+                    status=self.random.choice(RECOMMENDATION_STATUSES),
+                ))
+            if len(recommendations) >= 5000:
+                InternshipRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+                recommendations = []
+        InternshipRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+
+    def create_applications(self, applicants, postings, per_applicant):
+        Application.objects.bulk_create([
+            Application(applicant=applicant, internship_posting=posting,
+                        status=self.random.choice(APPLICATION_STATUSES),
+                        applicant_status=self.random.choice(VIEW_STATUSES),
+                        company_status=self.random.choice(VIEW_STATUSES))
+            for applicant in applicants
+            for posting in self.random.sample(postings, min(per_applicant, len(postings)))
+        ], batch_size=1000)
@@ -0,0 +1,188 @@
+from datetime import timedelta
+from itertools import cycle
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from between_ims.query_budget import QUERY_BUDGET_REPEAT_THRESHOLD, budget_violations, get_query_budget, \
+    record_queries
+from cea_management.models import SchoolPartnershipList
+from client_application.models import Application, Endorsement, Notification
+from client_matching.management.commands.bench_matching import Rollback
+from client_matching.models import InternshipPosting, InternshipRecommendation
+from user_account.models import Applicant, CareerEmplacementAdmin, Company, OJTCoordinator, User
+
+# (role of the requesting user, URL); the URLs are formatted with the ids from seed_activity
+ENDPOINTS = [
+    ('company', '/api/client_matching/internship_posting/'),
+    ('company', '/api/client_matching/person_in_charge/'),
+    ('applicant', '/api/client_matching/get/internship_postings/'),
+    ('applicant', '/api/client_matching/internship_recommendations/'),
+    ('applicant', '/api/client_application/get/applications/'),
+    ('company', '/api/client_application/get/applications/'),
+    ('company', '/api/client_application/get/applications/?applicant_name=Seeded+Applicant'),
+    ('applicant', '/api/client_application/notifications/?application={application}'),
+    ('company', '/api/client_application/notifications/?application={application}'),
+    ('coordinator', '/api/user_account/applicant/'),
+    ('coordinator', '/api/ojt_management/students/'),
+    ('coordinator', '/api/ojt_management/students/in_practicum/'),
+    ('coordinator', '/api/ojt_management/students/in_practicum/?application_status=Pending'),
+    ('coordinator', '/api/ojt_management/students/reqeusting_practicum/'),
+    ('coordinator', '/api/ojt_management/students/internship_posting/?internship_posting_id={posting}'),
+    ('coordinator', '/api/ojt_management/partnered-companies/'),
+    ('coordinator', '/api/ojt_management/responded_endorsements/'),
+    ('coordinator', '/api/ojt_management/endorsement_detail/'),
+    ('cea', '/api/cea_management/ojt-coordinators/'),
+    ('cea', '/api/cea_management/students/'),
+    ('cea', '/api/cea_management/partnerships/'),
+    ('cea', '/api/cea_management/companies/'),
+]
+
+APPLICATION_STATUSES = ['Pending', 'Accepted', 'Onboarding', 'Pending', 'Rejected']
+ENDORSEMENT_STATUSES = ['Pending', 'Approved', 'Rejected']
+
+
+def budgeted_views(patterns=None, prefix=''):
+    """(route, view class) of every URL whose view declares a query_budget."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            yield from budgeted_views(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern) and get_query_budget(pattern.callback) is not None:
+            yield prefix + str(pattern.pattern), pattern.callback.view_class
+
+
+class Command(BaseCommand):
+    help = ("Requests every list endpoint with a query_budget as a seeded user and reports the ones running more "
+            "queries than their budget or repeating a query shape. An empty database is seeded with the populate_* "
+            "commands first; applications, endorsements, notifications and recommendations are added for the "
+            "seeded users, and everything is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=int, default=QUERY_BUDGET_REPEAT_THRESHOLD,
+                            help='Runs of one query shape in a request reported as a likely N+1.')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded data instead of rolling back.')
+
+    def handle(self, *args, **options):
+        # Lets the test client through ALLOWED_HOSTS and keeps any mail the views send in memory
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                if not Company.objects.exists():
+                    self.populate()
+                failures = self.check_endpoints(self.seed_activity(), options['threshold'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+
+        if failures:
+            raise CommandError(f"{failures} endpoint(s) over their query budget or repeating queries")
+        self.stdout.write(self.style.SUCCESS("All endpoints within their query budgets."))
+
+    def populate(self):
+        self.stdout.write("Empty database, running the populate commands")
+        call_command('populate_everything', stdout=self.stdout)
+        call_command('populate_applicants', stdout=self.stdout)
+
+    def seed_activity(self):
+        """Enough related rows that an N+1 on any list endpoint repeats its query more than a few times."""
+        coordinator = (OJTCoordinator.objects.select_related('user', 'department__school', 'program')
+                       .filter(program__isnull=False).first())
+        if coordinator is None:
+            raise CommandError("The database has no OJT coordinator with a program.")
+        school = coordinator.department.school
+        cea = CareerEmplacementAdmin.objects.select_related('user').filter(school=school).first()
+        if cea is None:
+            raise CommandError(f"{school.school_name} has no career emplacement admin.")
+        postings = list(InternshipPosting.objects.select_related('company__user').filter(status='Open'))
+        applicants = list(Applicant.objects.select_related('user').order_by('pk'))
+        if not postings or len(applicants) < 2:
+            raise CommandError("Seed at least one open posting and two applicants first.")
+        now = timezone.now()
+
+        # Every applicant studies under the coordinator; last_matched and tap_count_reset keep the feed from
+        # matching inline or rolling over during the request
+        for i, applicant in enumerate(applicants):
+            Applicant.objects.filter(pk=applicant.pk).update(
+                first_name='Seeded', last_name=f'Applicant {i}', school=school, department=coordinator.department,
+                program=coordinator.program, in_practicum='Yes' if i % 2 else 'Pending',
+                enrollment_record=f'seeded-enrollment-{i}.pdf', last_matched=now + timedelta(minutes=5),
+                tap_count_reset=now, tap_count=0,
+            )
+
+        statuses = cycle(APPLICATION_STATUSES)
+        applications = Application.objects.bulk_create([
+            Application(applicant=applicant, internship_posting=posting, status=next(statuses))
+            for applicant in applicants for posting in postings
+        ])
+        Notification.objects.bulk_create([
+            Notification(application=application, notification_text=f'Seeded {notification_type} notification',
+                         notification_type=notification_type)
+            for application in applications for notification_type in ['Applicant', 'Company'] for _ in range(3)
+        ])
+        statuses = cycle(ENDORSEMENT_STATUSES)
+        Endorsement.objects.bulk_create([
+            Endorsement(program_id=coordinator.program, application=application, status=next(statuses))
+            for application in applications
+        ])
+        InternshipRecommendation.objects.bulk_create([
+            InternshipRecommendation(applicant=applicant, internship_posting=posting)
+            for applicant in applicants for posting in postings
+        ], ignore_conflicts=True)
+        # Half of the companies partner with the school, so both company lists have rows
+        SchoolPartnershipList.objects.bulk_create([
+            SchoolPartnershipList(school=school, company=company)
+            for company in Company.objects.order_by('pk')[::2]
+        ], ignore_conflicts=True)
+
+        company = postings[0].company
+        applicant = applicants[0]
+        return {
+            'users': {'company': company.user_id, 'applicant': applicant.user_id,
+                      'coordinator': coordinator.user_id, 'cea': cea.user_id},
+            'application': Application.objects.filter(applicant=applicant, internship_posting__company=company)
+                                              .values_list('pk', flat=True).first(),
+            'posting': postings[0].pk,
+        }
+
+    def check_endpoints(self, seeded, threshold):
+        failures = 0
+        checked = set()
+        for role, url in ENDPOINTS:
+            url = url.format(**seeded)
+            view = resolve(url.split('?')[0]).func
+            budget = get_query_budget(view)
+            checked.add(view.view_class)
+
+            client = APIClient()
+            # A real token, so the counts include JWTAuthentication loading the user like in production
+            user = User.objects.get(pk=seeded['users'][role])
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+            with record_queries() as recorder:
+                response = client.get(url, secure=True)
+
+            violations = budget_violations(recorder, budget, threshold)
+            if response.status_code >= 400:
+                violations.insert(0, f"status {response.status_code}")
+            line = f"  {role:<12}{recorder.count:>4}/{budget if budget is not None else '-':<4}{url}"
+            if violations:
+                failures += 1
+                self.stdout.write(self.style.ERROR(line))
+                for violation in violations:
+                    self.stdout.write(f"      {violation}")
+            else:
+                self.stdout.write(line)
+
+        for route, view_class in budgeted_views():
+            if view_class not in checked:
+                self.stdout.write(self.style.WARNING(f"  {view_class.__name__} ({route}) declares a query_budget "
+                                                     f"but is not requested"))
+        return failures
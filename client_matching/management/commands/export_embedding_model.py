@@ -0,0 +1,81 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from client_matching.inference import (EMBEDDING_ONNX_DIR, ONNX_CONFIG_FILE, ONNX_MODEL_FILES,
+                                       load_sentence_transformer)
+
+
+class Command(BaseCommand):
+    help = ("Exports the sentence model to ONNX and writes an int8-quantized copy, "
+            "for EMBEDDING_BACKEND='onnx' and 'onnx-int8'.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=EMBEDDING_ONNX_DIR, help='Directory to write the model to.')
+        parser.add_argument('--opset', type=int, default=17, help='ONNX opset version.')
+        parser.add_argument('--skip-quantize', action='store_true', help='Only write the float32 model.')
+
+    def handle(self, *args, **options):
+        import torch
+        from sentence_transformers.models import Normalize, Pooling
+
+        model = load_sentence_transformer(quantize=False)
+        pooling = next((module for module in model if isinstance(module, Pooling)), None)
+        pooling_config = pooling.get_config_dict() if pooling is not None else {}
+        # sentence-transformers 2.x reports one flag per mode, newer versions a single pooling_mode
+        pooling_mode = pooling_config.get('pooling_mode',
+                                          'mean' if pooling_config.get('pooling_mode_mean_tokens') else None)
+        if pooling_mode != 'mean':
+            raise CommandError("Only mean-pooled sentence models can be served by the ONNX backend")
+
+        output = options['output']
+        os.makedirs(output, exist_ok=True)
+        tokenizer = model.tokenizer
+        tokenizer.save_pretrained(output)
+
+        sample = tokenizer(['Develop and maintain internal web applications'], return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+        class TokenEmbeddings(torch.nn.Module):
+            def __init__(self, auto_model):
+                super().__init__()
+                self.auto_model = auto_model
+
+            def forward(self, *inputs):
+                return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['token_embeddings']}
+        model_path = os.path.join(output, ONNX_MODEL_FILES['onnx'])
+        with torch.inference_mode():
+            torch.onnx.export(
+                TokenEmbeddings(model._first_module().auto_model).eval(),
+                tuple(sample[name] for name in input_names),
+                model_path,
+                input_names=input_names,
+                output_names=['token_embeddings'],
+                dynamic_axes=dynamic_axes,
+                opset_version=options['opset'],
+                dynamo=False,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {model_path}"))
+
+        with open(os.path.join(output, ONNX_CONFIG_FILE), 'w') as f:
+            json.dump({
+                'max_seq_length': model.max_seq_length,
+                'pad_token_id': tokenizer.pad_token_id,
+                'normalize': any(isinstance(module, Normalize) for module in model),
+                'dimension': model.get_sentence_embedding_dimension(),
+            }, f, indent=2)
+
+        if options['skip_quantize']:
+            return
+
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise CommandError("Quantizing requires the onnxruntime package")
+
+        int8_path = os.path.join(output, ONNX_MODEL_FILES['onnx-int8'])
+        quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {int8_path}"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from client_matching.models import HardSkillsTagList, SoftSkillsTagList
+from client_matching.utils import compute_skill_embeddings
+
+
+class Command(BaseCommand):
+    help = "Encodes and stores the embedding of every hard and soft skill tag that does not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute tags that already have an embedding.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tags encoded per model call.')
+
+    def handle(self, *args, **options):
+        for model in (HardSkillsTagList, SoftSkillsTagList):
+            tags = model.objects.only('name').order_by('id')
+            if not options['all']:
+                tags = tags.filter(embedding__isnull=True)
+
+            total = 0
+            batch = []
+            for tag in tags.iterator(chunk_size=options['batch_size']):
+                batch.append(tag)
+                if len(batch) >= options['batch_size']:
+                    total += len(compute_skill_embeddings(batch))
+                    batch = []
+            if batch:
+                total += len(compute_skill_embeddings(batch))
+
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: stored {total} embedding(s)."))
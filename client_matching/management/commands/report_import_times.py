@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_MODULES = ['between_ims.urls', 'client_matching.views', 'client_matching.admin']
+
+# Only the code paths that actually encode text should import these
+ML_MODULES = ['torch', 'sentence_transformers', 'transformers', 'onnxruntime']
+
+
+class Command(BaseCommand):
+    help = "Reports the import-time breakdown of Django startup so slow or ML imports creeping in are noticed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES,
+                            help='Modules imported after django.setup().')
+        parser.add_argument('--top', type=int, default=25, help='Number of slowest modules to list.')
+        parser.add_argument('--fail-on-ml', action='store_true',
+                            help='Exit with an error if the ML stack is imported.')
+
+    def handle(self, *args, **options):
+        script = 'import django; django.setup()\n' + ''.join(f'import {module}\n' for module in options['modules'])
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                     'between_ims.settings'))
+
+        # A fresh interpreter, so nothing this process already imported hides from the report
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                                capture_output=True, text=True, env=env)
+        if result.returncode:
+            raise CommandError(f"Import failed:\n{result.stderr[-2000:]}")
+
+        # Lines look like "import time:   self [us] | cumulative | imported package", nested ones are indented
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            timings.append((name.strip(), int(self_us), int(cumulative_us), len(name) - len(name.lstrip())))
+
+        total_us = sum(cumulative for _, _, cumulative, depth in timings if depth == 1)
+        self.stdout.write(f"Total import time: {total_us / 1000:.0f} ms over {len(timings)} modules\n")
+
+        packages = {}
+        for name, self_us, _, _ in timings:
+            top_level = name.split('.')[0]
+            packages[top_level] = packages.get(top_level, 0) + self_us
+
+        self.stdout.write(self.style.NOTICE("Slowest packages (self time summed):"))
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {package}")
+
+        self.stdout.write(self.style.NOTICE("\nSlowest modules (cumulative):"))
+        for name, _, cumulative_us, _ in sorted(timings, key=lambda item: -item[2])[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+        imported_ml = [module for module in ML_MODULES if module in packages]
+        if not imported_ml:
+            self.stdout.write(self.style.SUCCESS("\nNo ML modules imported at startup."))
+            return
+
+        message = f"ML modules imported at startup: {', '.join(imported_ml)}"
+        if options['fail_on_ml']:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(f"\n{message}"))
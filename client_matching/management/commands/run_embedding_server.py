@@ -0,0 +1,46 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from client_matching.embedding_server import (EMBEDDING_SERVER_MAX_BATCH, EMBEDDING_SERVER_MAX_WAIT_MS,
+                                              EMBEDDING_SERVER_SOCKET, EmbeddingServer)
+from client_matching.inference import EMBEDDING_BACKEND, WARMUP_TEXTS, create_inference_backend
+from client_matching.utils import EMBEDDING_BATCH_SIZE, EncodingScheduler
+
+
+class Command(BaseCommand):
+    help = "Serves sentence embeddings over a Unix socket so every worker on the host shares one model."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=EMBEDDING_SERVER_SOCKET, help='Path of the Unix socket.')
+        parser.add_argument('--backend', default=EMBEDDING_BACKEND, help='Inference backend to load.')
+        parser.add_argument('--max-batch', type=int, default=EMBEDDING_SERVER_MAX_BATCH,
+                            help='Most texts encoded in one batch.')
+        parser.add_argument('--max-wait-ms', type=float, default=EMBEDDING_SERVER_MAX_WAIT_MS,
+                            help='How long to wait for more requests before encoding a batch.')
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError("Set EMBEDDING_SERVER_SOCKET or pass --socket")
+
+        backend = create_inference_backend(options['backend'])
+        backend.encode(WARMUP_TEXTS, len(WARMUP_TEXTS))
+        scheduler = EncodingScheduler(lambda: backend, options['max_batch'], options['max_wait_ms'],
+                                      batch_size=EMBEDDING_BATCH_SIZE)
+        server = EmbeddingServer(options['socket'], scheduler)
+
+        def stop(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding server ({backend.name}) listening on {options['socket']}"
+        ))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        self.stdout.write(self.style.SUCCESS(f"Embedding server stopped. Batching: {scheduler.stats_summary()}"))
@@ -0,0 +1,47 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from client_matching.maintenance import POSTING_MAINTENANCE_BATCH_SIZE, POSTING_MAINTENANCE_INTERVAL, run_maintenance
+
+
+class Command(BaseCommand):
+    help = ("Expire and reopen internship postings by application deadline, purge old soft-deleted postings "
+            "and roll applicants' skipped recommendations and tap counts over to the new day.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run once and exit, e.g. from cron.')
+        parser.add_argument('--interval', type=float, default=POSTING_MAINTENANCE_INTERVAL,
+                            help='Seconds between runs.')
+        parser.add_argument('--batch-size', type=int, default=POSTING_MAINTENANCE_BATCH_SIZE,
+                            help='Postings or applicants updated or deleted per statement.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while not self.stopping:
+            close_old_connections()
+            started = time.perf_counter()
+            try:
+                counts = run_maintenance(options['batch_size'])
+                self.stdout.write(f"Expired {counts['expired']}, reopened {counts['reopened']}, purged "
+                                  f"{counts['purged']} posting(s), rolled over {counts['rolled_over']} "
+                                  f"applicant(s) in {time.perf_counter() - started:.3f}s")
+            except Exception as e:
+                if options['once']:
+                    raise
+                self.stderr.write(f"Posting maintenance failed: {e}")
+            if options['once']:
+                break
+
+            # Sleep in short steps so a stop signal is handled promptly
+            deadline = time.monotonic() + options['interval']
+            while not self.stopping and time.monotonic() < deadline:
+                time.sleep(min(1.0, deadline - time.monotonic()))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,67 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from between_ims.metrics import flush_metrics, registry
+from client_matching.functions import process_matching_job
+from client_matching.inference import warm_up_inference_backend
+from client_matching.jobs import claim_next_job, complete_job, fail_job, purge_finished_jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued matching jobs so recommendations are computed outside the request path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 = no limit).')
+        parser.add_argument('--no-warmup', action='store_true', help='Load the model on the first job instead.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if not options['no_warmup']:
+            warm_up_inference_backend()
+
+        processed = 0
+        last_purge = 0.0
+        self.stdout.write(self.style.NOTICE('Matching worker started.'))
+
+        while not self.stopping:
+            close_old_connections()
+
+            if time.monotonic() - last_purge > 3600:
+                purge_finished_jobs()
+                last_purge = time.monotonic()
+
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.perf_counter()
+            try:
+                process_matching_job(job)
+                complete_job(job)
+                self.stdout.write(f"Job {job.matching_job_id} done in {time.perf_counter() - started:.3f}s")
+            except Exception as e:
+                fail_job(job, e)
+                self.stderr.write(f"Job {job.matching_job_id} failed (attempt {job.attempts}): {e}")
+            registry.observe('between_matching_jobs_duration_seconds', {}, time.perf_counter() - started)
+            flush_metrics()
+
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        flush_metrics(force=True)
+        self.stdout.write(self.style.SUCCESS(f'Matching worker stopped after {processed} job(s).'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 01:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0008_alter_internshipposting_accepted_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostingEmbedding',
+            fields=[
+                ('internship_posting', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='client_matching.internshipposting')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('vector', models.BinaryField()),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-17 01:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0009_postingembedding'),
+        ('user_account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicantEmbedding',
+            fields=[
+                ('applicant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='user_account.applicant')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('vector', models.BinaryField()),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
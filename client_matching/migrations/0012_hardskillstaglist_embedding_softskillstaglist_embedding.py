@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0011_matchingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hardskillstaglist',
+            name='embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='softskillstaglist',
+            name='embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0012_hardskillstaglist_embedding_softskillstaglist_embedding'),
+        ('user_account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationFeedEntry',
+            fields=[
+                ('feed_entry_id', models.AutoField(primary_key=True, serialize=False)),
+                ('position', models.PositiveIntegerField()),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user_account.applicant')),
+                ('recommendation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entry', to='client_matching.internshiprecommendation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['applicant', 'position'], name='client_matc_applica_bc85b0_idx')],
+            },
+        ),
+    ]
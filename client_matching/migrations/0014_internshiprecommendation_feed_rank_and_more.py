@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 02:14
+
+import random
+
+import client_matching.models
+from django.db import migrations, models
+
+
+def randomize_feed_ranks(apps, schema_editor):
+    # AddField gives every existing row the same default value
+    InternshipRecommendation = apps.get_model('client_matching', 'InternshipRecommendation')
+    recommendations = list(InternshipRecommendation.objects.only('pk'))
+    for recommendation in recommendations:
+        recommendation.feed_rank = random.random()
+    InternshipRecommendation.objects.bulk_update(recommendations, ['feed_rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0013_recommendationfeedentry'),
+        ('user_account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='internshiprecommendation',
+            name='feed_rank',
+            field=models.FloatField(default=client_matching.models.random_feed_rank),
+        ),
+        migrations.RunPython(randomize_feed_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='internshiprecommendation',
+            index=models.Index(fields=['applicant', 'status', 'feed_rank'], name='client_matc_applica_a33a3f_idx'),
+        ),
+    ]
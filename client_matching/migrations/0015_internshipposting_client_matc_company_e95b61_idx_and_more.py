@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0014_internshiprecommendation_feed_rank_and_more'),
+        ('user_account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='internshipposting',
+            index=models.Index(fields=['company', 'status', 'application_deadline'], name='client_matc_company_e95b61_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='internshipposting',
+            index=models.Index(fields=['status', 'date_modified'], name='client_matc_status_ff4935_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='internshiprecommendation',
+            index=models.Index(fields=['applicant', 'status', 'is_current'], name='client_matc_applica_b7b958_idx'),
+        ),
+    ]
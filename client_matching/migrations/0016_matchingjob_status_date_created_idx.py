@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0015_internshipposting_client_matc_company_e95b61_idx_and_more'),
+        ('user_account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchingjob',
+            index=models.Index(fields=['status', 'date_created'], name='client_matc_status_96de14_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_matching', '0016_matchingjob_status_date_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchingjob',
+            name='kind',
+            field=models.CharField(choices=[('Match', 'Match'), ('Embed', 'Embed')], default='Match', max_length=20),
+        ),
+    ]
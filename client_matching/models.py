@@ -1,3 +1,4 @@
+import random
 import uuid
 from decimal import Decimal
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
@@ -11,6 +12,9 @@ class HardSkillsTagList(models.Model):
     lightcast_identifier = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=500)
 
+    # float32 embedding of the name, filled by precompute_skill_embeddings and on creation
+    embedding = models.BinaryField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f'{self.name}'
 
@@ -19,6 +23,9 @@ class SoftSkillsTagList(models.Model):
     lightcast_identifier = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=500)
 
+    # float32 embedding of the name, filled by precompute_skill_embeddings and on creation
+    embedding = models.BinaryField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f'{self.name}'
 
@@ -69,10 +76,52 @@ class InternshipPosting(models.Model):
     max_slots = models.PositiveIntegerField(default=0, null=True, blank=True)
     accepted_count = models.PositiveIntegerField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Company posting lists and the deadline expiry/reopen updates
+            models.Index(fields=['company', 'status', 'application_deadline']),
+            # Incremental matching and the purge of old deleted postings
+            models.Index(fields=['status', 'date_modified']),
+        ]
+
     def __str__(self):
         return f'{self.internship_position} - {self.company.company_name}'
 
 
+class PostingEmbedding(models.Model):
+
+    internship_posting = models.OneToOneField('InternshipPosting', on_delete=models.CASCADE, primary_key=True,
+                                              related_name='embedding')
+
+    # sha256 of the skills, qualifications and key tasks the vector was computed from
+    content_hash = models.CharField(max_length=64)
+    vector = models.BinaryField()
+
+    date_modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.internship_posting_id} - {self.content_hash[:12]}'
+
+
+class ApplicantEmbedding(models.Model):
+
+    applicant = models.OneToOneField('user_account.Applicant', on_delete=models.CASCADE, primary_key=True,
+                                     related_name='embedding')
+
+    # sha256 of the hard skills, soft skills and quick introduction the vector was computed from
+    content_hash = models.CharField(max_length=64)
+    vector = models.BinaryField()
+
+    date_modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.applicant_id} - {self.content_hash[:12]}'
+
+
+def random_feed_rank():
+    return random.random()
+
+
 class InternshipRecommendation(models.Model):
 
     recommendation_id = models.AutoField(primary_key=True)
@@ -91,10 +140,71 @@ class InternshipRecommendation(models.Model):
 
     is_current = models.BooleanField(default=False)
 
+    # Random key for picking a random pending card with an index seek instead of loading them all
+    feed_rank = models.FloatField(default=random_feed_rank)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['applicant', 'status', 'feed_rank']),
+            # The applicant's current card and the tap lookup
+            models.Index(fields=['applicant', 'status', 'is_current']),
+        ]
+
     def __str__(self):
         return f'{self.recommendation_id} - {self.internship_posting}'
 
 
+class RecommendationFeedEntry(models.Model):
+
+    feed_entry_id = models.AutoField(primary_key=True)
+    applicant = models.ForeignKey('user_account.Applicant', on_delete=models.CASCADE)
+    recommendation = models.OneToOneField('InternshipRecommendation', on_delete=models.CASCADE,
+                                          related_name='feed_entry')
+
+    # Shuffled order of the applicant's pending cards; the feed serves the lowest position first
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['applicant', 'position'])]
+
+    def __str__(self):
+        return f'{self.applicant_id} - {self.position} - {self.recommendation_id}'
+
+
+class MatchingJob(models.Model):
+
+    matching_job_id = models.AutoField(primary_key=True)
+    applicant = models.ForeignKey('user_account.Applicant', on_delete=models.CASCADE, null=True, blank=True)
+    internship_posting = models.ForeignKey('InternshipPosting', on_delete=models.CASCADE, null=True, blank=True)
+
+    status = models.CharField(max_length=20, choices=[
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Done', 'Done'),
+        ('Failed', 'Failed')
+    ], default='Pending')
+    # Match recomputes recommendations, Embed only refreshes the stored embedding of the applicant or posting
+    kind = models.CharField(max_length=20, choices=[
+        ('Match', 'Match'),
+        ('Embed', 'Embed')
+    ], default='Match')
+
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=500, null=True, blank=True)
+
+    date_created = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # claim_next_job takes the oldest Pending job
+        indexes = [models.Index(fields=['status', 'date_created'])]
+
+    def __str__(self):
+        target = self.applicant_id or self.internship_posting_id
+        return f'{self.matching_job_id} - {target} - {self.status}'
+
+
 class Report(models.Model):
 
     report_id = models.AutoField(primary_key=True)
@@ -0,0 +1,189 @@
+import logging
+import threading
+from datetime import timedelta
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+
+from client_matching.instrumentation import timed
+from client_matching.models import InternshipPosting
+from client_matching.utils import EMBEDDING_DIMENSION, embedding_from_bytes
+
+logger = logging.getLogger(__name__)
+
+MATCHING_TOP_K = getattr(settings, 'MATCHING_TOP_K', 500)
+
+# Rows committed by another worker can carry a date_modified slightly older than our last sync
+INDEX_SYNC_OVERLAP = timedelta(seconds=60)
+INDEX_REBUILD_INTERVAL = timedelta(hours=1)
+
+
+class PostingIndex:
+    """
+    In-process top-K index over the stored embeddings of open postings. Rows are L2-normalised so a single
+    matrix-vector product gives the cosine similarity against every posting.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        self._ids = []
+        self._rows = {}
+        self._synced_at = None
+        self._built_at = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _upsert(self, posting_id, embedding: np.ndarray):
+        norm = np.linalg.norm(embedding)
+        if not norm:
+            self._remove(posting_id)
+            return
+
+        row = self._rows.get(posting_id)
+        if row is None:
+            row = len(self._ids)
+            if row == len(self._matrix):
+                grown = np.zeros((max(64, row * 2), EMBEDDING_DIMENSION), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self._ids.append(posting_id)
+            self._rows[posting_id] = row
+        self._matrix[row] = embedding / norm
+
+    def _remove(self, posting_id):
+        row = self._rows.pop(posting_id, None)
+        if row is None:
+            return
+
+        # Move the last row into the hole so removal stays O(1)
+        last = len(self._ids) - 1
+        if row != last:
+            last_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = last_id
+            self._rows[last_id] = row
+        self._ids.pop()
+
+    def _apply(self, postings):
+        for posting in postings:
+            posting_id = posting.internship_posting_id
+            stored = posting.embedding if hasattr(posting, 'embedding') else None
+            if posting.status != 'Open' or stored is None:
+                self._remove(posting_id)
+                continue
+            try:
+                self._upsert(posting_id, embedding_from_bytes(stored.vector))
+            except ValueError as e:
+                logger.warning(f"Skipping posting {posting_id} in index: {e}")
+                self._remove(posting_id)
+
+    def _postings(self):
+        return InternshipPosting.objects.select_related('embedding').only(
+            'internship_posting_id', 'status', 'embedding__vector'
+        )
+
+    def rebuild(self):
+        with self._lock:
+            started = now()
+            self._matrix = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+            self._ids = []
+            self._rows = {}
+            self._apply(self._postings().filter(status='Open'))
+            self._synced_at = started
+            self._built_at = started
+            logger.info(f"Posting index rebuilt with {len(self._ids)} postings")
+
+    def sync(self):
+        with self._lock:
+            if self._synced_at is None or now() - self._built_at > INDEX_REBUILD_INTERVAL:
+                self.rebuild()
+                return
+
+            started = now()
+            since = self._synced_at - INDEX_SYNC_OVERLAP
+            self._apply(self._postings().filter(
+                Q(date_modified__gt=since) | Q(embedding__date_modified__gt=since)
+            ))
+            self._synced_at = started
+
+    def refresh(self, posting_ids: List):
+        """Re-read the given postings after a create, edit, toggle or delete in this process."""
+        with self._lock:
+            if self._synced_at is None:
+                return
+            posting_ids = list(posting_ids)
+            postings = list(self._postings().filter(internship_posting_id__in=posting_ids))
+            self._apply(postings)
+            for missing_id in set(posting_ids) - {p.internship_posting_id for p in postings}:
+                self._remove(missing_id)
+
+    def search(self, query: np.ndarray, k: int) -> List:
+        with self._lock:
+            n = len(self._ids)
+            norm = np.linalg.norm(query)
+            if not n or not norm:
+                return []
+
+            scores = self._matrix[:n] @ (query / norm).astype(np.float32)
+            if k < n:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(n)
+            top = top[np.argsort(-scores[top])]
+            return [self._ids[i] for i in top]
+
+    def in_top_k(self, queries: np.ndarray, similarities: np.ndarray, k: Optional[int] = None,
+                 chunk_size: int = 1000) -> np.ndarray:
+        """
+        For each query row, whether a posting it scores `similarities[i]` against ranks among its top-K open
+        postings, i.e. whether candidates() would have returned that posting for it.
+        """
+        with self._lock:
+            self.sync()
+            k = k or MATCHING_TOP_K
+            n = len(self._ids)
+            if n <= k:
+                return np.ones(len(queries), dtype=bool)
+
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            selected = np.empty(len(queries), dtype=bool)
+            for start in range(0, len(queries), chunk_size):
+                chunk = (queries[start:start + chunk_size] / norms[start:start + chunk_size]).astype(np.float32)
+                scores = chunk @ self._matrix[:n].T
+                # The tolerance keeps the posting's own float32 row from outranking itself
+                better = (scores > similarities[start:start + chunk_size, None] + 1e-5).sum(axis=1)
+                selected[start:start + chunk_size] = better < k
+            return selected
+
+    @timed('posting_index.candidates')
+    def candidates(self, query: np.ndarray, k: Optional[int] = None) -> List:
+        """
+        Top-K open postings for the query, plus any open postings that have no stored embedding yet so
+        they still get encoded and scored. A query without a norm has nothing to rank by and gets every open
+        posting.
+        """
+        if not np.linalg.norm(query):
+            return list(InternshipPosting.objects.filter(status='Open').values_list('internship_posting_id',
+                                                                                   flat=True))
+        with self._lock:
+            self.sync()
+            candidate_ids = self.search(query, k or MATCHING_TOP_K)
+            unindexed_ids = InternshipPosting.objects.filter(status='Open', embedding__isnull=True) \
+                .values_list('internship_posting_id', flat=True)
+            return candidate_ids + [posting_id for posting_id in unindexed_ids if posting_id not in self._rows]
+
+
+posting_index = PostingIndex()
+
+
+def refresh_posting_index(posting_ids: List):
+    try:
+        posting_index.refresh(posting_ids)
+    except Exception as e:
+        logger.warning(f"Failed to refresh posting index: {e}")
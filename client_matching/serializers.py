@@ -15,8 +15,10 @@ from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.exceptions import TokenError
 
 from client_application.models import Application
-from client_matching.utils import get_profile_embedding, cosine_compare, monitor_performance, extract_skill_names, \
-    SIMILARITY_THRESHOLD, generate_embedding_cache_key, get_posting_embeddings_batch
+from client_matching.utils import cosine_compare, monitor_performance, extract_skill_names, \
+    SIMILARITY_THRESHOLD, generate_embedding_cache_key, build_posting_profile, load_posting_embeddings, \
+    schedule_posting_embedding_refresh, build_applicant_profile, get_applicant_embedding, \
+    schedule_skill_embeddings
 from user_account.models import Company, Applicant
 import googlemaps
 from django.contrib.auth.tokens import default_token_generator
@@ -38,6 +40,10 @@ from between_ims import settings
 from cea_management.models import Program, Department, School
 from client_matching.models import PersonInCharge, InternshipPosting, KeyTask, MinQualification, Benefit, \
     HardSkillsTagList, SoftSkillsTagList, InternshipRecommendation, Report, Advertisement
+from client_matching.feed import add_to_recommendation_feeds, rebuild_recommendation_feed, retire_recommendations
+from client_matching.instrumentation import increment, timed
+from client_matching.jobs import schedule_posting_matching
+from client_matching.posting_index import posting_index
 from django.core.exceptions import ValidationError
 
 from user_account.utils import validate_file_size
@@ -167,6 +173,15 @@ class InternshipPostingListSerializer(serializers.ModelSerializer):
             'max_slots'
         ]
 
+    # Relations read by the fields; loading them up front keeps a list at a fixed number of queries
+    select_related_fields = ['company', 'person_in_charge']
+    prefetch_related_fields = ['required_hard_skills', 'required_soft_skills', 'key_tasks', 'min_qualifications',
+                               'benefits']
+
+    @classmethod
+    def eager_load(cls, queryset):
+        return queryset.select_related(*cls.select_related_fields).prefetch_related(*cls.prefetch_related_fields)
+
     def get_required_hard_skills(self, obj):
         return [
             {"id": skill.lightcast_identifier, "name": skill.name}
@@ -370,6 +385,7 @@ class CreateInternshipPostingSerializer(serializers.ModelSerializer):
                     )
                     hard_skills.append(skill_instance)
                 internship_posting.required_hard_skills.set(hard_skills)
+                schedule_skill_embeddings(hard_skills)
             except json.JSONDecodeError:
                 raise serializers.ValidationError("Invalid format for required_hard_skills")
 
@@ -384,9 +400,13 @@ class CreateInternshipPostingSerializer(serializers.ModelSerializer):
                     )
                     soft_skills.append(skill_instance)
                 internship_posting.required_soft_skills.set(soft_skills)
+                schedule_skill_embeddings(soft_skills)
             except json.JSONDecodeError:
                 raise serializers.ValidationError("Invalid format for required_soft_skills")
 
+        schedule_posting_embedding_refresh(internship_posting)
+        schedule_posting_matching(internship_posting)
+
         return internship_posting
 
 
@@ -575,6 +595,7 @@ class EditInternshipPostingSerializer(serializers.ModelSerializer):
                     )
                     hard_skills.append(skill_instance)
                 instance.required_hard_skills.set(hard_skills)
+                schedule_skill_embeddings(hard_skills)
             except json.JSONDecodeError:
                 raise serializers.ValidationError("Invalid format for required_hard_skills")
 
@@ -589,9 +610,13 @@ class EditInternshipPostingSerializer(serializers.ModelSerializer):
                     )
                     soft_skills.append(skill_instance)
                 instance.required_soft_skills.set(soft_skills)
+                schedule_skill_embeddings(soft_skills)
             except json.JSONDecodeError:
                 raise serializers.ValidationError("Invalid format for required_soft_skills")
 
+        schedule_posting_embedding_refresh(instance)
+        schedule_posting_matching(instance)
+
         return instance
 
 
@@ -724,31 +749,52 @@ class InternshipMatchSerializer(serializers.Serializer):
     @monitor_performance("InternshipMatchSerializer.create")
     def create(self, validated_data):
         try:
+            started_at = now()
+            changed_since = self.context.get('changed_since')
+
             applicant_profile = self._build_applicant_profile()
-            posting_profiles, posting_lookup = self._get_posting_profiles_optimized()
+            applicant_embedding = get_applicant_embedding(self.applicant, applicant_profile)
+
+            candidate_ids = posting_index.candidates(applicant_embedding)
+            changed_ids = None
+            if changed_since:
+                # Incremental run: the applicant is unchanged, so only the candidates edited since the last match
+                # can have a different score
+                changed_ids = set(InternshipPosting.objects.filter(status='Open', date_modified__gt=changed_since)
+                                  .values_list('internship_posting_id', flat=True))
+                candidate_ids = [posting_id for posting_id in candidate_ids if posting_id in changed_ids]
+            posting_profiles, posting_lookup = self._get_posting_profiles_optimized(candidate_ids)
 
             if not posting_profiles:
                 logger.info("No open postings available for matching")
+                self._retire_unmatched([], changed_ids)
+                self._mark_matched(started_at)
                 return []
 
-            applicant_embedding = get_profile_embedding(
-                applicant_profile,
-                is_applicant=True
-            )
-
-            posting_embeddings = get_posting_embeddings_batch(posting_profiles)
+            stored_embeddings = {
+                posting_id: posting.embedding
+                for posting_id, posting in posting_lookup.items()
+                if hasattr(posting, 'embedding')
+            }
+            posting_embeddings = load_posting_embeddings(posting_profiles, stored_embeddings)
 
             ranked_results = cosine_compare(
                 applicant_embedding,
                 applicant_profile,
                 posting_embeddings,
-                posting_profiles
+                posting_profiles,
+                threshold=SIMILARITY_THRESHOLD
             )
 
-            self._update_applicant_and_recommendations(ranked_results, posting_lookup)
+            matched_posting_ids = self._update_applicant_and_recommendations(ranked_results, posting_lookup)
+            self._retire_unmatched(matched_posting_ids, changed_ids)
+            if changed_since:
+                add_to_recommendation_feeds(InternshipRecommendation.objects.filter(
+                    applicant=self.applicant, internship_posting_id__in=matched_posting_ids))
+            else:
+                rebuild_recommendation_feed(self.applicant.pk)
 
-            self.applicant.last_matched = now()
-            self.applicant.save(update_fields=['last_matched'])
+            self._mark_matched(started_at)
 
             return ranked_results
 
@@ -756,22 +802,32 @@ class InternshipMatchSerializer(serializers.Serializer):
             logger.error(f"Matching failed for applicant {self.applicant.user.user_id}: {e}")
             raise serializers.ValidationError(f"Matching process failed: {str(e)}")
 
-    def _safe_str(self, value):
-        return str(value).strip() if value else ""
+    def _retire_unmatched(self, matched_posting_ids: List, changed_ids: Optional[set] = None):
+        # Postings that were rescored (all of them, or the changed ones in an incremental run) but fell out of the
+        # top-K or below the threshold would otherwise keep stale scores in the feed
+        recommendations = InternshipRecommendation.objects.filter(applicant=self.applicant)
+        if changed_ids is not None:
+            recommendations = recommendations.filter(internship_posting_id__in=changed_ids)
+        retire_recommendations(recommendations.exclude(internship_posting_id__in=matched_posting_ids))
 
+    def _mark_matched(self, started_at: datetime):
+        # Use the start time so postings edited while this run was scoring are picked up next time
+        self.applicant.last_matched = started_at
+        self.applicant.save(update_fields=['last_matched'])
+
+    @timed('InternshipMatchSerializer._build_applicant_profile')
     def _build_applicant_profile(self) -> Dict:
-        return {
-            'uuid': self.applicant.user_id,
-            'hard_skills': self.applicant.hard_skills,
-            'soft_skills': self.applicant.soft_skills,
-            'preferred_modality': self._safe_str(self.applicant.preferred_modality),
-            'quick_introduction': self._safe_str(self.applicant.quick_introduction),
-            'latitude': self.applicant.latitude,
-            'longitude': self.applicant.longitude,
-        }
+        return build_applicant_profile(self.applicant)
 
-    def _get_posting_profiles_optimized(self) -> tuple[List[Dict], Dict]:
-        postings_queryset = InternshipPosting.objects.filter(status='Open').select_related('company').prefetch_related(
+    @timed('InternshipMatchSerializer._get_posting_profiles_optimized')
+    def _get_posting_profiles_optimized(self, posting_ids: Optional[List] = None) -> tuple[List[Dict], Dict]:
+        postings_queryset = InternshipPosting.objects.filter(status='Open')
+        if posting_ids is not None:
+            postings_queryset = postings_queryset.filter(internship_posting_id__in=posting_ids)
+
+        postings_queryset = postings_queryset.select_related(
+            'company', 'embedding'
+        ).prefetch_related(
             Prefetch('required_hard_skills', queryset=self.applicant.hard_skills.model.objects.only('name')),
             Prefetch('required_soft_skills', queryset=self.applicant.soft_skills.model.objects.only('name')),
             Prefetch('min_qualifications', queryset=MinQualification.objects.only('min_qualification')),
@@ -779,7 +835,8 @@ class InternshipMatchSerializer(serializers.Serializer):
             Prefetch('key_tasks', queryset=KeyTask.objects.only('key_task')),
         ).only(
             'internship_posting_id', 'modality', 'latitude', 'longitude',
-            'status', 'company__user_id', 'company__company_name'
+            'status', 'company__user_id', 'company__company_name',
+            'embedding__content_hash', 'embedding__vector'
         )
 
         profiles = []
@@ -787,17 +844,7 @@ class InternshipMatchSerializer(serializers.Serializer):
 
         for posting in postings_queryset:
             try:
-                profile = {
-                    'uuid': posting.internship_posting_id,
-                    'required_hard_skills': [hs.name for hs in posting.required_hard_skills.all() if hs.name],
-                    'required_soft_skills': [ss.name for ss in posting.required_soft_skills.all() if ss.name],
-                    'modality': posting.modality or '',
-                    'min_qualifications': [mq.min_qualification for mq in posting.min_qualifications.all() if mq.min_qualification],
-                    'benefits': [b.benefit for b in posting.benefits.all() if b.benefit],
-                    'key_tasks': [kt.key_task for kt in posting.key_tasks.all() if kt.key_task],
-                    'latitude': posting.latitude,
-                    'longitude': posting.longitude,
-                }
+                profile = build_posting_profile(posting)
                 profiles.append(profile)
                 posting_lookup[posting.internship_posting_id] = posting
             except Exception as e:
@@ -805,6 +852,7 @@ class InternshipMatchSerializer(serializers.Serializer):
         logger.info(f"Processed {len(profiles)} posting profiles")
         return profiles, posting_lookup
 
+    @timed('InternshipMatchSerializer._update_applicant_and_recommendations')
     @transaction.atomic
     def _update_applicant_and_recommendations(self, ranked_results: List[Dict], posting_lookup: Dict):
         from decimal import Decimal
@@ -821,7 +869,7 @@ class InternshipMatchSerializer(serializers.Serializer):
 
         if not valid_results:
             logger.info(f"No valid results above threshold {SIMILARITY_THRESHOLD}")
-            return
+            return []
 
         posting_ids = [result['internship_posting_id'] for result in valid_results]
         existing_recommendations = {
@@ -860,6 +908,9 @@ class InternshipMatchSerializer(serializers.Serializer):
             InternshipRecommendation.objects.bulk_create(recs_to_create, batch_size=100)
         if recs_to_update:
             InternshipRecommendation.objects.bulk_update(recs_to_update, ['similarity_score', 'status'], batch_size=100)
+        increment('recommendations.created', len(recs_to_create))
+        increment('recommendations.updated', len(recs_to_update))
+        return [rec.internship_posting_id for rec in recs_to_create + recs_to_update]
 
     def validate(self, attrs):
         if not self.applicant:
@@ -919,6 +970,15 @@ class InternshipRecommendationListSerializer(serializers.ModelSerializer):
             'is_only_for_practicum',
         ]
 
+    @classmethod
+    def eager_load(cls, queryset):
+        posting = InternshipPostingListSerializer
+        return queryset.select_related(
+            *[f'internship_posting__{field}' for field in posting.select_related_fields]
+        ).prefetch_related(
+            *[f'internship_posting__{field}' for field in posting.prefetch_related_fields]
+        )
+
     def get_required_hard_skills(self, obj):
         return [
             skill.name
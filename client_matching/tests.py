@@ -1,3 +1,777 @@
-from django.test import TestCase
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from geopy.distance import great_circle
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from silk.models import Request as SilkRequest
+
+from between_ims.query_budget import QueryBudgetTestMixin, query_shape, record_queries
+from cea_management.models import Department, Program, School
+from client_application.models import Application, Endorsement, Notification
+from client_application.views import ApplicationListView
+from client_matching.embedding_cache import DjangoEmbeddingCache, MmapEmbeddingCache
+from client_matching.embedding_server import (LENGTH_PREFIX, MAX_FRAME_BYTES, RESPONSE_HEADER, EmbeddingClient,
+                                             EmbeddingServer)
+from client_matching.feed import pop_recommendation, rebuild_recommendation_feed
+from client_matching.functions import match_posting_applicants, process_matching_job
+from client_matching.jobs import (MATCHING_JOB_MAX_ATTEMPTS, MATCHING_JOB_STALE_AFTER, claim_next_job,
+                                  enqueue_applicant_embedding, enqueue_applicant_matching, fail_job,
+                                  purge_finished_jobs)
+from client_matching.models import (ApplicantEmbedding, Benefit, HardSkillsTagList, InternshipPosting,
+                                    InternshipRecommendation, KeyTask, MatchingJob, MinQualification, PersonInCharge,
+                                    PostingEmbedding, RecommendationFeedEntry, SoftSkillsTagList)
+from client_matching.posting_index import PostingIndex
+from client_matching.serializers import InternshipMatchSerializer
+from client_matching.utils import (DISTANCE_WEIGHT, EMBEDDING_DIMENSION, MODALITY_WEIGHT, SIMILARITY_WEIGHT,
+                                   EncodingScheduler, SkillEmbeddingTable, build_applicant_profile,
+                                   build_posting_profile, coordinate_array, get_applicant_embedding,
+                                   get_posting_embeddings_batch, get_profile_embedding, load_posting_embeddings,
+                                   refresh_posting_embedding, schedule_applicant_embedding_refresh,
+                                   schedule_posting_embedding_refresh, schedule_skill_embeddings, score_matches)
+from user_account.models import Applicant, CareerEmplacementAdmin, Company, OJTCoordinator, User
+
+
+class ListEndpointTestCase(TestCase):
+
+    def setUp(self):
+        # A silk recording would add its own queries to the counts
+        patcher = mock.patch('between_ims.profiling.SILK_SAMPLE_RATE', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.company_user = User.objects.create_user(email='company@example.com', password='x',
+                                                     user_role='company', status='Active')
+        self.company = Company.objects.create(user=self.company_user, company_name='Acme',
+                                              company_address='Makati City', company_information='Software',
+                                              business_nature='Technology')
+        self.person_in_charge = PersonInCharge.objects.create(company=self.company, name='Pat', position='HR',
+                                                              email='pic@example.com')
+        self.hard_skills = [HardSkillsTagList.objects.create(lightcast_identifier=f'H{i}', name=f'Hard {i}')
+                            for i in range(3)]
+        self.soft_skills = [SoftSkillsTagList.objects.create(lightcast_identifier=f'S{i}', name=f'Soft {i}')
+                            for i in range(3)]
+
+        self.applicant_user = User.objects.create_user(email='applicant@example.com', password='x',
+                                                       user_role='applicant', status='Active')
+        self.applicant = Applicant.objects.create(user=self.applicant_user, first_name='Ana', last_name='Cruz',
+                                                  address='Quezon City', quick_introduction='IT student',
+                                                  mobile_number='09171234567')
+
+    def create_postings(self, count):
+        postings = []
+        for i in range(count):
+            posting = InternshipPosting.objects.create(
+                company=self.company, person_in_charge=self.person_in_charge,
+                internship_position=f'IT Intern {i}', ojt_hours=486,
+                internship_date_start=timezone.now() + timedelta(days=60),
+                application_deadline=timezone.now() + timedelta(days=30),
+            )
+            posting.required_hard_skills.set(self.hard_skills)
+            posting.required_soft_skills.set(self.soft_skills)
+            KeyTask.objects.create(internship_posting=posting, key_task='Build features')
+            MinQualification.objects.create(internship_posting=posting, min_qualification='IT student')
+            Benefit.objects.create(internship_posting=posting, benefit='Allowance')
+            postings.append(posting)
+        return postings
+
+    def create_recommendations(self, postings):
+        for posting in postings:
+            InternshipRecommendation.objects.create(applicant=self.applicant, internship_posting=posting)
+        # Matched after the postings changed and already rolled over today, so the feed only reads
+        Applicant.objects.filter(pk=self.applicant.pk).update(last_matched=timezone.now() + timedelta(minutes=1),
+                                                              tap_count_reset=timezone.now())
+
+    def client_for(self, user):
+        client = APIClient()
+        # Authenticated like a logged-in user, so the counts include JWTAuthentication loading the user
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+
+class QueryCountTestCase(ListEndpointTestCase):
+    """
+    The list endpoints must load a page in a fixed number of queries: the same for one row as for many, and
+    no more than the endpoint's bound.
+    """
+
+    def count_queries(self, user, url):
+        client = self.client_for(user)
+        # Never roll an advertisement, which replaces the card
+        with mock.patch('client_matching.views.random.random', return_value=1.0), \
+                CaptureQueriesContext(connection) as queries:
+            response = client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries), response
+
+    def assertFixedQueries(self, user, url, create, max_queries):
+        create(1)
+        few, response = self.count_queries(user, url)
+        self.assertTrue(response.json())
+        create(10)
+        many, _ = self.count_queries(user, url)
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, max_queries)
+
+    def test_company_posting_list(self):
+        self.assertFixedQueries(self.company_user, '/api/client_matching/internship_posting/',
+                                self.create_postings, max_queries=8)
+
+    def test_applicant_posting_list(self):
+        self.assertFixedQueries(self.applicant_user, '/api/client_matching/get/internship_postings/',
+                                self.create_postings, max_queries=7)
+
+    def test_feed_next_card(self):
+        self.create_recommendations(self.create_postings(20))
+        count, response = self.count_queries(self.applicant_user, '/api/client_matching/internship_recommendations/')
+        card = response.json()[0]
+        self.assertEqual(card['key_tasks'], ['Build features'])
+        self.assertEqual(len(card['required_hard_skills']), 3)
+        self.assertLessEqual(count, 16)
+
+    def test_feed_current_card(self):
+        self.create_recommendations(self.create_postings(20))
+        url = '/api/client_matching/internship_recommendations/'
+        self.count_queries(self.applicant_user, url)
+        count, _ = self.count_queries(self.applicant_user, url)
+        self.assertLessEqual(count, 9)
+
+    def test_feed_queries_do_not_grow_with_recommendations(self):
+        url = '/api/client_matching/internship_recommendations/'
+        self.create_recommendations(self.create_postings(1))
+        few, _ = self.count_queries(self.applicant_user, url)
+
+        InternshipRecommendation.objects.filter(applicant=self.applicant).update(status='Submitted',
+                                                                                is_current=False)
+        self.create_recommendations(self.create_postings(30))
+        many, _ = self.count_queries(self.applicant_user, url)
+        self.assertEqual(few, many)
+
+    def test_feed_drops_dead_entries_it_skips(self):
+        postings = self.create_postings(4)
+        self.create_recommendations(postings)
+        rebuild_recommendation_feed(self.applicant.pk)
+        queue = list(RecommendationFeedEntry.objects.filter(applicant=self.applicant)
+                     .select_related('recommendation').order_by('position'))
+        queue[0].recommendation.status = 'Submitted'
+        queue[0].recommendation.save()
+        InternshipPosting.objects.filter(pk=queue[1].recommendation.internship_posting_id).update(status='Deleted')
+
+        self.assertEqual(pop_recommendation(self.applicant.pk, {}).pk, queue[2].recommendation_id)
+        self.assertEqual(list(RecommendationFeedEntry.objects.filter(applicant=self.applicant)
+                              .values_list('recommendation_id', flat=True)), [queue[3].recommendation_id])
+
+
+class SilkSamplingTestCase(ListEndpointTestCase):
+
+    def get(self, url, sample_rate):
+        # Saved inline instead of by the writer thread, which has a connection outside the test transaction
+        with mock.patch('between_ims.profiling.SILK_SAMPLE_RATE', sample_rate), \
+                mock.patch('between_ims.profiling.silk_writer.submit', side_effect=lambda record: record.save()):
+            response = self.client_for(self.company_user).get(url, secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_only_sampled_requests_are_recorded(self):
+        url = '/api/client_matching/internship_posting/'
+        self.get(url, sample_rate=0)
+        self.assertFalse(SilkRequest.objects.exists())
+
+        self.get(url, sample_rate=1)
+        recorded = SilkRequest.objects.get()
+        self.assertEqual(recorded.path, url)
+        self.assertEqual(recorded.response.status_code, 200)
+        self.assertGreater(recorded.queries.count(), 0)
+
+
+class QueryBudgetTestCase(QueryBudgetTestMixin, ListEndpointTestCase):
+    """
+    The list endpoints stay within the query_budget declared on their views and run no query once per row.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.school = School.objects.create(school_name='Benilde', school_acronym='DLS-CSB', school_address='Manila',
+                                            domain='@benilde.edu.ph')
+        department = Department.objects.create(school=self.school, department_name='Computer Studies')
+        self.program = Program.objects.create(department=department, program_name='BS Information Technology')
+
+        self.coordinator_user = User.objects.create_user(email='coordinator@benilde.edu.ph', password='x',
+                                                         user_role='coordinator', status='Active')
+        OJTCoordinator.objects.create(user=self.coordinator_user, department=department, program=self.program,
+                                      first_name='Cora', last_name='Reyes')
+        self.cea_user = User.objects.create_user(email='cea@benilde.edu.ph', password='x', user_role='cea',
+                                                 status='Active')
+        CareerEmplacementAdmin.objects.create(user=self.cea_user, school=self.school)
+
+        postings = self.create_postings(3)
+        self.students = []
+        for i in range(4):
+            user = User.objects.create_user(email=f'student{i}@benilde.edu.ph', password='x', user_role='applicant',
+                                            status='Active')
+            student = Applicant.objects.create(
+                user=user, first_name='Student', last_name=str(i), address='Manila', quick_introduction='IT student',
+                mobile_number='09171234567', school=self.school, department=department, program=self.program,
+                in_practicum='Yes' if i % 2 else 'Pending', enrollment_record='',
+            )
+            student.hard_skills.set(self.hard_skills)
+            self.students.append(student)
+
+        statuses = ['Pending', 'Accepted', 'Rejected']
+        self.applications = [
+            Application.objects.create(applicant=student, internship_posting=posting, status=statuses[i % 3])
+            for student in self.students for i, posting in enumerate(postings)
+        ]
+        for i, application in enumerate(self.applications):
+            Endorsement.objects.create(program_id=self.program, application=application,
+                                       status='Pending' if i % 2 else 'Approved')
+        self.application = self.applications[0]
+        for notification_type in ['Applicant', 'Company'] * 3:
+            Notification.objects.create(application=self.application, notification_type=notification_type,
+                                        notification_text='Your application was viewed.')
+
+    def get(self, user, url):
+        recorder, response = self.assertWithinQueryBudget(self.client_for(user), url, secure=True)
+        return response.json()
+
+    def test_application_lists(self):
+        student = self.students[0].user
+        self.assertEqual(len(self.get(student, '/api/client_application/get/applications/')), 3)
+        self.assertEqual(len(self.get(self.company_user, '/api/client_application/get/applications/')), 12)
+        self.assertTrue(self.get(self.company_user,
+                                 '/api/client_application/get/applications/?applicant_name=Student+1'))
+
+    def test_notifications(self):
+        url = f'/api/client_application/notifications/?application={self.application.pk}'
+        notifications = self.get(self.students[0].user, url)
+        self.assertEqual(len(notifications), 3)
+        self.assertEqual(notifications[0]['internship_position'],
+                         self.application.internship_posting.internship_position)
+        self.assertEqual(len(self.get(self.company_user, url)), 3)
+
+    def test_applicant_lists(self):
+        for user, url, expected in [
+            (self.coordinator_user, '/api/user_account/applicant/', 5),
+            (self.coordinator_user, '/api/ojt_management/students/', 4),
+            (self.coordinator_user, '/api/ojt_management/students/in_practicum/', 2),
+            (self.coordinator_user, '/api/ojt_management/students/reqeusting_practicum/', 2),
+            (self.cea_user, '/api/cea_management/students/', 4),
+        ]:
+            with self.subTest(url=url):
+                students = self.get(user, url)
+                self.assertEqual(len(students), expected)
+                # Every student has an accepted application among the prefetched ones
+                self.assertEqual({student['application_status'] for student in students if student['applications']},
+                                 {'Accepted'})
+
+    def test_endorsement_lists(self):
+        responded = self.get(self.coordinator_user, '/api/ojt_management/responded_endorsements/')
+        pending = self.get(self.coordinator_user, '/api/ojt_management/endorsement_detail/')
+        self.assertEqual((len(responded), len(pending)), (6, 6))
+        self.assertEqual(len(pending[0]['key_tasks']), 1)
+
+    def test_repeated_query_shapes_are_reported(self):
+        self.assertEqual(query_shape('SELECT 1 FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+                         query_shape('SELECT 1 FROM t WHERE id IN (%s) LIMIT 1'))
+        with record_queries() as recorder:
+            for application in Application.objects.all():
+                application.applicant.user
+        shapes = recorder.repeated_shapes(threshold=3)
+        self.assertEqual([count for _, count in shapes], [12, 12])
+
+    def test_middleware_logs_requests_over_budget(self):
+        client = self.client_for(self.company_user)
+        with mock.patch('between_ims.query_budget.QUERY_BUDGET_ENABLED', True), \
+                mock.patch.object(ApplicationListView, 'query_budget', 0), \
+                self.assertLogs('between_ims.query_budget', 'WARNING') as logs:
+            client.get('/api/client_application/get/applications/', secure=True)
+        self.assertIn('budget is 0', logs.output[0])
+
+
+class FakeEncoder:
+    """Stands in for the sentence model: a unit vector seeded by the text, and a record of every encode call."""
+
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size):
+        self.calls.append(list(texts))
+        rows = [np.random.RandomState(int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], 'little'))
+                .randn(EMBEDDING_DIMENSION) for text in texts]
+        rows = np.array(rows, dtype=np.float32).reshape(-1, EMBEDDING_DIMENSION)
+        return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+    @property
+    def texts(self):
+        return [text for call in self.calls for text in call]
+
+
+class MatchingTestCase(ListEndpointTestCase):
+    """Matching with the fake encoder, the Django embedding cache and a posting index of this test's postings."""
+
+    top_k = 3
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.encoder = FakeEncoder()
+        self.index = PostingIndex()
+        for target, value in [
+            ('client_matching.utils.get_inference_backend', lambda: self.encoder),
+            ('client_matching.utils.EMBEDDING_SCHEDULER_MAX_LATENCY_MS', 0),
+            ('client_matching.utils.get_embedding_cache', lambda dimension: DjangoEmbeddingCache(dimension)),
+            ('client_matching.utils.SKILL_EMBEDDING_TABLES', [SkillEmbeddingTable(HardSkillsTagList),
+                                                              SkillEmbeddingTable(SoftSkillsTagList)]),
+            ('client_matching.posting_index.MATCHING_TOP_K', self.top_k),
+            ('client_matching.serializers.posting_index', self.index),
+            ('client_matching.functions.posting_index', self.index),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.applicant.hard_skills.set(self.hard_skills[:2])
+        self.applicant.soft_skills.set(self.soft_skills[:2])
+
+    def create_distinct_postings(self, count):
+        postings = self.create_postings(count)
+        for i, posting in enumerate(postings):
+            KeyTask.objects.create(internship_posting=posting, key_task=f'Distinct task {i}')
+        return postings
+
+    def embed_postings(self, postings):
+        for posting in postings:
+            refresh_posting_embedding(posting)
+
+    def match(self, mode='full'):
+        applicant = Applicant.objects.select_related('user').get(pk=self.applicant.pk)
+        context = {'applicant': applicant}
+        if mode == 'incremental':
+            context['changed_since'] = applicant.last_matched
+        InternshipMatchSerializer(context=context).create(validated_data={})
+        return applicant
+
+    def applicant_embedding(self):
+        applicant = Applicant.objects.get(pk=self.applicant.pk)
+        return get_applicant_embedding(applicant, build_applicant_profile(applicant))
+
+    def top_k_ids(self):
+        self.index.sync()
+        return set(self.index.search(self.applicant_embedding(), self.top_k))
+
+    def pending_posting_ids(self):
+        return set(InternshipRecommendation.objects.filter(applicant=self.applicant, status='Pending')
+                   .values_list('internship_posting_id', flat=True))
+
+
+class EmbeddingReuseTestCase(MatchingTestCase):
+
+    def test_another_model_does_not_reuse_cached_or_stored_embeddings(self):
+        posting = self.create_distinct_postings(1)[0]
+        refresh_posting_embedding(posting)
+        encoded = len(self.encoder.texts)
+        refresh_posting_embedding(posting)
+        self.assertEqual(len(self.encoder.texts), encoded)
+        content_hash = PostingEmbedding.objects.get(internship_posting=posting).content_hash
+
+        with mock.patch('client_matching.utils.EMBEDDING_MODEL_FINGERPRINT', 'other-model|onnx'), \
+                mock.patch('client_matching.embedding_cache.EMBEDDING_MODEL_FINGERPRINT', 'other-model|onnx'):
+            refresh_posting_embedding(posting)
+        self.assertGreater(len(self.encoder.texts), encoded)
+        self.assertNotEqual(PostingEmbedding.objects.get(internship_posting=posting).content_hash, content_hash)
+
+
+    def test_only_changed_postings_are_re_encoded(self):
+        postings = self.create_distinct_postings(3)
+        self.embed_postings(postings)
+        KeyTask.objects.filter(internship_posting=postings[0]).update(key_task='Edited task')
+        # With the text cache gone, anything not served from its stored embedding has to go through the model
+        cache.clear()
+        self.encoder.calls.clear()
+
+        profiles = [build_posting_profile(posting) for posting in postings]
+        stored = {embedding.internship_posting_id: embedding for embedding in PostingEmbedding.objects.all()}
+        matrix = load_posting_embeddings(profiles, stored)
+
+        self.assertEqual(set(self.encoder.texts), {'Edited task', 'IT student'})
+        self.assertTrue(np.all(np.linalg.norm(matrix, axis=1) > 0))
+        self.assertEqual(bytes(PostingEmbedding.objects.get(internship_posting=postings[0]).vector),
+                         matrix[0].tobytes())
+
+
+    def test_applicant_embedding_is_reused_until_the_profile_changes(self):
+        first = self.applicant_embedding()
+        cache.clear()
+        self.encoder.calls.clear()
+        np.testing.assert_array_equal(self.applicant_embedding(), first)
+        self.assertEqual(self.encoder.calls, [])
+
+        Applicant.objects.filter(pk=self.applicant.pk).update(quick_introduction='Data science student')
+        second = self.applicant_embedding()
+        self.assertEqual(self.encoder.texts, ['Data science student'])
+        self.assertFalse(np.array_equal(first, second))
+        self.assertEqual(bytes(ApplicantEmbedding.objects.get(applicant=self.applicant).vector), second.tobytes())
+
+
+class BatchEncodingTestCase(MatchingTestCase):
+
+    def test_posting_texts_are_encoded_once_in_one_call(self):
+        profiles = [build_posting_profile(posting) for posting in self.create_distinct_postings(4)]
+        matrix = get_posting_embeddings_batch(profiles)
+
+        self.assertEqual(len(self.encoder.texts), len(set(self.encoder.texts)))
+        posting_calls = [call for call in self.encoder.calls if 'Build features' in call]
+        self.assertEqual(len(posting_calls), 1)
+        expected = {'Build features', 'IT student'} | {f'Distinct task {i}' for i in range(4)}
+        self.assertEqual(set(posting_calls[0]), expected)
+        for row, profile in zip(matrix, profiles):
+            np.testing.assert_allclose(row, get_profile_embedding(profile, is_applicant=False), rtol=1e-6)
+
+
+class PostingIndexTestCase(MatchingTestCase):
+
+    def test_candidates_are_the_top_k_plus_unembedded_postings(self):
+        postings = self.create_distinct_postings(6)
+        self.embed_postings(postings[:5])
+        query = self.applicant_embedding()
+
+        vectors = {embedding.internship_posting_id: np.frombuffer(bytes(embedding.vector), dtype=np.float32)
+                   for embedding in PostingEmbedding.objects.all()}
+        similarity = {posting_id: vector @ query / np.linalg.norm(vector) for posting_id, vector in vectors.items()}
+        expected = sorted(similarity, key=similarity.get, reverse=True)[:self.top_k]
+        self.assertEqual(self.index.candidates(query), expected + [postings[5].internship_posting_id])
+
+        InternshipPosting.objects.filter(pk=expected[0]).update(status='Closed')
+        self.index.refresh([expected[0]])
+        self.assertNotIn(expected[0], self.index.candidates(query))
+
+    def test_a_query_without_a_norm_gets_every_open_posting(self):
+        postings = self.create_distinct_postings(5)
+        self.embed_postings(postings)
+        candidates = self.index.candidates(np.zeros(EMBEDDING_DIMENSION, dtype=np.float32))
+        self.assertEqual(set(candidates), {posting.internship_posting_id for posting in postings})
+
+
+class SkillEmbeddingTableTestCase(MatchingTestCase):
+
+    def test_skill_fields_are_gathered_by_tag_id(self):
+        ids = [skill.id for skill in self.hard_skills]
+        table = SkillEmbeddingTable(HardSkillsTagList)
+        table.ensure(ids)
+        self.assertEqual(sorted(self.encoder.texts), ['Hard 0', 'Hard 1', 'Hard 2'])
+
+        # Another process reads the persisted rows instead of encoding the names again
+        self.encoder.calls.clear()
+        other = SkillEmbeddingTable(HardSkillsTagList)
+        other.ensure(ids)
+        self.assertEqual(self.encoder.calls, [])
+
+        stored = [np.frombuffer(bytes(blob), dtype=np.float32)
+                  for blob in HardSkillsTagList.objects.filter(id__in=ids[:2]).values_list('embedding', flat=True)]
+        np.testing.assert_allclose(other.mean(ids[:2]), np.mean(stored, axis=0), rtol=1e-6)
+        np.testing.assert_array_equal(other.mean([]), np.zeros(EMBEDDING_DIMENSION, dtype=np.float32))
+
+    def test_profile_embeddings_do_not_encode_skill_names(self):
+        self.applicant_embedding()
+        # Without the text cache a second encode of a name would show up in the encoder's calls
+        cache.clear()
+        self.embed_postings(self.create_postings(2))
+        self.assertEqual(sorted(text for text in self.encoder.texts if text.startswith(('Hard', 'Soft'))),
+                         ['Hard 0', 'Hard 1', 'Hard 2', 'Soft 0', 'Soft 1', 'Soft 2'])
+
+
+class IncrementalMatchingTestCase(MatchingTestCase):
+
+    def test_incremental_match_keeps_to_the_top_k_and_retires_the_rest(self):
+        postings = self.create_distinct_postings(8)
+        self.embed_postings(postings)
+        self.match()
+        self.assertEqual(self.pending_posting_ids(), self.top_k_ids())
+
+        # Every posting is edited, so the ranking changes and the incremental run rescores all of them
+        for i, posting in enumerate(postings):
+            KeyTask.objects.filter(internship_posting=posting, key_task=f'Distinct task {i}') \
+                .update(key_task=f'Edited task {i}')
+        InternshipPosting.objects.filter(pk__in=[p.pk for p in postings]).update(date_modified=timezone.now())
+        self.embed_postings(postings)
+        self.match('incremental')
+
+        self.assertEqual(self.pending_posting_ids(), self.top_k_ids())
+        self.assertEqual(InternshipRecommendation.objects.filter(applicant=self.applicant).count(), self.top_k)
+
+
+class FanOutTestCase(MatchingTestCase):
+
+    def test_fan_out_agrees_with_a_full_match_and_retires_the_rest(self):
+        postings = self.create_distinct_postings(8)
+        self.embed_postings(postings)
+        top_k_ids = self.top_k_ids()
+        # Left over from before the posting dropped out of the applicant's top-K
+        outside = next(posting for posting in postings if posting.pk not in top_k_ids)
+        InternshipRecommendation.objects.create(applicant=self.applicant, internship_posting=outside)
+
+        for posting in postings:
+            match_posting_applicants(posting)
+
+        self.assertEqual(self.pending_posting_ids(), top_k_ids)
+        self.assertEqual(set(RecommendationFeedEntry.objects.filter(applicant=self.applicant)
+                             .values_list('recommendation__internship_posting_id', flat=True)), top_k_ids)
+
+
+class MatchingJobTestCase(MatchingTestCase):
+
+    def test_embedding_refreshes_are_queued_for_the_worker(self):
+        posting = self.create_postings(1)[0]
+        with mock.patch('client_matching.utils.MATCHING_WORKER_ENABLED', True), \
+                self.captureOnCommitCallbacks(execute=True):
+            schedule_skill_embeddings(self.hard_skills)
+            schedule_applicant_embedding_refresh(self.applicant)
+            schedule_applicant_embedding_refresh(self.applicant)
+            schedule_posting_embedding_refresh(posting)
+        self.assertEqual(self.encoder.calls, [])
+
+        jobs = list(MatchingJob.objects.filter(kind='Embed', status='Pending'))
+        self.assertEqual(len(jobs), 2)
+        for job in jobs:
+            process_matching_job(job)
+        self.assertTrue(ApplicantEmbedding.objects.filter(applicant=self.applicant).exists())
+        self.assertTrue(PostingEmbedding.objects.filter(internship_posting=posting).exists())
+
+
+    def test_one_pending_job_per_target_and_kind(self):
+        job = enqueue_applicant_matching(self.applicant)
+        self.assertIsNotNone(job)
+        self.assertIsNone(enqueue_applicant_matching(self.applicant))
+        self.assertIsNotNone(enqueue_applicant_embedding(self.applicant))
+
+        # Once the job runs, a later change needs a job of its own
+        self.assertEqual(claim_next_job(), job)
+        self.assertIsNotNone(enqueue_applicant_matching(self.applicant))
+        self.assertEqual(MatchingJob.objects.filter(status='Pending').count(), 2)
+
+    def test_claim_takes_the_oldest_job_and_hands_out_stale_ones_again(self):
+        first = enqueue_applicant_matching(self.applicant)
+        second = enqueue_applicant_embedding(self.applicant)
+
+        claimed = claim_next_job()
+        self.assertEqual((claimed, claimed.status, claimed.attempts), (first, 'Running', 1))
+        self.assertEqual(claim_next_job(), second)
+        self.assertIsNone(claim_next_job())
+
+        MatchingJob.objects.filter(pk=first.pk).update(started_at=timezone.now() - MATCHING_JOB_STALE_AFTER * 2)
+        reclaimed = claim_next_job()
+        self.assertEqual((reclaimed, reclaimed.attempts), (first, 2))
+
+    def test_failed_jobs_are_retried_up_to_the_attempt_limit(self):
+        enqueue_applicant_matching(self.applicant)
+        for attempt in range(1, MATCHING_JOB_MAX_ATTEMPTS + 1):
+            job = claim_next_job()
+            self.assertEqual(job.attempts, attempt)
+            fail_job(job, RuntimeError('boom'))
+        self.assertEqual((job.status, job.error), ('Failed', 'boom'))
+        self.assertIsNone(claim_next_job())
+
+    def test_purge_keeps_failed_jobs_longer_than_done_ones(self):
+        current_time = timezone.now()
+        for status, age in [('Done', timedelta(hours=1)), ('Done', timedelta(days=2)),
+                            ('Failed', timedelta(days=2)), ('Failed', timedelta(days=8)), ('Pending', None)]:
+            MatchingJob.objects.create(applicant=self.applicant, status=status,
+                                       finished_at=current_time - age if age else None)
+
+        self.assertEqual(purge_finished_jobs(), 2)
+        self.assertEqual(sorted(MatchingJob.objects.values_list('status', flat=True)), ['Done', 'Failed', 'Pending'])
+
+
+def scalar_score(similarity, applicant_modality, applicant_coords, posting_modality, posting_coords):
+    """The per-posting scoring score_matches replaced, kept here as the reference it has to agree with."""
+    if applicant_modality == posting_modality:
+        mod_score = 1.0
+    elif 'Hybrid' in (applicant_modality, posting_modality) and (
+            {'Onsite', 'WorkFromHome'} & {applicant_modality, posting_modality}):
+        mod_score = 0.5
+    else:
+        mod_score = 0.0
+
+    is_remote = posting_modality == 'WorkFromHome'
+    distance_km = 0.0
+    if not is_remote and None not in applicant_coords + posting_coords:
+        distance_km = great_circle(applicant_coords, posting_coords).km
+    if not is_remote and distance_km:
+        distance_score = next((score for bound, score in ((5, 1.0), (10, 0.75), (15, 0.5), (20, 0.25))
+                               if distance_km <= bound), 0.0)
+    else:
+        distance_score = 1.0
+    return similarity * SIMILARITY_WEIGHT + mod_score * MODALITY_WEIGHT + distance_score * DISTANCE_WEIGHT
+
+
+class ScoreMatchesParityTestCase(SimpleTestCase):
+
+    def test_vectorised_scores_match_the_scalar_scoring(self):
+        modalities = ['Onsite', 'WorkFromHome', 'Hybrid', '', 'Remote']
+        coords = [(14.5547, 121.0244), (14.5995, 120.9842), (14.6760, 121.0437), (14.4, 121.3), (None, None)]
+        postings = [(modality, coord) for modality in modalities for coord in coords]
+        similarities = np.linspace(0.1, 0.9, len(postings))
+
+        for applicant_modality in modalities:
+            for applicant_coords in coords:
+                scores = score_matches(
+                    similarities,
+                    applicant_modality,
+                    coordinate_array([applicant_coords[0]])[0],
+                    coordinate_array([applicant_coords[1]])[0],
+                    [modality for modality, _ in postings],
+                    coordinate_array([coord[0] for _, coord in postings]),
+                    coordinate_array([coord[1] for _, coord in postings]),
+                )
+                expected = [scalar_score(similarity, applicant_modality, applicant_coords, modality, coord)
+                            for similarity, (modality, coord) in zip(similarities, postings)]
+                np.testing.assert_allclose(scores['similarity_score'], expected, atol=1e-9,
+                                           err_msg=f'{applicant_modality!r} at {applicant_coords}')
+
+
+class MmapEmbeddingCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'embeddings.cache')
+
+    def vector(self, i, dimension=4):
+        return np.full(dimension, i, dtype=np.float32)
+
+    def test_entries_are_shared_with_other_instances(self):
+        MmapEmbeddingCache(self.path, 4, 16).set_many({'python': self.vector(1)})
+        found = MmapEmbeddingCache(self.path, 4, 16).get_many(['python', 'java'])
+        self.assertEqual(list(found), ['python'])
+        np.testing.assert_array_equal(found['python'], self.vector(1))
+
+    def test_a_full_table_overwrites_the_least_recently_used_entry(self):
+        # With as many slots as the probe length every text competes for the same slots
+        embedding_cache = MmapEmbeddingCache(self.path, 4, MmapEmbeddingCache.PROBE_LENGTH)
+        texts = [f'text {i}' for i in range(MmapEmbeddingCache.PROBE_LENGTH + 1)]
+        with mock.patch('client_matching.embedding_cache.time.time') as clock:
+            for i, text in enumerate(texts[:-1]):
+                clock.return_value = i + 1
+                embedding_cache.set_many({text: self.vector(i)})
+            clock.return_value = 100
+            embedding_cache.get_many([texts[0]])
+            clock.return_value = 101
+            embedding_cache.set_many({texts[-1]: self.vector(len(texts))})
+
+        self.assertEqual(set(embedding_cache.get_many(texts)), set(texts) - {texts[1]})
+
+    def test_a_mismatched_file_is_replaced_not_truncated(self):
+        old = MmapEmbeddingCache(self.path, 4, 16)
+        old.set_many({'python': self.vector(1)})
+        old_inode = os.stat(self.path).st_ino
+
+        new = MmapEmbeddingCache(self.path, 8, 16)
+        self.assertNotEqual(os.stat(self.path).st_ino, old_inode)
+        self.assertEqual(os.path.getsize(self.path), new.header_dtype.itemsize + 16 * new.slot_dtype.itemsize)
+        self.assertEqual(new.get_many(['python']), {})
+        # A process still mapping the old file keeps reading it instead of faulting
+        np.testing.assert_array_equal(old.get_many(['python'])['python'], self.vector(1))
+        new.set_many({'python': self.vector(2, dimension=8)})
+        np.testing.assert_array_equal(new.get_many(['python'])['python'], self.vector(2, dimension=8))
+
+
+class EncodingSchedulerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.encoder = FakeEncoder()
+
+    def test_requests_in_one_window_share_a_deduplicated_batch(self):
+        scheduler = EncodingScheduler(lambda: self.encoder, max_batch=100, max_latency_ms=200)
+        requests = [['python', 'django'], ['django', 'numpy'], ['python']]
+        futures = [scheduler.submit(texts) for texts in requests]
+
+        for texts, future in zip(requests, futures):
+            np.testing.assert_array_equal(future.result(timeout=5), FakeEncoder().encode(texts, 32))
+        self.assertEqual(self.encoder.calls, [['python', 'django', 'numpy']])
+        self.assertEqual({key: value for key, value in scheduler.stats_summary().items()
+                          if key in ('batches', 'requests', 'texts', 'encoded_texts')},
+                         {'batches': 1, 'requests': 3, 'texts': 5, 'encoded_texts': 3})
+
+    def test_a_full_batch_is_encoded_without_waiting_out_the_window(self):
+        scheduler = EncodingScheduler(lambda: self.encoder, max_batch=2, max_latency_ms=60000)
+        futures = [scheduler.submit([f'text {i}']) for i in range(4)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(scheduler.stats_summary()['full_batches'], 2)
+
+    def test_stats_can_be_read_and_reset_while_batches_run(self):
+        scheduler = EncodingScheduler(lambda: self.encoder, max_batch=100, max_latency_ms=0)
+        done = threading.Event()
+        errors = []
+
+        def read_stats():
+            while not done.is_set():
+                try:
+                    scheduler.stats_summary()
+                    scheduler.reset_stats()
+                except Exception as e:
+                    errors.append(e)
+
+        reader = threading.Thread(target=read_stats)
+        reader.start()
+        try:
+            for i in range(200):
+                scheduler.encode([f'text {i}'])
+        finally:
+            done.set()
+            reader.join()
+
+        self.assertEqual(errors, [])
+        scheduler.reset_stats()
+        self.assertEqual(scheduler.stats_summary()['batches'], 0)
+
+
+class EmbeddingServerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = os.path.join(directory.name, 'embedding.sock')
+        server = EmbeddingServer(self.socket_path, EncodingScheduler(FakeEncoder, max_batch=100, max_latency_ms=0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def send_raw(self, frame):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(self.socket_path)
+            sock.sendall(frame)
+            response = b''
+            while chunk := sock.recv(4096):
+                response += chunk
+        return response
+
+    def test_texts_are_encoded_by_the_server(self):
+        client = EmbeddingClient(self.socket_path)
+        self.addCleanup(client.close)
+        texts = ['python', 'django']
+        np.testing.assert_array_equal(client.encode(texts), FakeEncoder().encode(texts, 32))
+
+    def test_malformed_requests_get_an_error_and_the_connection_is_closed(self):
+        payload = b'{"text": []}'
+        for frame in [LENGTH_PREFIX.pack(MAX_FRAME_BYTES + 1), LENGTH_PREFIX.pack(9) + b'not json!',
+                      LENGTH_PREFIX.pack(len(payload)) + payload]:
+            with self.assertLogs('client_matching.embedding_server', 'WARNING'):
+                response = self.send_raw(frame)
+            status, length, _ = RESPONSE_HEADER.unpack(response[:RESPONSE_HEADER.size])
+            self.assertEqual(status, 1)
+            # Nothing follows the message: the server closed the connection
+            self.assertEqual(len(response), RESPONSE_HEADER.size + length)
+            self.assertTrue(response[RESPONSE_HEADER.size:].startswith(b'Malformed request'))
@@ -4,7 +4,7 @@ from client_matching.views import PersonInChargeListView, CreatePersonInChargeVi
     BulkDeletePersonInChargeView, InternshipPostingListView, CreateInternshipPostingView, EditInternshipPostingView, \
     BulkDeleteInternshipPostingView, ToggleInternshipPostingView, GetInternshipPostingsView, InternshipMatchView, \
     InternshipRecommendationListView, InternshipRecommendationTapView, UploadDocumentView, ReportPostingView, \
-    InPracticumView
+    InPracticumView, MatchingMetricsView
 
 urlpatterns = [
     path('internship_posting/', InternshipPostingListView.as_view()),
@@ -23,4 +23,5 @@ urlpatterns = [
     path('edit/applicant_document/', UploadDocumentView.as_view()),
     path('in_practicum/', InPracticumView.as_view()),
     path('report/posting/', ReportPostingView.as_view()),
+    path('matching_metrics/', MatchingMetricsView.as_view()),
 ]
\ No newline at end of file
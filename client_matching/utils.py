@@ -1,19 +1,26 @@
 import hashlib
-import pickle
-import logging, random
-from datetime import timedelta
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from functools import lru_cache
-from typing import List, Union, Dict
+from typing import List, Union, Dict, Optional
 
-import torch
+from django.conf import settings
 from django.contrib.admin import SimpleListFilter
-from django.core.cache import cache
+from django.db import transaction
 from django.utils.timezone import now
-from geopy.distance import great_circle
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from client_matching.models import InternshipPosting, InternshipRecommendation
-import os
+from client_matching.embedding_cache import get_embedding_cache
+from client_matching.inference import EMBEDDING_MODEL_FINGERPRINT, get_inference_backend
+from client_matching.instrumentation import increment, instrumentation, span, timed
+from client_matching.jobs import MATCHING_WORKER_ENABLED, enqueue_applicant_embedding, enqueue_posting_embedding
+from client_matching.maintenance import is_rolled_over, roll_over_applicants
+from client_matching.models import (InternshipPosting, PostingEmbedding, ApplicantEmbedding, HardSkillsTagList,
+                                    SoftSkillsTagList)
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +30,29 @@ SIMILARITY_WEIGHT = 0.95
 MODALITY_WEIGHT = 0.02
 DISTANCE_WEIGHT = 0.03
 
-EMBEDDING_CACHE_TIMEOUT = 3600
 EMBEDDING_DIMENSION = 384
+EMBEDDING_BATCH_SIZE = getattr(settings, 'EMBEDDING_BATCH_SIZE', 64)
+
+# Concurrent encode requests are merged for up to this long (0 encodes each request on its own thread)
+EMBEDDING_SCHEDULER_MAX_LATENCY_MS = getattr(settings, 'EMBEDDING_SCHEDULER_MAX_LATENCY_MS', 2)
+EMBEDDING_SCHEDULER_MAX_BATCH = getattr(settings, 'EMBEDDING_SCHEDULER_MAX_BATCH', 256)
+
+# Mean earth radius in km, the same one geopy's great_circle uses
+EARTH_RADIUS_KM = 6371.009
+
+# Upper bounds (inclusive) of the distance buckets and the score for each, the last one being "further"
+DISTANCE_BUCKETS_KM = np.array([5.0, 10.0, 15.0, 20.0])
+DISTANCE_BUCKET_SCORES = np.array([1.0, 0.75, 0.5, 0.25, 0.0])
+
+# Rows are the applicant's preferred modality, columns the posting's; the last index is anything unknown, which
+# scores 0.0 here. Equal modalities, unknown ones included, score 1.0 through the equality check in score_matches
+MODALITIES = ['Onsite', 'WorkFromHome', 'Hybrid']
+MODALITY_SCORES = np.array([
+    [1.0, 0.0, 0.5, 0.0],
+    [0.0, 1.0, 0.5, 0.0],
+    [0.5, 0.5, 1.0, 0.0],
+    [0.0, 0.0, 0.0, 0.0],
+])
 
 # Old weights with location / address included in embedding
 # APPLICANT_WEIGHTS = np.array([0.35, 0.35, 0.1, 0.1, 0.1])
@@ -34,36 +62,6 @@ APPLICANT_WEIGHTS = np.array([0.50, 0.25, 0.25])
 POSTING_WEIGHTS = np.array([0.50, 0.10, 0.20, 0.20])
 
 
-# Pytorch deterministic mode
-def _ensure_deterministic():
-    torch.manual_seed(0)
-    np.random.seed(0)
-    random.seed(0)
-    try:
-        torch.use_deterministic_algorithms(True)
-    except Exception:
-        pass
-    torch.backends.cudnn.deterministic = True
-    torch.backends.cudnn.benchmark = False
-
-
-@lru_cache(maxsize=1)
-def get_sentence_model():
-    try:
-        os.environ["HF_HOME"] = "/tmp/huggingface"
-        os.makedirs(os.environ["HF_HOME"], exist_ok=True)
-
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        model._first_module().auto_model = torch.quantization.quantize_dynamic(
-            model._first_module().auto_model, {torch.nn.Linear}, dtype=torch.qint8
-        )
-        logger.info("Sentence transformer model loaded with quantization")
-        return model
-    except Exception as e:
-        logger.error(f"Failed to load sentence transformer model: {e}")
-        raise
-
-
 def generate_embedding_cache_key(text: str) -> str:
     return f"text_embedding:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
 
@@ -72,16 +70,8 @@ def encode_text_with_cache(text: str) -> np.ndarray:
     if not text or not text.strip():
         return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
 
-    cache_key = generate_embedding_cache_key(text)
-    cached_embedding = cache.get(cache_key)
-    if cached_embedding is not None:
-        return np.array(cached_embedding, dtype=np.float32)
-
     try:
-        model = get_sentence_model()
-        embedding = model.encode(text, convert_to_numpy=True).astype(np.float32)
-        cache.set(cache_key, embedding.tolist(), EMBEDDING_CACHE_TIMEOUT)
-        return embedding
+        return encode_texts_batch([text])[text]
     except Exception as e:
         logger.error(f"Failed to encode text: {e}")
         return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
@@ -128,117 +118,265 @@ def encode_text_with_cache(text: str) -> np.ndarray:
 #     return np.mean(embeddings, axis=0) if embeddings else np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
 
 
-# Batch encoding using deterministic mode of Pytorch (Faster and fully optimized)
-USE_BINARY_CACHE = False
+class EncodingScheduler:
+    """
+    Dynamic micro-batching for encode requests made by concurrent threads. The first request starts a window
+    of max_latency_ms; every request that arrives before it closes, or before max_batch texts are queued, is
+    encoded with it in one deduplicated batch and each caller's future gets its own rows.
+    """
+
+    def __init__(self, backend_factory, max_batch: int, max_latency_ms: float, batch_size: int = None):
+        self.backend_factory = backend_factory
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.batch_size = batch_size or max_batch
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'batches': 0, 'requests': 0, 'texts': 0, 'encoded_texts': 0, 'full_batches': 0,
+                          'fill_total': 0.0}
+
+    def stats_summary(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        batches = stats['batches'] or 1
+        return {
+            **{key: value for key, value in stats.items() if key != 'fill_total'},
+            'mean_requests_per_batch': round(stats['requests'] / batches, 2),
+            'mean_batch_size': round(stats['encoded_texts'] / batches, 2),
+            'mean_fill': round(stats['fill_total'] / batches, 3),
+        }
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so each process starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name='encoding-scheduler', daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _collect(self, pending: queue.Queue):
+        batch = [pending.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_latency
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+            size += len(batch[-1][0])
+        return batch, size
+
+    def _run(self):
+        pending = self._queue
+        backend = None
+        while True:
+            batch, size = self._collect(pending)
+            unique_texts = list(dict.fromkeys(text for texts, _ in batch for text in texts))
+
+            # stats_summary and reset_stats run on other threads
+            with self._lock:
+                self.stats['batches'] += 1
+                self.stats['requests'] += len(batch)
+                self.stats['texts'] += size
+                self.stats['encoded_texts'] += len(unique_texts)
+                self.stats['full_batches'] += size >= self.max_batch
+                self.stats['fill_total'] += min(1.0, size / self.max_batch)
+
+            try:
+                if backend is None:
+                    backend = self.backend_factory()
+                embeddings = backend.encode(unique_texts, self.batch_size) if unique_texts else None
+                rows = {text: i for i, text in enumerate(unique_texts)}
+                for texts, future in batch:
+                    future.set_result(embeddings[[rows[text] for text in texts]] if texts
+                                      else np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32))
+            except Exception as e:
+                logger.error(f"Encoding batch of {len(unique_texts)} texts failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
 
 
-_sentence_model = None
+@lru_cache(maxsize=1)
+def get_encoding_scheduler() -> EncodingScheduler:
+    return EncodingScheduler(get_inference_backend, EMBEDDING_SCHEDULER_MAX_BATCH, EMBEDDING_SCHEDULER_MAX_LATENCY_MS,
+                             batch_size=EMBEDDING_BATCH_SIZE)
 
 
-def _serialize_embedding_for_cache(arr: np.ndarray) -> bytes:
-    try:
-        return pickle.dumps(arr, protocol=pickle.HIGHEST_PROTOCOL)
-    except Exception:
-        return b""
+def _encode_uncached(texts: List[str]) -> np.ndarray:
+    increment('embedding.texts_encoded', len(texts))
+    with span('embedding.encode'):
+        if EMBEDDING_SCHEDULER_MAX_LATENCY_MS > 0:
+            return get_encoding_scheduler().encode(texts)
+        return get_inference_backend().encode(texts, EMBEDDING_BATCH_SIZE)
+
+
+def encode_texts_batch(texts: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Embed every distinct text once. Cached texts are served from the cache and the rest go through the
+    model in as few encode calls as EMBEDDING_BATCH_SIZE allows. Returns a text -> embedding mapping.
+    """
+    unique_texts = list(dict.fromkeys(t for t in texts if t))
+    if not unique_texts:
+        return {}
 
+    embedding_cache = get_embedding_cache(EMBEDDING_DIMENSION)
 
-def _deserialize_embedding_from_cache(blob: bytes) -> np.ndarray:
+    embeddings = {}
     try:
-        return pickle.loads(blob)
-    except Exception:
-        return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
+        embeddings = embedding_cache.get_many(unique_texts)
+    except Exception as e:
+        logger.warning(f"Cache bulk-get failed: {e}")
 
+    to_encode = [text for text in unique_texts if text not in embeddings]
+    increment('embedding_cache.hits', len(unique_texts) - len(to_encode))
+    increment('embedding_cache.misses', len(to_encode))
 
-def get_persistent_model():
-    global _sentence_model
-    if _sentence_model is None:
-        _ensure_deterministic()
-        _sentence_model = get_sentence_model()
-        _sentence_model.eval()
-        if not hasattr(_sentence_model, "_is_quantized"):
-            setattr(_sentence_model, "_is_quantized", True)
-    return _sentence_model
+    if to_encode:
+        new_embs = _encode_uncached(to_encode)
 
+        for text, emb in zip(to_encode, new_embs):
+            embeddings[text] = emb
 
-def embed_each_item(item_list: List[str]) -> np.ndarray:
-    if not item_list:
-        return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
+        try:
+            embedding_cache.set_many({text: embeddings[text] for text in to_encode})
+        except Exception as e:
+            logger.warning(f"Cache bulk-set failed: {e}")
 
-    texts = [t.strip() for t in item_list if isinstance(t, str) and t.strip()]
+    return embeddings
+
+
+def _clean_texts(item_list) -> List[str]:
+    return [t.strip() for t in item_list or [] if isinstance(t, str) and t.strip()]
+
+
+def _mean_embedding(texts: List[str], embeddings: Dict[str, np.ndarray]) -> np.ndarray:
     if not texts:
         return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
+    return np.mean([embeddings[t] for t in texts], axis=0)
+
+
+class SkillEmbeddingTable:
+    """
+    Dense (max tag id + 1, EMBEDDING_DIMENSION) array of the persisted skill tag embeddings, so a skill
+    field's vector is a gather-and-mean by tag id with no model call or text hashing.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        self._present = np.zeros(0, dtype=bool)
+        self._loaded = False
+
+    def _store(self, tag_id: int, embedding: np.ndarray):
+        if tag_id >= len(self._matrix):
+            size = max(tag_id + 1, len(self._matrix) * 2, 256)
+            matrix = np.zeros((size, EMBEDDING_DIMENSION), dtype=np.float32)
+            matrix[:len(self._matrix)] = self._matrix
+            present = np.zeros(size, dtype=bool)
+            present[:len(self._present)] = self._present
+            self._matrix, self._present = matrix, present
+        self._matrix[tag_id] = embedding
+        self._present[tag_id] = True
+
+    def _has(self, tag_id: int) -> bool:
+        return tag_id < len(self._present) and self._present[tag_id]
+
+    def _load(self, tag_ids: Optional[List[int]] = None):
+        rows = self.model.objects.filter(embedding__isnull=False)
+        if tag_ids is not None:
+            rows = rows.filter(id__in=tag_ids)
+        for tag_id, blob in rows.values_list('id', 'embedding').iterator(chunk_size=2000):
+            try:
+                self._store(tag_id, embedding_from_bytes(blob))
+            except ValueError as e:
+                logger.warning(f"Discarding stored embedding for {self.model.__name__} {tag_id}: {e}")
+
+    def ensure(self, tag_ids: List[int]):
+        """Make sure every given tag has a row, reading it from the database or encoding it if needed."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+            missing = [tag_id for tag_id in set(tag_ids) if not self._has(tag_id)]
+            if missing:
+                # Another process may already have computed them
+                self._load(missing)
+                missing = [tag_id for tag_id in missing if not self._has(tag_id)]
+            if missing:
+                computed = compute_skill_embeddings(self.model.objects.filter(id__in=missing).only('name'))
+                for tag_id, embedding in computed.items():
+                    self._store(tag_id, embedding)
+
+    def mean(self, tag_ids: List[int]) -> np.ndarray:
+        with self._lock:
+            tag_ids = [tag_id for tag_id in tag_ids if self._has(tag_id)]
+            if not tag_ids:
+                return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
+            return self._matrix[tag_ids].mean(axis=0)
+
+
+def compute_skill_embeddings(tags) -> Dict[int, np.ndarray]:
+    """Encode and persist the name of every given skill tag in one batch. Returns tag id -> embedding."""
+    tags = [tag for tag in tags if tag.name and tag.name.strip()]
+    if not tags:
+        return {}
+
+    embeddings = encode_texts_batch([tag.name.strip() for tag in tags])
+    computed = {}
+    for tag in tags:
+        computed[tag.id] = embeddings[tag.name.strip()]
+        tag.embedding = embedding_to_bytes(computed[tag.id])
+
+    type(tags[0]).objects.bulk_update(tags, ['embedding'], batch_size=500)
+    return computed
+
+
+def schedule_skill_embeddings(tags):
+    # Runs before the posting / applicant embedding refresh scheduled later in the same transaction. With the
+    # worker, the tags are encoded by SkillEmbeddingTable.ensure when it embeds the profiles using them
+    new_tags = [tag for tag in tags if tag.embedding is None]
+    if not new_tags or MATCHING_WORKER_ENABLED:
+        return
+
+    def compute():
+        try:
+            compute_skill_embeddings(new_tags)
+        except Exception as e:
+            logger.error(f"Failed to compute skill tag embeddings: {e}")
 
-    keys = [generate_embedding_cache_key(t) for t in texts]
+    transaction.on_commit(compute)
 
-    cached_map = {}
-    try:
-        if hasattr(cache, "get_many"):
-            cached_map = cache.get_many(keys) or {}
-        else:
-            for k in keys:
-                v = cache.get(k)
-                if v is not None:
-                    cached_map[k] = v
-    except Exception as e:
-        logger.warning(f"Cache bulk-get failed: {e}")
-        for k in keys:
-            v = cache.get(k)
-            if v is not None:
-                cached_map[k] = v
-
-    n = len(texts)
-    result_embeddings = np.zeros((n, EMBEDDING_DIMENSION), dtype=np.float32)
-
-    to_encode_texts = []
-    to_encode_indices = []
-    for i, k in enumerate(keys):
-        cached_val = cached_map.get(k)
-        if cached_val is not None:
-            if USE_BINARY_CACHE and isinstance(cached_val, (bytes, bytearray)):
-                arr = _deserialize_embedding_from_cache(cached_val).astype(np.float32)
-                result_embeddings[i] = arr
-            else:
-                result_embeddings[i] = np.array(cached_val, dtype=np.float32)
-        else:
-            to_encode_texts.append(texts[i])
-            to_encode_indices.append(i)
-
-    if to_encode_texts:
-        model = get_persistent_model()
-        device = "cpu"
-
-        inference_ctx = torch.inference_mode if hasattr(torch, "inference_mode") else torch.no_grad
-        with inference_ctx():
-            new_embs = model.encode(
-                to_encode_texts,
-                convert_to_numpy=True,
-                show_progress_bar=False,
-                device=device,
-                batch_size=1
-            )
-
-        new_embs = np.array(new_embs, dtype=np.float32)
-        if new_embs.ndim == 1:
-            new_embs = new_embs.reshape(1, -1)
-
-        for idx, emb in zip(to_encode_indices, new_embs):
-            result_embeddings[idx] = emb
 
-        try:
-            if USE_BINARY_CACHE:
-                cache_payload = {keys[i]: _serialize_embedding_for_cache(result_embeddings[i]) for i in to_encode_indices}
-            else:
-                cache_payload = {keys[i]: result_embeddings[i].tolist() for i in to_encode_indices}
+hard_skill_embeddings = SkillEmbeddingTable(HardSkillsTagList)
+soft_skill_embeddings = SkillEmbeddingTable(SoftSkillsTagList)
+
+# In the order of the skill fields returned by _profile_field_texts
+SKILL_EMBEDDING_TABLES = [hard_skill_embeddings, soft_skill_embeddings]
 
-            if hasattr(cache, "set_many"):
-                cache.set_many(cache_payload, EMBEDDING_CACHE_TIMEOUT)
-            else:
-                for k, v in cache_payload.items():
-                    cache.set(k, v, EMBEDDING_CACHE_TIMEOUT)
-        except Exception as e:
-            logger.warning(f"Cache bulk-set failed: {e}")
 
-    return np.mean(result_embeddings, axis=0)
+def embed_each_item(item_list: List[str]) -> np.ndarray:
+    texts = _clean_texts(item_list)
+    return _mean_embedding(texts, encode_texts_batch(texts))
 
 
 def extract_skill_names(skills) -> List[str]:
@@ -266,65 +404,297 @@ def extract_skill_names(skills) -> List[str]:
     return []
 
 
-def get_profile_embedding(profile: dict, is_applicant: bool = True) -> np.ndarray:
-    try:
-        if is_applicant:
-            hard_skills = extract_skill_names(profile.get("hard_skills", []))
-            soft_skills = extract_skill_names(profile.get("soft_skills", []))
-            intro = profile.get("quick_introduction", "")
-
-            vectors = [
-                embed_each_item(hard_skills),
-                embed_each_item(soft_skills),
-                encode_text_with_cache(intro),
-            ]
-            weights = APPLICANT_WEIGHTS
-        else:
-            hard_skills = extract_skill_names(profile.get("required_hard_skills", []))
-            soft_skills = extract_skill_names(profile.get("required_soft_skills", []))
-            qualifications = profile.get("min_qualifications", [])
-            tasks = profile.get("key_tasks", [])
+def _profile_field_texts(profile: dict, is_applicant: bool) -> List[List[str]]:
+    if is_applicant:
+        fields = [
+            extract_skill_names(profile.get("hard_skills", [])),
+            extract_skill_names(profile.get("soft_skills", [])),
+            [profile.get("quick_introduction", "")],
+        ]
+    else:
+        fields = [
+            extract_skill_names(profile.get("required_hard_skills", [])),
+            extract_skill_names(profile.get("required_soft_skills", [])),
+            profile.get("min_qualifications", []),
+            profile.get("key_tasks", []),
+        ]
+    return [_clean_texts(field) for field in fields]
+
+
+def _profile_skill_ids(profile: dict, is_applicant: bool) -> List[Optional[List[int]]]:
+    # Tag ids for the hard / soft skill fields, None when the profile only carries names
+    if is_applicant:
+        return [profile.get("hard_skill_ids"), profile.get("soft_skill_ids")]
+    return [profile.get("required_hard_skill_ids"), profile.get("required_soft_skill_ids")]
+
+
+def _texts_to_encode(fields: List[List[str]], skill_ids: List[Optional[List[int]]]) -> List[str]:
+    return [
+        text for i, texts in enumerate(fields)
+        if i >= len(skill_ids) or skill_ids[i] is None
+        for text in texts
+    ]
+
+
+def _combine_field_embeddings(fields: List[List[str]], embeddings: Dict[str, np.ndarray],
+                              weights: np.ndarray, skill_ids: List[Optional[List[int]]] = ()) -> np.ndarray:
+    vectors = [
+        SKILL_EMBEDDING_TABLES[i].mean(skill_ids[i])
+        if i < len(skill_ids) and skill_ids[i] is not None
+        else _mean_embedding(texts, embeddings)
+        for i, texts in enumerate(fields)
+    ]
+    return np.average(vectors, axis=0, weights=weights).astype(np.float32)
+
+
+def _ensure_skill_embeddings(skill_ids_per_profile: List[List[Optional[List[int]]]]):
+    for i, table in enumerate(SKILL_EMBEDDING_TABLES):
+        table.ensure([tag_id for skill_ids in skill_ids_per_profile for tag_id in skill_ids[i] or []])
 
-            vectors = [
-                embed_each_item(hard_skills),
-                embed_each_item(soft_skills),
-                embed_each_item(qualifications),
-                embed_each_item(tasks),
-            ]
-            weights = POSTING_WEIGHTS
 
-        return np.average(vectors, axis=0, weights=weights).astype(np.float32)
+@timed('get_profile_embedding')
+def get_profile_embedding(profile: dict, is_applicant: bool = True) -> np.ndarray:
+    try:
+        fields = _profile_field_texts(profile, is_applicant)
+        skill_ids = _profile_skill_ids(profile, is_applicant)
+        _ensure_skill_embeddings([skill_ids])
+        embeddings = encode_texts_batch(_texts_to_encode(fields, skill_ids))
+        weights = APPLICANT_WEIGHTS if is_applicant else POSTING_WEIGHTS
+        return _combine_field_embeddings(fields, embeddings, weights, skill_ids)
 
     except Exception as e:
         logger.error(f"Failed to generate profile embedding: {e}")
         return np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
 
 
+@timed('get_posting_embeddings_batch')
 def get_posting_embeddings_batch(posting_profiles: List[dict]) -> np.ndarray:
-    embeddings = []
-    for profile in posting_profiles:
-        embedding = get_profile_embedding(profile, is_applicant=False)
-        embeddings.append(embedding)
-    return np.array(embeddings, dtype=np.float32)
+    # Every field of every posting is collected first so the model sees one deduplicated list of texts
+    profile_fields = [_profile_field_texts(profile, is_applicant=False) for profile in posting_profiles]
+    profile_skill_ids = [_profile_skill_ids(profile, is_applicant=False) for profile in posting_profiles]
+    all_texts = [
+        text for fields, skill_ids in zip(profile_fields, profile_skill_ids)
+        for text in _texts_to_encode(fields, skill_ids)
+    ]
 
+    try:
+        _ensure_skill_embeddings(profile_skill_ids)
+        embeddings = encode_texts_batch(all_texts)
+    except Exception as e:
+        logger.error(f"Failed to generate posting embeddings: {e}")
+        return np.zeros((len(posting_profiles), EMBEDDING_DIMENSION), dtype=np.float32)
+
+    matrix = np.zeros((len(posting_profiles), EMBEDDING_DIMENSION), dtype=np.float32)
+    for i, (fields, skill_ids) in enumerate(zip(profile_fields, profile_skill_ids)):
+        matrix[i] = _combine_field_embeddings(fields, embeddings, POSTING_WEIGHTS, skill_ids)
+    return matrix
+
+
+def build_posting_profile(posting) -> dict:
+    hard_skills = [hs for hs in posting.required_hard_skills.all() if hs.name]
+    soft_skills = [ss for ss in posting.required_soft_skills.all() if ss.name]
+    return {
+        'uuid': posting.internship_posting_id,
+        'required_hard_skills': [hs.name for hs in hard_skills],
+        'required_soft_skills': [ss.name for ss in soft_skills],
+        'required_hard_skill_ids': [hs.id for hs in hard_skills],
+        'required_soft_skill_ids': [ss.id for ss in soft_skills],
+        'modality': posting.modality or '',
+        'min_qualifications': [mq.min_qualification for mq in posting.min_qualifications.all() if mq.min_qualification],
+        'benefits': [b.benefit for b in posting.benefits.all() if b.benefit],
+        'key_tasks': [kt.key_task for kt in posting.key_tasks.all() if kt.key_task],
+        'latitude': posting.latitude,
+        'longitude': posting.longitude,
+    }
+
+
+def posting_content_hash(profile: dict) -> str:
+    # Only the fields that feed get_profile_embedding; the per-field means are order independent
+    payload = json.dumps([
+        EMBEDDING_MODEL_FINGERPRINT,
+        sorted(extract_skill_names(profile.get("required_hard_skills", []))),
+        sorted(extract_skill_names(profile.get("required_soft_skills", []))),
+        sorted(profile.get("min_qualifications", [])),
+        sorted(profile.get("key_tasks", [])),
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def embedding_to_bytes(embedding: np.ndarray) -> bytes:
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def embedding_from_bytes(blob) -> np.ndarray:
+    embedding = np.frombuffer(bytes(blob), dtype=np.float32)
+    if embedding.shape != (EMBEDDING_DIMENSION,):
+        raise ValueError(f"Stored embedding has shape {embedding.shape}, expected ({EMBEDDING_DIMENSION},)")
+    return embedding
+
+
+def save_posting_embeddings(posting_ids: list, content_hashes: list, embeddings: np.ndarray):
+    # A zero vector means encoding failed (or there was nothing to encode), so it is recomputed next time
+    rows = [
+        PostingEmbedding(internship_posting_id=posting_id, content_hash=content_hash,
+                         vector=embedding_to_bytes(embedding))
+        for posting_id, content_hash, embedding in zip(posting_ids, content_hashes, embeddings)
+        if np.any(embedding)
+    ]
+    if not rows:
+        return
+
+    PostingEmbedding.objects.bulk_create(
+        rows,
+        batch_size=100,
+        update_conflicts=True,
+        unique_fields=['internship_posting'],
+        update_fields=['content_hash', 'vector', 'date_modified'],
+    )
+
+
+def refresh_posting_embedding(posting) -> np.ndarray:
+    profile = build_posting_profile(posting)
+    content_hash = posting_content_hash(profile)
+
+    stored = PostingEmbedding.objects.filter(internship_posting_id=posting.internship_posting_id,
+                                             content_hash=content_hash) \
+        .values_list('vector', flat=True).first()
+    if stored is not None:
+        try:
+            return embedding_from_bytes(stored)
+        except ValueError as e:
+            logger.warning(f"Discarding stored embedding for posting {posting.internship_posting_id}: {e}")
+
+    embedding = get_profile_embedding(profile, is_applicant=False)
+    save_posting_embeddings([posting.internship_posting_id], [content_hash], embedding.reshape(1, -1))
+    return embedding
+
+
+def schedule_posting_embedding_refresh(posting):
+    """Re-embed the posting after the transaction commits: in the worker when it is enabled, else inline."""
+    from client_matching.posting_index import refresh_posting_index
+
+    if MATCHING_WORKER_ENABLED:
+        # Each web process's index picks the new vector up on its next sync
+        transaction.on_commit(lambda: _enqueue_embedding(enqueue_posting_embedding, posting))
+        return
+
+    def refresh():
+        try:
+            refresh_posting_embedding(posting)
+        except Exception as e:
+            logger.error(f"Failed to refresh embedding for posting {posting.internship_posting_id}: {e}")
+        refresh_posting_index([posting.internship_posting_id])
+
+    transaction.on_commit(refresh)
+
+
+def build_applicant_profile(applicant) -> dict:
+    hard_skills = [hs for hs in applicant.hard_skills.only('name') if hs.name]
+    soft_skills = [ss for ss in applicant.soft_skills.only('name') if ss.name]
+    return {
+        'uuid': applicant.user_id,
+        'hard_skills': [hs.name for hs in hard_skills],
+        'soft_skills': [ss.name for ss in soft_skills],
+        'hard_skill_ids': [hs.id for hs in hard_skills],
+        'soft_skill_ids': [ss.id for ss in soft_skills],
+        'preferred_modality': str(applicant.preferred_modality).strip() if applicant.preferred_modality else "",
+        'quick_introduction': str(applicant.quick_introduction).strip() if applicant.quick_introduction else "",
+        'latitude': applicant.latitude,
+        'longitude': applicant.longitude,
+    }
+
+
+def applicant_content_hash(profile: dict) -> str:
+    payload = json.dumps([
+        EMBEDDING_MODEL_FINGERPRINT,
+        sorted(extract_skill_names(profile.get("hard_skills", []))),
+        sorted(extract_skill_names(profile.get("soft_skills", []))),
+        profile.get("quick_introduction", ""),
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def save_applicant_embedding(applicant_id, content_hash: str, embedding: np.ndarray):
+    if not np.any(embedding):
+        return
+    ApplicantEmbedding.objects.update_or_create(
+        applicant_id=applicant_id,
+        defaults={'content_hash': content_hash, 'vector': embedding_to_bytes(embedding)}
+    )
 
-def modality_score(applicant_modality: str, posting_modality: str) -> float:
-    if applicant_modality == posting_modality:
-        return 1.0
-    if "Hybrid" in [applicant_modality, posting_modality]:
-        if "Onsite" in [applicant_modality, posting_modality] or "WorkFromHome" in [applicant_modality, posting_modality]:
-            return 0.5
-    return 0.0
 
+def get_applicant_embedding(applicant, profile: dict = None) -> np.ndarray:
+    profile = profile or build_applicant_profile(applicant)
+    content_hash = applicant_content_hash(profile)
 
-def calculate_distance(coord1: tuple, coord2: tuple) -> float:
+    stored = ApplicantEmbedding.objects.filter(applicant_id=applicant.pk, content_hash=content_hash) \
+        .values_list('vector', flat=True).first()
+    if stored is not None:
+        try:
+            return embedding_from_bytes(stored)
+        except ValueError as e:
+            logger.warning(f"Discarding stored embedding for applicant {applicant.pk}: {e}")
+
+    embedding = get_profile_embedding(profile, is_applicant=True)
+    try:
+        save_applicant_embedding(applicant.pk, content_hash, embedding)
+    except Exception as e:
+        logger.warning(f"Failed to persist embedding for applicant {applicant.pk}: {e}")
+    return embedding
+
+
+def schedule_applicant_embedding_refresh(applicant):
+    if MATCHING_WORKER_ENABLED:
+        transaction.on_commit(lambda: _enqueue_embedding(enqueue_applicant_embedding, applicant))
+        return
+
+    def refresh():
+        try:
+            get_applicant_embedding(applicant)
+        except Exception as e:
+            logger.error(f"Failed to refresh embedding for applicant {applicant.pk}: {e}")
+
+    transaction.on_commit(refresh)
+
+
+def _enqueue_embedding(enqueue, target):
     try:
-        if None in coord1 or None in coord2:
-            return 0.0
-        return great_circle(coord1, coord2).km
+        enqueue(target)
     except Exception as e:
-        logger.warning(f"Distance calculation failed: {e}")
-        return 0.0
+        logger.error(f"Failed to queue embedding refresh for {target.pk}: {e}")
+
+
+def load_posting_embeddings(posting_profiles: List[dict], stored_embeddings: Dict) -> np.ndarray:
+    """
+    Build the (N, EMBEDDING_DIMENSION) posting matrix from the persisted vectors. stored_embeddings maps a
+    posting id to its PostingEmbedding; postings whose content hash no longer matches are re-encoded and saved.
+    """
+    matrix = np.zeros((len(posting_profiles), EMBEDDING_DIMENSION), dtype=np.float32)
+    stale_indices = []
+    stale_hashes = []
+
+    for i, profile in enumerate(posting_profiles):
+        content_hash = posting_content_hash(profile)
+        stored = stored_embeddings.get(profile['uuid'])
+        if stored is not None and stored.content_hash == content_hash:
+            try:
+                matrix[i] = embedding_from_bytes(stored.vector)
+                continue
+            except ValueError as e:
+                logger.warning(f"Discarding stored embedding for posting {profile['uuid']}: {e}")
+        stale_indices.append(i)
+        stale_hashes.append(content_hash)
+
+    if stale_indices:
+        logger.info(f"Encoding {len(stale_indices)} of {len(posting_profiles)} posting embeddings")
+        fresh = get_posting_embeddings_batch([posting_profiles[i] for i in stale_indices])
+        matrix[stale_indices] = fresh
+        try:
+            save_posting_embeddings([posting_profiles[i]['uuid'] for i in stale_indices], stale_hashes, fresh)
+        except Exception as e:
+            logger.warning(f"Failed to persist posting embeddings: {e}")
+
+    return matrix
 
 
 def cosine_similarity_vectorized(a: np.ndarray, b: np.ndarray) -> Union[float, np.ndarray]:
@@ -341,102 +711,112 @@ def cosine_similarity_vectorized(a: np.ndarray, b: np.ndarray) -> Union[float, n
         return 0.0 if b.ndim == 1 else np.zeros(len(b))
 
 
+def modality_indices(modalities) -> np.ndarray:
+    modalities = np.asarray(modalities)
+    indices = np.full(modalities.shape, len(MODALITIES), dtype=np.intp)
+    for i, modality in enumerate(MODALITIES):
+        indices[modalities == modality] = i
+    return indices
+
+
+def coordinate_array(values) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def score_matches(raw_similarity, applicant_modality, applicant_lat, applicant_lon,
+                  posting_modality, posting_lat, posting_lon) -> Dict[str, np.ndarray]:
+    """
+    Vectorised version of the similarity / modality / distance scoring. Every argument is an array (or
+    scalar) that broadcasts against the others; modalities are the raw strings and missing coordinates are NaN.
+    """
+    raw_similarity = np.asarray(raw_similarity, dtype=np.float64)
+    applicant_modality, posting_modality = np.asarray(applicant_modality), np.asarray(posting_modality)
+    is_remote = posting_modality == 'WorkFromHome'
+
+    distance_km = haversine_km(applicant_lat, applicant_lon, posting_lat, posting_lon)
+    distance_km = np.where(is_remote | np.isnan(distance_km), 0.0, distance_km)
+
+    bucket_scores = DISTANCE_BUCKET_SCORES[np.searchsorted(DISTANCE_BUCKETS_KM, distance_km, side='left')]
+    dist_component = np.where(is_remote | (distance_km == 0), 1.0, bucket_scores) * DISTANCE_WEIGHT
+
+    sim_component = raw_similarity * SIMILARITY_WEIGHT
+    mod_score = np.where(applicant_modality == posting_modality, 1.0,
+                         MODALITY_SCORES[modality_indices(applicant_modality), modality_indices(posting_modality)])
+    mod_component = mod_score * MODALITY_WEIGHT
+    final_score = sim_component + mod_component + dist_component
+
+    shape = np.broadcast(raw_similarity, is_remote, distance_km).shape
+    return {
+        'similarity_score': np.broadcast_to(final_score, shape),
+        'semantic_similarity_component': np.broadcast_to(sim_component, shape),
+        'modality_score_component': np.broadcast_to(mod_component, shape),
+        'distance_score_component': np.broadcast_to(dist_component, shape),
+        'raw_cosine_similarity': np.broadcast_to(raw_similarity, shape),
+        'distance_km': np.broadcast_to(distance_km, shape),
+        'is_remote': np.broadcast_to(is_remote, shape),
+    }
+
+
+@timed('cosine_compare')
 def cosine_compare(applicant_embedding: np.ndarray, applicant_profile: dict,
-                   posting_embeddings: np.ndarray, posting_profiles: list) -> List[Dict]:
+                   posting_embeddings: np.ndarray, posting_profiles: list,
+                   threshold: Optional[float] = None) -> List[Dict]:
     try:
         similarity_scores = cosine_similarity_vectorized(applicant_embedding, posting_embeddings)
-        applicant_coords = (applicant_profile.get("latitude"), applicant_profile.get("longitude"))
-        applicant_modality = applicant_profile.get("preferred_modality", "")
-
-        results = []
-        for score, profile in zip(similarity_scores, posting_profiles):
-            profile_coords = (profile.get("latitude"), profile.get("longitude"))
-            posting_modality = profile.get("modality", "")
-            is_remote = posting_modality == "WorkFromHome"
-
-            if not is_remote and None not in applicant_coords + profile_coords:
-                distance_km = calculate_distance(applicant_coords, profile_coords)
-            else:
-                distance_km = 0.0
-
-            mod_score = modality_score(applicant_modality, posting_modality)
-
-            if not is_remote and distance_km:
-                if distance_km <= 5:
-                    distance_score = 1.0
-                elif distance_km <= 10:
-                    distance_score = 0.75
-                elif distance_km <= 15:
-                    distance_score = 0.5
-                elif distance_km <= 20:
-                    distance_score = 0.25
-                else:
-                    distance_score = 0.0
-                dist_component = distance_score * DISTANCE_WEIGHT
-            else:
-                dist_component = DISTANCE_WEIGHT
 
-            sim_component = score * SIMILARITY_WEIGHT
-            mod_component = mod_score * MODALITY_WEIGHT
+        scores = score_matches(
+            similarity_scores,
+            applicant_profile.get("preferred_modality", ""),
+            coordinate_array([applicant_profile.get("latitude")])[0],
+            coordinate_array([applicant_profile.get("longitude")])[0],
+            [profile.get("modality", "") for profile in posting_profiles],
+            coordinate_array([profile.get("latitude") for profile in posting_profiles]),
+            coordinate_array([profile.get("longitude") for profile in posting_profiles]),
+        )
 
-            final_score = sim_component + mod_component + dist_component
+        final_scores = np.round(scores['similarity_score'], 3)
+        order = np.argsort(-final_scores, kind='stable')
+        if threshold is not None:
+            order = order[final_scores[order] >= threshold]
 
+        results = []
+        for i in order:
+            profile = posting_profiles[i]
             results.append({
                 "internship_posting_id": profile.get("uuid", "Unknown UUID"),
-                "similarity_score": round(final_score, 3),
-                "semantic_similarity_component": round(sim_component, 3),
-                "modality_score_component": round(mod_component, 3),
-                "distance_score_component": round(dist_component, 3),
-                "raw_cosine_similarity": round(score, 3),
+                "similarity_score": float(final_scores[i]),
+                "semantic_similarity_component": round(float(scores['semantic_similarity_component'][i]), 3),
+                "modality_score_component": round(float(scores['modality_score_component'][i]), 3),
+                "distance_score_component": round(float(scores['distance_score_component'][i]), 3),
+                "raw_cosine_similarity": round(float(scores['raw_cosine_similarity'][i]), 3),
                 "modality": profile.get("modality", ""),
-                "distance_km": round(distance_km, 2) if not is_remote else "Remote / Unknown",
+                "distance_km": "Remote / Unknown" if scores['is_remote'][i]
+                else round(float(scores['distance_km'][i]), 2),
             })
 
-        return sorted(results, key=lambda x: x["similarity_score"], reverse=True)
+        return results
 
     except Exception as e:
         logger.error(f"Comparison failed: {e}")
         return []
 
 
-def update_internship_posting_status(company):
-    current_time = now()
-
-    InternshipPosting.objects.filter(
-        company=company,
-        application_deadline__lt=current_time,
-        status__in=['Open', 'Closed']
-    ).update(status='Expired')
-
-    InternshipPosting.objects.filter(
-        company=company,
-        application_deadline__gte=current_time,
-        status='Expired'
-    ).update(status='Open')
-
-
-def delete_old_deleted_postings():
-    threshold = now() - timedelta(days=3)
-    InternshipPosting.objects.filter(status='Deleted', date_modified__lt=threshold).delete()
-
-
 def reset_recommendations_and_tap_count(applicant):
+    # The run_maintenance job rolls every applicant over once a day; this only catches an applicant who
+    # comes back before it ran, and costs nothing once they are rolled over
     current_time = now()
-    today = current_time.date()
-    midnight_today = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-    # threshold = now() - timedelta(seconds=20)
-
-    skipped_recommendations = InternshipRecommendation.objects.filter(
-        status='Skipped',
-        time_stamp__lt=midnight_today,
-    )
-#
-    skipped_recommendations.update(status='Pending', time_stamp=now())
+    if is_rolled_over(applicant, current_time):
+        return
 
-    if not applicant.tap_count_reset or applicant.tap_count_reset.date() < today:
-        applicant.tap_count = 0
-        applicant.tap_count_reset = current_time
-        applicant.save(update_fields=['tap_count', 'tap_count_reset'])
+    roll_over_applicants([applicant.pk], current_time)
+    applicant.tap_count = 0
+    applicant.tap_count_reset = current_time
 
 
 class InternshipPostingStatusFilter(SimpleListFilter):
@@ -467,19 +847,26 @@ class InternshipPostingStatusFilter(SimpleListFilter):
 def monitor_performance(func_name: str):
     def decorator(func):
         def wrapper(*args, **kwargs):
-            import time
-            start_time = time.time()
-            try:
-                result = func(*args, **kwargs)
-                execution_time = time.time() - start_time
-                logger.info(f"{func_name} executed in {execution_time:.3f}s")
-                return result
-            except Exception as e:
-                execution_time = time.time() - start_time
-                logger.error(f"{func_name} failed after {execution_time:.3f}s: {e}")
-                raise
+            with instrumentation.trace() as trace:
+                start_time = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                    execution_time = time.perf_counter() - start_time
+                    logger.info(f"{func_name} executed in {execution_time:.3f}s ({format_trace(trace)})")
+                    instrumentation.record(func_name, execution_time)
+                    return result
+                except Exception as e:
+                    execution_time = time.perf_counter() - start_time
+                    logger.error(f"{func_name} failed after {execution_time:.3f}s ({format_trace(trace)}): {e}")
+                    raise
         return wrapper
     return decorator
 
 
+def format_trace(trace) -> str:
+    spans = [f"{name} {seconds * 1000:.1f}ms" for name, seconds in trace.spans.items()]
+    counters = [f"{name}={value}" for name, value in trace.counters.items()]
+    return ', '.join(spans + counters)
+
+
 
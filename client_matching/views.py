@@ -1,8 +1,9 @@
 import json
+import os
 import random
 from django.db import transaction
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, ProtectedError
+from django.db.models import ProtectedError
 from django.utils import timezone
 from django.utils.timezone import now
 from drf_spectacular.utils import extend_schema
@@ -15,16 +16,20 @@ from rest_framework.views import APIView
 from rest_framework import status as drf_status
 
 from client_application.models import Application, Notification
-from client_matching.functions import run_internship_matching, fisher_yates_shuffle
-from client_matching.models import PersonInCharge, InternshipPosting, InternshipRecommendation, Advertisement
-from user_account.permissions import IsCompany, IsApplicant
+from client_matching.feed import next_recommendation
+from client_matching.functions import run_internship_matching
+from client_matching.instrumentation import instrumentation
+from client_matching.jobs import schedule_posting_matching
+from client_matching.models import PersonInCharge, InternshipPosting, InternshipRecommendation, Advertisement, \
+    RecommendationFeedEntry
+from client_matching.posting_index import refresh_posting_index
+from user_account.permissions import IsAdmin, IsCompany, IsApplicant
 from client_matching.serializers import PersonInChargeListSerializer, CreatePersonInChargeSerializer, \
     EditPersonInChargeSerializer, BulkDeletePersonInChargeSerializer, InternshipPostingListSerializer, \
     CreateInternshipPostingSerializer, EditInternshipPostingSerializer, BulkDeleteInternshipPostingSerializer, \
     ToggleInternshipPostingSerializer, InternshipMatchSerializer, InternshipRecommendationListSerializer, \
     UploadDocumentSerializer, ReportPostingSerializer, InPracticumSerializer
-from client_matching.utils import update_internship_posting_status, delete_old_deleted_postings, \
-    reset_recommendations_and_tap_count
+from client_matching.utils import reset_recommendations_and_tap_count
 
 User = get_user_model()
 client_matching_tag = extend_schema(tags=["client_matching"])
@@ -34,20 +39,22 @@ client_matching_tag = extend_schema(tags=["client_matching"])
 class GetInternshipPostingsView(ListAPIView):
     permission_classes = [IsAuthenticated, IsApplicant]
     serializer_class = InternshipPostingListSerializer
-    queryset = InternshipPosting.objects.all()
+    queryset = InternshipPostingListSerializer.eager_load(InternshipPosting.objects.all())
+    query_budget = 7
 
 
 @client_matching_tag
 class InternshipPostingListView(ListAPIView):
     permission_classes = [IsAuthenticated, IsCompany]
     serializer_class = InternshipPostingListSerializer
+    query_budget = 8
 
     def get_queryset(self):
         user = self.request.user
-        update_internship_posting_status(company=user.company)
-        delete_old_deleted_postings()
-
-        queryset = InternshipPosting.objects.filter(company=user.company).exclude(status='Deleted')
+        # Expiry and the purge of deleted postings are done by the run_maintenance command
+        queryset = InternshipPostingListSerializer.eager_load(
+            InternshipPosting.objects.filter(company=user.company).exclude(status='Deleted')
+        )
 
         internship_posting_id = self.request.query_params.get('internship_posting_id')
         if internship_posting_id:
@@ -76,7 +83,6 @@ class CreateInternshipPostingView(CreateAPIView):
         return context
 
     def perform_create(self, serializer):
-        delete_old_deleted_postings()
         serializer.save()
 
 
@@ -85,8 +91,6 @@ class EditInternshipPostingView(APIView):
     permission_classes = [IsAuthenticated, IsCompany]
 
     def put(self, request):
-        delete_old_deleted_postings()
-
         internship_posting_id = request.query_params.get('internship_posting_id')
         if not internship_posting_id:
             return Response({"error": "Missing 'internship_posting_id' in query parameters."},
@@ -135,6 +139,7 @@ class EditInternshipPostingView(APIView):
 class PersonInChargeListView(ListAPIView):
     permission_classes = [IsAuthenticated, IsCompany]
     serializer_class = PersonInChargeListSerializer
+    query_budget = 5
 
     def get_queryset(self):
         user = self.request.user
@@ -239,6 +244,7 @@ class BulkDeleteInternshipPostingView(APIView):
                 person_in_charge=None,
                 date_modified=now()
             )
+            transaction.on_commit(lambda: refresh_posting_index(posting_ids))
 
             return Response(
                 {"message": f"{updated_count} internship posting(s) deleted."},
@@ -277,6 +283,9 @@ class ToggleInternshipPostingView(APIView):
 
             posting.status = new_status
             posting.save()
+            transaction.on_commit(lambda: refresh_posting_index([posting.internship_posting_id]))
+            if new_status == 'Open':
+                schedule_posting_matching(posting)
 
             return Response(
                 {"message": f"Internship posting status changed to '{new_status}'."},
@@ -314,6 +323,7 @@ class InternshipMatchView(APIView):
 class InternshipRecommendationListView(ListAPIView):
     permission_classes = [IsAuthenticated, IsApplicant]
     serializer_class = InternshipRecommendationListSerializer
+    query_budget = 16
 
     def parse_bool(self, value, field_name):
         true_vals = ['true', 'yes']
@@ -361,28 +371,8 @@ class InternshipRecommendationListView(ListAPIView):
         json.dumps(filter_state, sort_keys=True)
         self.filter_state = filter_state
 
-        open_posting_ids = InternshipPosting.objects.filter(status='Open') \
-            .values_list('internship_posting_id', flat=True)
-
-        base_queryset = InternshipRecommendation.objects.filter(
-            applicant=applicant,
-            status='Pending',
-            internship_posting_id__in=open_posting_ids
-        )
-
-        if applicant.in_practicum == 'Yes':
-            if filter_state['is_paid_internship'] is not None:
-                base_queryset = base_queryset.filter(
-                    internship_posting__is_paid_internship=filter_state['is_paid_internship'])
-
-            if filter_state['is_only_for_practicum'] is not None:
-                base_queryset = base_queryset.filter(
-                    internship_posting__is_only_for_practicum=filter_state['is_only_for_practicum'])
-
-            if filter_state['modality']:
-                base_queryset = base_queryset.filter(internship_posting__modality=filter_state['modality'])
-
-        elif any([
+        # The filters themselves are applied by the feed queue
+        if applicant.in_practicum != 'Yes' and any([
             filter_state['is_paid_internship'] is not None,
             filter_state['is_only_for_practicum'] is not None,
             filter_state['modality']
@@ -394,37 +384,35 @@ class InternshipRecommendationListView(ListAPIView):
             }
             raise ValidationError({'error': 'You must be in practicum to apply internship filters.'})
 
-        avg_score = base_queryset.aggregate(avg=Avg('similarity_score'))['avg'] or 0
-
-        current_pending = InternshipRecommendation.objects.filter(
+        current_pending = InternshipRecommendationListSerializer.eager_load(InternshipRecommendation.objects.filter(
             applicant=applicant,
+            status='Pending',
             is_current=True,
             internship_posting__status='Open'
-        ).first()
+        )).first()
 
         if current_pending:
             return [current_pending]
 
-        if base_queryset.exists():
-            InternshipRecommendation.objects.filter(applicant=applicant, is_current=True).update(is_current=False)
-            current_pending = random.choice(list(base_queryset))
-            current_pending.is_current = True
-            current_pending.save()
-
-            applicant.last_recommendation_filter_state = filter_state
-            applicant.save(update_fields=['last_recommendation_filter_state'])
+        # The next card comes off the applicant's shuffled feed queue instead of shuffling every pending one
+        current_pending = next_recommendation(applicant.pk, filter_state)
+        if current_pending is None:
+            return []
 
-        rest_queryset = base_queryset.exclude(pk=current_pending.pk) if current_pending else base_queryset
-        rest_queryset = rest_queryset.filter(similarity_score__gte=avg_score).distinct()
+        InternshipRecommendation.objects.filter(applicant=applicant, is_current=True).update(is_current=False)
+        current_pending.is_current = True
+        current_pending.save(update_fields=['is_current'])
 
-        rest_list = list(rest_queryset)
-        rest_list = fisher_yates_shuffle(rest_list)
-
-        final_list = [current_pending] + rest_list if current_pending else rest_list
-        return final_list
+        applicant.last_recommendation_filter_state = filter_state
+        applicant.save(update_fields=['last_recommendation_filter_state'])
+        return list(InternshipRecommendationListSerializer.eager_load(
+            InternshipRecommendation.objects.filter(pk=current_pending.pk)
+        ))
 
     def list(self, request, *args, **kwargs):
         applicant = request.user.applicant
+        # Before the limit check, so yesterday's count does not block the first fetch of the day
+        reset_recommendations_and_tap_count(applicant)
 
         if applicant.tap_count >= 10:
             return Response(
@@ -526,6 +514,7 @@ class InternshipRecommendationTapView(APIView):
         recommendation.time_stamp = timezone.now()
         recommendation.is_current = False
         recommendation.save()
+        RecommendationFeedEntry.objects.filter(recommendation=recommendation).delete()
 
         applicant.tap_count = (applicant.tap_count or 0) + 1
         applicant.save()
@@ -597,3 +586,16 @@ class ReportPostingView(CreateAPIView):
 
 
 
+
+
+@client_matching_tag
+class MatchingMetricsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        # Per process: each gunicorn worker reports the matches it ran itself
+        return Response({'pid': os.getpid(), **instrumentation.snapshot()})
+
+    def delete(self, request):
+        instrumentation.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -86,6 +86,16 @@ class EndorsementDetailSerializer(serializers.ModelSerializer):
                   'status'
                   ]
 
+    @classmethod
+    def eager_load(cls, queryset):
+        posting = 'application__internship_posting'
+        return queryset.select_related(
+            'application__applicant__user', f'{posting}__company', f'{posting}__person_in_charge'
+        ).prefetch_related(
+            f'{posting}__required_hard_skills', f'{posting}__required_soft_skills', f'{posting}__key_tasks',
+            f'{posting}__min_qualifications', f'{posting}__benefits'
+        )
+
     def get_hard_skills(self, obj):
         if obj.application.internship_posting:
             return [
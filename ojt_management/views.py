@@ -71,7 +71,8 @@ def log_coordinator_action(user, action, obj=None, details="", action_type=None)
 class CoordinatorMixin:
     def get_coordinator_or_403(self, user):
         try:
-            return OJTCoordinator.objects.get(user=user)
+            # The views filter by the coordinator's program and school
+            return OJTCoordinator.objects.select_related('program', 'department__school').get(user=user)
         except OJTCoordinator.DoesNotExist:
             raise PermissionDenied('User is not an OJT Coordinator. Access denied.')
 
@@ -80,6 +81,7 @@ class CoordinatorMixin:
 class GetInternshipPostingCoordinatorView(ListAPIView):
     permission_classes = [IsAuthenticated, IsCoordinator]
     serializer_class = InternshipPostingListSerializer
+    query_budget = 8
 
     def get_queryset(self):
         internship_posting_id = self.request.query_params.get("internship_posting_id")
@@ -87,7 +89,9 @@ class GetInternshipPostingCoordinatorView(ListAPIView):
         if not internship_posting_id:
             raise ValidationError({"internship_posting_id": "This query parameter is required."})
 
-        queryset = InternshipPosting.objects.filter(internship_posting_id=internship_posting_id)
+        queryset = InternshipPostingListSerializer.eager_load(
+            InternshipPosting.objects.filter(internship_posting_id=internship_posting_id)
+        )
 
         if not queryset.exists():
             raise ValidationError({"error": "Internship posting not found."})
@@ -100,6 +104,7 @@ class GetInternshipPostingCoordinatorView(ListAPIView):
 class SchoolPartnershipListView(CoordinatorMixin, generics.ListAPIView):
     permission_class = [IsAuthenticated, IsCoordinator]
     serializer_class = SchoolPartnershipSerializer
+    query_budget = 5
 
     filter_backends = [filters.SearchFilter]
     search_fields = ['company__company_name']
@@ -112,7 +117,7 @@ class SchoolPartnershipListView(CoordinatorMixin, generics.ListAPIView):
     def list(self, request, *args, **kwargs):
         try:
             queryset = self.filter_queryset(self.get_queryset())
-            if not queryset:
+            if not queryset.exists():
                 return Response({'message': 'No school partnerships found.'})
 
             return super().list(request, *args, **kwargs)
@@ -127,6 +132,7 @@ class SchoolPartnershipListView(CoordinatorMixin, generics.ListAPIView):
 class ApplicantListView(CoordinatorMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsCoordinator]
     serializer_class = GetApplicantSerializer
+    query_budget = 11
 
     filter_backends = [filters.SearchFilter]
 
@@ -139,10 +145,10 @@ class ApplicantListView(CoordinatorMixin, generics.ListAPIView):
 
     def get_queryset(self):
         coordinator = self.get_coordinator_or_403(self.request.user)
-        queryset = Applicant.objects.filter(
+        queryset = GetApplicantSerializer.eager_load(Applicant.objects.filter(
             program=coordinator.program,
             user__status__in=['Active']
-        ).exclude(program__isnull=True)
+        ).exclude(program__isnull=True))
 
         user = self.request.query_params.get('user')
 
@@ -171,6 +177,7 @@ class ApplicantListView(CoordinatorMixin, generics.ListAPIView):
 class GetPracticumStudentListView(CoordinatorMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsCoordinator]
     serializer_class = GetApplicantSerializer
+    query_budget = 11
     filter_backends = [filters.SearchFilter]
     search_fields = ['first_name', 'last_name', 'user__email']
 
@@ -179,23 +186,12 @@ class GetPracticumStudentListView(CoordinatorMixin, generics.ListAPIView):
         user_filter = self.request.query_params.get('user')
         application_status_filter = self.request.query_params.get('application_status')
 
-        base_queryset = Applicant.objects.filter(
+        base_queryset = GetApplicantSerializer.eager_load(Applicant.objects.filter(
             program=coordinator.program,
             user__status='Active',
             in_practicum='Yes',
             enrollment_record__isnull=False,
-        ).select_related(
-            'user', 'school', 'department', 'program'
-        ).prefetch_related(
-            'hard_skills', 'soft_skills',
-            'applications__internship_posting__required_hard_skills',
-            'applications__internship_posting__required_soft_skills',
-            'applications__internship_posting__key_tasks',
-            'applications__internship_posting__min_qualifications',
-            'applications__internship_posting__benefits',
-            'applications__internship_posting__company',
-            'applications__internship_posting__person_in_charge',
-        )
+        ))
 
         if user_filter:
             base_queryset = base_queryset.filter(user=user_filter)
@@ -260,6 +256,7 @@ class PracticumStudentApplicationStatusView(CoordinatorMixin, APIView):
 class GetRequestPracticumListView(CoordinatorMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsCoordinator]
     serializer_class = GetApplicantSerializer
+    query_budget = 13
 
     filter_backends = [filters.SearchFilter]
 
@@ -271,17 +268,17 @@ class GetRequestPracticumListView(CoordinatorMixin, generics.ListAPIView):
 
     def get_queryset(self):
         coordinator = self.get_coordinator_or_403(self.request.user)
-        return Applicant.objects.filter(
+        return GetApplicantSerializer.eager_load(Applicant.objects.filter(
             program=coordinator.program
             , user__status__in=['Active']
             , in_practicum='Pending'
             , enrollment_record__isnull=False
-        ).select_related('user')
+        ))
 
     def list(self, request, *args, **kwargs):
         try:
             queryset = self.filter_queryset(self.get_queryset())
-            if not queryset:
+            if not queryset.exists():
                 return Response({'message': 'No students found.'})
 
             return super().list(request, *args, **kwargs)
@@ -695,6 +692,7 @@ class ResetPracticumView(CoordinatorMixin, generics.GenericAPIView):
 class RespondedEndorsementListView(CoordinatorMixin, generics.ListAPIView):
     serializer_class = EndorsementDetailSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 8
     filter_backends = [filters.SearchFilter]
 
     search_fields = [
@@ -709,15 +707,16 @@ class RespondedEndorsementListView(CoordinatorMixin, generics.ListAPIView):
 
     def get_queryset(self):
         coordinator = self.get_coordinator_or_403(self.request.user)
-        return Endorsement.objects.filter(
+        return EndorsementDetailSerializer.eager_load(Endorsement.objects.filter(
             program_id=coordinator.program
-        ).exclude(status__in=['Pending', 'Deleted'])
+        ).exclude(status__in=['Pending', 'Deleted']))
 
 
 @ojt_management_tag
 class EndorsementDetailView(CoordinatorMixin, generics.ListAPIView):
     serializer_class = EndorsementDetailSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 8
     filter_backends = [filters.SearchFilter]
 
     search_fields = [
@@ -733,10 +732,10 @@ class EndorsementDetailView(CoordinatorMixin, generics.ListAPIView):
     def get_queryset(self):
         coordinator = self.get_coordinator_or_403(self.request.user)
 
-        return Endorsement.objects.filter(
+        return EndorsementDetailSerializer.eager_load(Endorsement.objects.filter(
             program_id=coordinator.program_id,
             status='Pending'
-        )
+        ))
 
 
 @ojt_management_tag
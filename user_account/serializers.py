@@ -4,12 +4,14 @@ from datetime import timedelta
 
 from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Prefetch
 from jwt.exceptions import ExpiredSignatureError, DecodeError, InvalidTokenError
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.exceptions import TokenError
 
+from client_application.models import Application
 from client_application.serializers import ApplicationSerializer, ListApplicationSerializer
-from user_account.models import User, AuditLog
+from user_account.models import AuditLog
 import googlemaps
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
@@ -30,6 +32,7 @@ from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from between_ims import settings
 from cea_management.models import Program, Department, School
 from client_matching.models import HardSkillsTagList, SoftSkillsTagList
+from client_matching.utils import schedule_applicant_embedding_refresh, schedule_skill_embeddings
 from .models import Applicant, User, Company, CareerEmplacementAdmin, OJTCoordinator
 
 from cea_management.serializers import ProgramSerializer
@@ -257,6 +260,7 @@ class ApplicantRegisterSerializer(serializers.ModelSerializer):
                         )
                         hard_skills.append(skill_instance)
                     applicant.hard_skills.set(hard_skills)
+                    schedule_skill_embeddings(hard_skills)
                 except json.JSONDecodeError:
                     raise serializers.ValidationError("Invalid format for hard_skills")
 
@@ -271,9 +275,12 @@ class ApplicantRegisterSerializer(serializers.ModelSerializer):
                         )
                         soft_skills.append(skill_instance)
                     applicant.soft_skills.set(soft_skills)
+                    schedule_skill_embeddings(soft_skills)
                 except json.JSONDecodeError:
                     raise serializers.ValidationError("Invalid format for soft_skills")
 
+            schedule_applicant_embedding_refresh(applicant)
+
             return applicant
 
         except Exception:
@@ -844,6 +851,13 @@ class GetApplicantSerializer(serializers.ModelSerializer):
                   'preferred_modality', 'academic_program', 'quick_introduction',
                   'resume', 'enrollment_record', 'verified_at', 'mobile_number', 'application_status', 'applications']
 
+    @classmethod
+    def eager_load(cls, queryset):
+        return queryset.select_related('user', 'school', 'department', 'program').prefetch_related(
+            'hard_skills', 'soft_skills',
+            Prefetch('applications', queryset=ListApplicationSerializer.eager_load(Application.objects.all())),
+        )
+
     def get_hard_skills(self, obj):
         return [
             {"id": skill.lightcast_identifier, "name": skill.name}
@@ -857,7 +871,8 @@ class GetApplicantSerializer(serializers.ModelSerializer):
         ]
 
     def get_application_status(self, obj):
-        if obj.applications.filter(status='Accepted').exists():
+        # From the applications already loaded for the applications field
+        if any(application.status == 'Accepted' for application in obj.applications.all()):
             return "Accepted"
         return "Pending"
 
@@ -1295,6 +1310,7 @@ class EditApplicantSerializer(serializers.ModelSerializer):
                     )
                     hard_skill_objs.append(obj)
                 instance.hard_skills.set(hard_skill_objs)
+                schedule_skill_embeddings(hard_skill_objs)
             except Exception:
                 raise serializers.ValidationError({'hard skills': 'error in parsing hard skills'})
 
@@ -1309,8 +1325,13 @@ class EditApplicantSerializer(serializers.ModelSerializer):
                     )
                     soft_skill_objs.append(obj)
                 instance.soft_skills.set(soft_skill_objs)
+                schedule_skill_embeddings(soft_skill_objs)
             except Exception:
                 raise serializers.ValidationError({'soft skills': 'error in parsing soft skills'})
+
+        if hard_skills_json or soft_skills_json or 'quick_introduction' in validated_data:
+            schedule_applicant_embedding_refresh(instance)
+
         return instance
 
 
@@ -139,11 +139,12 @@ class GetApplicantView(ListAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Applicant.objects.all()
     serializer_class = GetApplicantSerializer
+    query_budget = 11
 
     def get_queryset(self):
         delete_pending_users()
 
-        queryset = Applicant.objects.all()
+        queryset = GetApplicantSerializer.eager_load(Applicant.objects.all())
         user = self.request.query_params.get('user')
         if user:
             queryset = queryset.filter(user=user)